@@ -9,3 +9,23 @@
 #
 
 __VERSION__ = "0.3.1"
+
+from sys import version_info
+
+__all__ = ["convert", "Converter", "ConversionResult"]
+
+
+if version_info >= (3, 7):
+    def __getattr__(name):
+        """
+        Import the Python API on first use, so that the command line, which
+        does not need it, starts faster
+        """
+        if name in __all__:
+            from hdgfrom import api
+            return getattr(api, name)
+        raise AttributeError("module 'hdgfrom' has no attribute '%s'" % name)
+
+else:
+    # Module-level __getattr__ needs Python 3.7
+    from hdgfrom.api import convert, Converter, ConversionResult
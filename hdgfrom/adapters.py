@@ -11,12 +11,23 @@
 # Compatibility with Pyhton 2.7
 from __future__ import (absolute_import, division, print_function,
                         unicode_literals)
-from builtins import str, open, super, int, range
+from sys import version_info
+if version_info[0] < 3:
+    from builtins import str, open, super, int, range
 __metaclass__ = type
 
-from datetime import datetime, timedelta
+import re
 
-from hdgfrom.flow import Flow, Observation, Rate, Unit
+from array import array
+from datetime import datetime
+from io import StringIO, TextIOBase
+from itertools import islice
+from mmap import mmap, ACCESS_READ
+from os import fstat
+
+from hdgfrom.backends import TIME_TYPECODE, current_backend
+from hdgfrom.flow import Flow, Observations, Rate, Unit
+from hdgfrom.diagnostics import ErrorLog
 
 
 class FileFormats:
@@ -55,55 +66,258 @@ class Reader(Processor):
     def __init__(self, format):
         super().__init__(format)
 
-    def read_from(self, input_stream):
+    def read_from(self, input_stream, errors=None, progress=None):
+        pass
+
+    def read_records_from(self, input_stream, errors=None, progress=None):
+        """
+        Return the water body, the unit and a lazy iterator over the
+        (seconds, value) records found in the given stream. Malformed
+        records abort the reading, unless an ErrorLog is given to
+        collect them. The records read are accounted for in the given
+        Progress, if any.
+        """
         pass
 
+    def read_from_path(self, path, errors=None, progress=None, block_size=None):
+        """
+        Read a flow from the given file. Readers that map the file in
+        memory parse it by blocks of (at most) the given number of bytes.
+        """
+        with open(path, "r") as input_stream:
+            return self.read_from(input_stream, errors, progress)
+
+    def read_records_from_path(self, path, errors=None, progress=None, block_size=None):
+        input_stream = open(path, "r")
+        water_body, unit, records = self.read_records_from(input_stream, errors, progress)
+        return water_body, unit, self._closing(input_stream, records)
+
+    @staticmethod
+    def _position_of(input_stream):
+        """
+        A function returning the bytes consumed from the given stream,
+        or None for streams that are not backed by a seekable file
+        """
+        buffer = getattr(input_stream, "buffer", None)
+        if buffer is None or not buffer.seekable():
+            return None
+        return buffer.tell
+
+    @staticmethod
+    def _closing(resource, records):
+        try:
+            for each_record in records:
+                yield each_record
+        finally:
+            resource.close()
+
 
 class SWMMReader(Reader):
     """
     Reader from a SWMM text file
     """
 
+    HEADER_LINES = 3
+
     def __init__(self):
         super().__init__(FileFormats.SWMM)
 
-    def read_from(self, input_stream):
-        water_body = self._read_water_body_from(input_stream)
-        observations = self._read_observations_from(input_stream)
-        return Flow(water_body.strip(), observations)
+    def read_from(self, input_stream, errors=None, progress=None):
+        water_body, unit, records = self.read_records_from(input_stream, errors, progress)
+        return Flow(water_body, Observations.from_records(records, unit))
+
+    def read_records_from(self, input_stream, errors=None, progress=None):
+        header = _CountedLines(input_stream)
+        water_body, blank_lines = self._read_water_body_from(header)
+        SWMMReader._skip_lines(header, 1)
+        unit = SWMMReader._read_unit(header)
+        records = self._read_records_from(input_stream, errors,
+                                          blank_lines + self.HEADER_LINES + 1,
+                                          header.size)
+        if progress is not None:
+            records = progress.track(records, self._position_of(input_stream))
+        return water_body.strip(), unit, records
+
+    def read_from_path(self, path, errors=None, progress=None, block_size=None):
+        water_body, unit, seconds, values = \
+            self.read_columns_from_path(path, errors, progress, block_size)
+        return Flow(water_body, Observations(seconds, values, unit))
+
+    def read_columns_from_path(self, path, errors=None, progress=None, block_size=None):
+        """
+        Return the water body, the unit, and the times (in seconds) and
+        values found in the given file, as typed arrays.
+        """
+        water_body, unit, blocks = self._read_mapped_blocks_from(path, errors, progress,
+                                                                 block_size)
+        seconds = array(TIME_TYPECODE)
+        values = array(str("d"))
+        for block_seconds, block_values in blocks:
+            seconds.extend(block_seconds)
+            values.extend(block_values)
+        return water_body, unit, seconds, values
+
+    def read_records_from_path(self, path, errors=None, progress=None, block_size=None):
+        water_body, unit, blocks = self._read_mapped_blocks_from(path, errors, progress,
+                                                                 block_size)
+        records = (each_record
+                   for seconds, values in blocks
+                   for each_record in zip(seconds, values))
+        return water_body, unit, records
+
+    BLOCK_SIZE = 1 << 22
+
+    END_OF_TABLE = re.compile(br"\n[ \t\r\f\v]*(?:\n|\Z)")
+
+    def _read_mapped_blocks_from(self, path, errors, progress=None, block_size=None):
+        """
+        Map the given file in memory, and read its header. The table is
+        then parsed lazily, by blocks of whole lines of about block_size
+        bytes (BLOCK_SIZE by default), straight from the mapped bytes.
+        The offset of each block reports the progress.
+        """
+        with open(path, "rb") as input_file:
+            if fstat(input_file.fileno()).st_size == 0:
+                raise ValueError(self.ERROR_NO_TABLE)
+            buffer = mmap(input_file.fileno(), 0, access=ACCESS_READ)
+        try:
+            lines = _MappedLines(buffer)
+            water_body, blank_lines = self._read_water_body_from(lines)
+            SWMMReader._skip_lines(lines, 1)
+            unit = SWMMReader._read_unit(lines)
+        except:
+            buffer.close()
+            raise
+        start = buffer.tell()
+        end = len(buffer)
+        if errors is None:
+            end_of_table = self.END_OF_TABLE.search(buffer, max(start - 1, 0))
+            if end_of_table is not None:
+                end = end_of_table.start() + 1
+        blocks = self._read_blocks(buffer, start, end, errors,
+                                   blank_lines + self.HEADER_LINES + 1, progress,
+                                   block_size or self.BLOCK_SIZE)
+        return water_body.strip(), unit, blocks
+
+    @staticmethod
+    def _read_blocks(buffer, start, end, errors, first_line, progress, block_size):
+        try:
+            line = first_line
+            while start < end:
+                stop = min(start + block_size, end)
+                if stop < end:
+                    stop = buffer.rfind(b"\n", start, stop) + 1
+                    if stop <= start:
+                        stop = buffer.find(b"\n", start, end) + 1 or end
+                block = buffer[start:stop]
+                columns = SWMMReader._parse_block(block, errors, line, start)
+                yield columns
+                if progress is not None:
+                    progress.advance(len(columns[0]), stop)
+                line += block.count(b"\n")
+                start = stop
+        finally:
+            buffer.close()
+
+    @staticmethod
+    def _parse_block(block, errors, first_line, offset):
+        """
+        Parse all the rows of the block at once when each has the
+        expected three fields, or row by row otherwise.
+        """
+        rows = block.count(b"\n") + (0 if block.endswith(b"\n") else 1)
+        columns = current_backend().parse_block(block, rows)
+        if columns is not None:
+            return columns
+
+        rows = SWMMReader._read_records_from(StringIO(block.decode("utf-8")),
+                                             errors, first_line, offset)
+        seconds = array(TIME_TYPECODE)
+        values = array(str("d"))
+        for time, value in rows:
+            seconds.append(time)
+            values.append(value)
+        return seconds, values
+
+    ERROR_NO_TABLE = "No SWMM table found"
+
+    ERROR_NO_UNIT = "No unit found in the header of the SWMM table"
 
     @staticmethod
     def _read_water_body_from(input_stream):
+        blank_lines = -1
         line = ""
         while not line.strip():
             line = input_stream.readline()
+            blank_lines += 1
+            if line == "":
+                raise ValueError(SWMMReader.ERROR_NO_TABLE)
         _, water_body = line.split("-")
-        return water_body
+        return water_body, blank_lines
 
     @staticmethod
-    def _read_observations_from(input_stream):
-        observations = []
-        SWMMReader._skip_lines(input_stream, 1)
-
-        unit = SWMMReader._read_unit(input_stream)
-
-        line = input_stream.readline()
-        while line.strip() != "":
-            (day, time, rate) = line.strip().split("\t")
-            (hour, minute, second) = time.strip().split(":")
-            timestamp = timedelta(
-                days=int(day),
-                hours=int(hour),
-                minutes=int(minute),
-                seconds=int(second))
-            observations.append(Observation(Rate(float(rate.strip()), unit), timestamp))
-            line = input_stream.readline()
-        return observations
+    def _read_records_from(input_stream, errors, first_line, base_offset=0):
+        """
+        Parse the rows of the table. Offsets of malformed rows are counted
+        from the lines consumed, as the stream may not be seekable.
+        """
+        lines = iter(input_stream.readline, "")
+        offset = base_offset
+        for number, raw_line in enumerate(lines, first_line):
+            line_offset = offset
+            if errors is not None:
+                offset += len(raw_line.encode("utf-8"))
+            line = raw_line.strip()
+            if not line:
+                if errors is None:
+                    break
+                continue
+            try:
+                (day, time, rate) = line.split("\t")
+                (hour, minute, second) = time.split(":")
+                seconds = ((int(day) * 24 + int(hour)) * 60 + int(minute)) * 60 + int(second)
+                value = float(rate)
+                if value < 0:
+                    raise ValueError(Rate.ERROR_INVALID_RATE.format(value))
+            except ValueError:
+                if errors is None:
+                    raise
+                record, reason = SWMMReader._salvage(line)
+                errors.record(number, line_offset, reason)
+                if record is None:
+                    continue
+                seconds, value = record
+            yield seconds, value
+
+    @staticmethod
+    def _salvage(line):
+        """
+        Try again to read a malformed row, splitting fields on any
+        whitespace, and tell why it was rejected in the first place.
+        """
+        fields = line.split()
+        if len(fields) != 3:
+            return None, ErrorLog.MALFORMED_ROW
+        (day, time, rate) = fields
+        parts = time.split(":")
+        if len(parts) != 3:
+            return None, ErrorLog.MALFORMED_ROW
+        try:
+            (hour, minute, second) = [int(p) for p in parts]
+            seconds = ((int(day) * 24 + hour) * 60 + minute) * 60 + second
+            value = float(rate)
+        except ValueError:
+            return None, ErrorLog.INVALID_NUMBER
+        if value < 0:
+            return None, ErrorLog.NEGATIVE_RATE
+        return (seconds, value), ErrorLog.REPAIRED_ROW
 
     @staticmethod
     def _read_unit(input_stream):
         headers = input_stream.readline()
         parts = headers.split()
+        if not parts:
+            raise ValueError(SWMMReader.ERROR_NO_UNIT)
         return Unit.by_name(parts[-1][1:-1])
 
     @staticmethod
@@ -112,12 +326,43 @@ class SWMMReader(Reader):
             input_stream.readline()
 
 
+class _CountedLines:
+    """
+    Read decoded lines from a text stream, counting their size in bytes
+    """
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._size = 0
+
+    @property
+    def size(self):
+        return self._size
+
+    def readline(self):
+        line = self._stream.readline()
+        self._size += len(line.encode("utf-8"))
+        return line
+
+
+class _MappedLines:
+    """
+    Read decoded lines from a memory-mapped file
+    """
+
+    def __init__(self, buffer):
+        self._buffer = buffer
+
+    def readline(self):
+        return self._buffer.readline().decode("utf-8")
+
+
 class Writer(Processor):
 
     def __init__(self, format):
         super().__init__(format)
 
-    def write_to(self, flow, output_stream):
+    def write_to(self, flow, output_stream, progress=None):
         pass
 
     @staticmethod
@@ -153,30 +398,119 @@ class HDGWriter(Writer):
         Unit.CMH: 5
     }
 
-    def __init__(self):
+    DEFAULT_PRECISION = 2
+
+    BLOCK_SIZE = 1 << 18
+
+    def __init__(self, precision=DEFAULT_PRECISION):
         super().__init__(FileFormats.HDG)
+        self._precision = precision
+
+    @property
+    def precision(self):
+        return self._precision
+
+    def write_to(self, flow, output_stream, progress=None):
+        """
+        Write the given flow as an HDG file. Data lines are formatted
+        as bytes into a single reusable buffer, flushed every BLOCK_SIZE
+        bytes to binary streams. Text streams, which have their own
+        buffer, get each chunk as soon as it is decoded.
+        """
+        self.write_flow_header_to(flow, output_stream)
+        backend = current_backend()
+        block_size = 0 if isinstance(output_stream, TextIOBase) else self.BLOCK_SIZE
+        block = bytearray()
+        written = 0
+        for times, values in self._chunks_of(flow, backend.CHUNK_SIZE):
+            size = len(block)
+            backend.format_into(block, flow.start_date, times, values, self._precision)
+            written += len(block) - size
+            if len(block) >= block_size:
+                self._flush(block, output_stream)
+            if progress is not None:
+                progress.advance(len(times), written)
+        self._flush(block, output_stream)
 
-    def write_to(self, flow, output_stream):
+    @staticmethod
+    def _chunks_of(flow, chunk_size):
+        if isinstance(flow.observations, Observations):
+            times, values = flow.times, flow.values
+            for start in range(0, len(times), chunk_size):
+                yield times[start:start + chunk_size], values[start:start + chunk_size]
+            return
+
+        records = iter(flow.records)
+        while True:
+            times = array(TIME_TYPECODE)
+            values = array(str("d"))
+            for time, value in islice(records, chunk_size):
+                times.append(time)
+                values.append(value)
+            if not times:
+                break
+            yield times, values
+
+    @staticmethod
+    def _flush(block, output_stream):
+        if block:
+            if isinstance(output_stream, TextIOBase):
+                output_stream.write(block.decode("ascii"))
+            else:
+                output_stream.write(block)
+            del block[:]
+
+    @staticmethod
+    def _write_text_to(output_stream, text):
+        if isinstance(output_stream, TextIOBase):
+            output_stream.write(text)
+        else:
+            output_stream.write(text.encode("utf-8"))
+
+    def write_flow_header_to(self, flow, output_stream):
+        self.write_header_to(output_stream,
+                             water_body=flow.water_body,
+                             user_name=flow.user_name,
+                             start_date=flow.start_date,
+                             end_date=flow.end_date,
+                             observation_count=len(flow.observations),
+                             unit=flow.unit)
+
+    def write_header_to(self, output_stream, water_body, user_name, start_date,
+                        end_date, observation_count, unit):
         header = self.HDG_HEADER.format(
             creation_date=self.now().strftime(self.DATE_FORMAT),
-            water_body=flow.water_body,
-            user_name=flow.user_name,
-            start_date=flow.start_date.strftime(self.DATE_FORMAT),
-            end_date=flow.end_date.strftime(self.DATE_FORMAT),
-            observation_count=len(flow.observations),
-            unit_code=self._hdg_code_of(flow.unit)
+            water_body=water_body,
+            user_name=user_name,
+            start_date=start_date.strftime(self.DATE_FORMAT),
+            end_date=end_date.strftime(self.DATE_FORMAT),
+            observation_count=observation_count,
+            unit_code=self._hdg_code_of(unit)
         )
-        output_stream.write(header)
-        for each_observation in flow.observations:
-            date = flow.start_date + each_observation.time
-            line = "%d,%d,%d,%d,%d,%d,%.2f\n" % (date.year,
-                                                 date.month,
-                                                 date.day,
-                                                 date.hour,
-                                                 date.minute,
-                                                 date.second,
-                                                 each_observation.rate.value)
-            output_stream.write(line)
+        self._write_text_to(output_stream, header)
+
+    def format_records(self, start_date, records):
+        """
+        Format the given (seconds, value) records as HDG data lines
+        """
+        seconds = array(TIME_TYPECODE)
+        values = array(str("d"))
+        for time, value in records:
+            seconds.append(time)
+            values.append(value)
+        return self.format_columns(start_date, seconds, values)
+
+    def format_columns(self, start_date, seconds, values):
+        return current_backend().format_records(start_date, seconds, values,
+                                                self._precision)
+
+    def format_into(self, buffer, start_date, seconds, values):
+        """
+        Append the given columns, as HDG data lines encoded in ASCII, to
+        the given bytearray
+        """
+        current_backend().format_into(buffer, start_date, seconds, values,
+                                      self._precision)
 
     @staticmethod
     def _hdg_code_of(unit):
@@ -194,16 +528,30 @@ class AdapterLibrary:
     ERROR_NO_READER = "Reading {format} files are not yet supported"
     ERROR_NO_WRITING = "Writing {format} files are not yet supported"
 
-    DEFAULT_READERS = [ SWMMReader() ]
-    DEFAULT_WRITERS = [ HDGWriter() ]
+    DEFAULT_READERS = [ SWMMReader ]
+    DEFAULT_WRITERS = [ HDGWriter ]
 
     def __init__(self, readers=None, writers=None):
-        self._readers = readers or self.DEFAULT_READERS
-        self._writers = writers or self.DEFAULT_WRITERS
+        self._readers = readers or [each() for each in self.DEFAULT_READERS]
+        self._writers = writers or [each() for each in self.DEFAULT_WRITERS]
+
+    def read_from(self, file_format, input_stream, errors=None, progress=None):
+        reader = self._find_reader_for(file_format)
+        return reader.read_from(input_stream, errors, progress)
+
+    def read_records_from(self, file_format, input_stream, errors=None, progress=None):
+        reader = self._find_reader_for(file_format)
+        return reader.read_records_from(input_stream, errors, progress)
+
+    def read_from_path(self, file_format, path, errors=None, progress=None,
+                       block_size=None):
+        reader = self._find_reader_for(file_format)
+        return reader.read_from_path(path, errors, progress, block_size)
 
-    def read_from(self, file_format, input_stream):
+    def read_records_from_path(self, file_format, path, errors=None, progress=None,
+                               block_size=None):
         reader = self._find_reader_for(file_format)
-        return reader.read_from(input_stream)
+        return reader.read_records_from_path(path, errors, progress, block_size)
 
     def _find_reader_for(self, file_format):
         for any_reader in self._readers:
@@ -213,9 +561,9 @@ class AdapterLibrary:
         error = self.ERROR_NO_READER.format(format=file_format)
         raise RuntimeError(error)
 
-    def write_to(self, flow, file_format, output_stream):
+    def write_to(self, flow, file_format, output_stream, progress=None):
         writer = self._find_writer_for(file_format)
-        writer.write_to(flow, output_stream)
+        writer.write_to(flow, output_stream, progress)
 
     def _find_writer_for(self, file_format):
         for any_writer in self._writers:
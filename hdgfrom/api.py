@@ -0,0 +1,304 @@
+#
+# hdg-from -- Generate HDG files for GEMSS
+#
+# Copyright (C) 2017 Di WU
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the MIT license.  See the LICENSE file for details.
+#
+
+# Compatibility with Pyhton 2.7
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from datetime import datetime
+from os.path import getsize
+from io import StringIO, TextIOWrapper, BytesIO
+import time
+
+from hdgfrom.flow import Flow, Unit
+from hdgfrom.adapters import AdapterLibrary, FileFormats, HDGWriter
+from hdgfrom.diagnostics import ErrorLog
+from hdgfrom.errors import InvalidDateError, InvalidInputError, InvalidUnitError
+from hdgfrom.memory import MemoryBudget, Strategy
+from hdgfrom.sorting import ExternalSorter, RecordObservations, spill
+from hdgfrom.validation import Filling, SeriesValidator
+
+
+# time.perf_counter only exists from Python 3.3
+perf_counter = getattr(time, "perf_counter", time.time)
+
+
+class ConversionResult:
+    """
+    What a conversion produced: the number of rows written, statistics
+    about the converted values, the time spent in each step and the
+    warnings raised along the way. When no destination was given, the
+    HDG text is available as 'content'.
+    """
+
+    def __init__(self, water_body, unit, row_count, minimum, maximum, mean,
+                 timings, warnings, errors=None, content=None):
+        self._water_body = water_body
+        self._unit = unit
+        self._row_count = row_count
+        self._minimum = minimum
+        self._maximum = maximum
+        self._mean = mean
+        self._timings = timings
+        self._warnings = warnings
+        self._errors = errors
+        self._content = content
+
+    @property
+    def water_body(self):
+        return self._water_body
+
+    @property
+    def unit(self):
+        return self._unit
+
+    @property
+    def row_count(self):
+        return self._row_count
+
+    @property
+    def minimum(self):
+        return self._minimum
+
+    @property
+    def maximum(self):
+        return self._maximum
+
+    @property
+    def mean(self):
+        return self._mean
+
+    @property
+    def timings(self):
+        return self._timings
+
+    @property
+    def warnings(self):
+        return self._warnings
+
+    @property
+    def errors(self):
+        return self._errors
+
+    @property
+    def content(self):
+        return self._content
+
+
+class Converter:
+    """
+    Convert SWMM data into HDG, from and to paths, file objects or
+    in-memory buffers. Readers and writers are created once and reused
+    by all conversions. Problems are raised as HDGFromError (or IOError
+    when the input cannot be opened) instead of being printed.
+    """
+
+    WARNING_ALL_ZERO_FLOW = "The conversion to '{unit}' leads to only near-zero values"
+    WARNING_IRREGULAR_SERIES = ("Irregular time series: {gaps} gap(s), "
+                                "{duplicates} duplicated and "
+                                "{disorders} out-of-order timestamp(s)")
+    WARNING_MALFORMED_ROWS = "{skipped} malformed row(s) skipped and {repaired} repaired"
+
+    ERROR_NO_OBSERVATION = "The SWMM table contains no observation"
+
+    DATE_FORMAT = "%Y-%m-%dT%H:%M:%S"
+
+    def __init__(self, adapters=None, sorter=None):
+        self._adapters = adapters or AdapterLibrary()
+        self._sorter = sorter or ExternalSorter()
+
+    def convert(self, source, destination=None, unit=Unit.CMD, start_date=None,
+                user_name=None, water_body=None, input_format=FileFormats.SWMM,
+                filling=Filling.NONE, drop_duplicates=False, sort=False,
+                max_errors=None, max_memory=None):
+        unit = self._unit_of(unit)
+        budget = self._budget_of(max_memory)
+        spilled = sort or (budget is not None and
+                           budget.strategy_for(self._size_of(source), False)
+                           == Strategy.EXTERNAL)
+        start_date = self._date_of(start_date)
+        errors = ErrorLog(max_errors) if max_errors is not None else None
+        warnings = []
+        timings = {}
+
+        flows = []
+        try:
+            clock = perf_counter()
+            with self._open_source(source) as input_stream:
+                flow = self._read(input_format, input_stream, errors, unit,
+                                  spilled, sort, budget)
+                flows.append(flow)
+                if len(flow.observations) == 0:
+                    raise InvalidInputError(self.ERROR_NO_OBSERVATION)
+                timings["read"] = perf_counter() - clock
+
+                clock = perf_counter()
+                if not spilled:
+                    flow = flow.convert_to(unit)
+                flow, report = SeriesValidator(filling, drop_duplicates).repair(flow)
+                flows.append(flow)
+                self._adjust_metadata(flow, start_date, user_name, water_body)
+                minimum, maximum, mean = self._statistics_of(flow)
+                timings["convert"] = perf_counter() - clock
+
+            if maximum is not None and maximum < 1e-2:
+                warnings.append(self.WARNING_ALL_ZERO_FLOW.format(unit=unit.symbol))
+            if not report.is_regular:
+                warnings.append(self.WARNING_IRREGULAR_SERIES.format(
+                    gaps=report.gaps,
+                    duplicates=report.duplicates,
+                    disorders=report.disorders))
+            if errors is not None and len(errors) > 0:
+                warnings.append(self.WARNING_MALFORMED_ROWS.format(
+                    skipped=errors.skipped,
+                    repaired=errors.repaired))
+
+            clock = perf_counter()
+            content = self._write(flow, destination)
+            timings["write"] = perf_counter() - clock
+
+        finally:
+            for each_flow in flows:
+                each_flow.close()
+
+        return ConversionResult(flow.water_body, unit, len(flow.observations),
+                                minimum, maximum, mean, timings, warnings,
+                                errors, content)
+
+    def _read(self, input_format, input_stream, errors, unit, spilled, sort, budget):
+        try:
+            if not spilled:
+                return self._adapters.read_from(input_format, input_stream, errors)
+            water_body, source_unit, records = \
+                self._adapters.read_records_from(input_format, input_stream, errors)
+            records = ((seconds, unit.from_CMD(source_unit.to_CMD(value)))
+                       for seconds, value in records)
+            if not sort:
+                records = spill(records)
+            elif budget is not None:
+                records = ExternalSorter(run_size=budget.run_size()).sort(records)
+            else:
+                records = self._sorter.sort(records)
+            return Flow(water_body, RecordObservations(records, unit))
+        except ValueError as error:
+            raise InvalidInputError(str(error))
+
+    def _write(self, flow, destination):
+        if destination is None:
+            output = StringIO()
+            self._adapters.write_to(flow, FileFormats.HDG, output)
+            return output.getvalue()
+        if hasattr(destination, "write"):
+            self._adapters.write_to(flow, FileFormats.HDG, destination)
+            return None
+        with open(destination, "w") as output:
+            self._adapters.write_to(flow, FileFormats.HDG, output)
+        return None
+
+    @staticmethod
+    def _open_source(source):
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            return TextIOWrapper(BytesIO(source))
+        if hasattr(source, "readline"):
+            return _Borrowed(source)
+        return open(source, "r")
+
+    @staticmethod
+    def _size_of(source):
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            return len(source)
+        if hasattr(source, "readline"):
+            return None
+        return getsize(source)
+
+    @staticmethod
+    def _budget_of(max_memory):
+        if max_memory is None or isinstance(max_memory, MemoryBudget):
+            return max_memory
+        return MemoryBudget.parse(max_memory)
+
+    @staticmethod
+    def _adjust_metadata(flow, start_date, user_name, water_body):
+        flow.start_date = start_date
+        if user_name is not None:
+            flow.user_name = user_name
+        if water_body is not None:
+            flow.water_body = water_body
+
+    @staticmethod
+    def _statistics_of(flow):
+        count = 0
+        total = 0.
+        minimum = maximum = None
+        for _, value in flow.records:
+            if value == SeriesValidator.MISSING_VALUE:
+                continue
+            if count == 0:
+                minimum = maximum = value
+            elif value < minimum:
+                minimum = value
+            elif value > maximum:
+                maximum = value
+            total += value
+            count += 1
+        return minimum, maximum, (total / count if count else None)
+
+    @staticmethod
+    def _unit_of(unit):
+        try:
+            if not isinstance(unit, Unit):
+                unit = Unit.by_name(unit)
+        except ValueError:
+            raise InvalidUnitError(unit)
+        if unit not in HDGWriter.HDG_UNIT_CODES:
+            raise InvalidUnitError(unit)
+        return unit
+
+    @staticmethod
+    def _date_of(date):
+        if date is None:
+            return datetime(2017, 1, 1, 12)
+        if isinstance(date, datetime):
+            return date
+        try:
+            return datetime.strptime(date, Converter.DATE_FORMAT)
+        except ValueError:
+            raise InvalidDateError(date)
+
+
+class _Borrowed:
+    """
+    Use a stream given by the caller in a 'with' statement, without
+    closing it
+    """
+
+    def __init__(self, stream):
+        self._stream = stream
+
+    def __enter__(self):
+        return self._stream
+
+    def __exit__(self, *error):
+        return False
+
+
+_DEFAULT_CONVERTER = None
+
+
+def convert(source, destination=None, **options):
+    """
+    Convert the given SWMM data (a path, a file object, or bytes) into
+    HDG, and write it to the given destination (a path or a file
+    object). Without destination, the HDG text is returned as the
+    'content' of the result. See Converter.convert for the options.
+    """
+    global _DEFAULT_CONVERTER
+    if _DEFAULT_CONVERTER is None:
+        _DEFAULT_CONVERTER = Converter()
+    return _DEFAULT_CONVERTER.convert(source, destination, **options)
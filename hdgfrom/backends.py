@@ -0,0 +1,344 @@
+#
+# hdg-from -- Generate HDG files for GEMSS
+#
+# Copyright (C) 2017 Di WU
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the MIT license.  See the LICENSE file for details.
+#
+
+# Compatibility with Pyhton 2.7
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from array import array
+from datetime import date
+
+from hdgfrom.errors import UnavailableBackendError
+
+
+def _integer_typecode():
+    """
+    The typecode of arrays of 64-bit integers, in which times are kept.
+    'q' only exists from Python 3.3, but 'l' has 64 bits on most 64-bit
+    platforms, and doubles hold integers exactly up to 2**53 otherwise.
+    """
+    for each_code in ("q", "l"):
+        try:
+            if array(str(each_code)).itemsize == 8:
+                return str(each_code)
+        except ValueError:
+            pass
+    return str("d")
+
+
+TIME_TYPECODE = _integer_typecode()
+
+
+class Backends:
+    """
+    The compute backends available to parse, convert and format flows
+    """
+
+    AUTO = "auto"
+    NUMPY = "numpy"
+    PYTHON = "python"
+
+    _ALL_BACKENDS = [ AUTO,
+                      NUMPY,
+                      PYTHON ]
+
+    ERROR_UNKNOWN_BACKEND = "Unknown backend '{name}'."
+
+    @staticmethod
+    def match(name):
+        for any_backend in Backends._ALL_BACKENDS:
+            if name.lower() == any_backend:
+                return any_backend
+
+        error = Backends.ERROR_UNKNOWN_BACKEND.format(name=name)
+        raise ValueError(error)
+
+
+class _ASCIIFormat:
+    """
+    A text format that the '%' operator turns into ASCII bytes, where
+    bytes do not support it themselves (Python 3.3 and 3.4)
+    """
+
+    def __init__(self, text):
+        self._text = text
+
+    def __mod__(self, arguments):
+        return (self._text % arguments).encode("ascii")
+
+
+def _ascii_format(text):
+    """
+    The given format, as bytes when they support the '%' operator, so
+    that formatting stays as fast as possible on Python 2.7 and 3.5+
+    """
+    if hasattr(bytes, "__mod__"):
+        return text.encode("ascii")
+    return _ASCIIFormat(text)
+
+
+_PREFIX_FORMAT = _ascii_format("%d,%d,%d,")
+
+
+class PythonBackend:
+    """
+    Process columns of times and values with the standard library only
+    """
+
+    NAME = Backends.PYTHON
+
+    CHUNK_SIZE = 1000
+
+    def parse_block(self, block, rows):
+        """
+        Parse a block of SWMM data rows, given as bytes, into columns of
+        times (in seconds) and values. Return None when the block
+        contains rows that are not exactly three valid tab-separated
+        fields, so that they can be parsed and reported one by one.
+        """
+        fields = block.split()
+        if len(fields) != 3 * rows or block.count(b"\t") != 2 * rows:
+            return None
+        try:
+            times = {}
+            for each_time in set(fields[1::3]):
+                (hour, minute, second) = each_time.split(b":")
+                times[each_time] = (int(hour) * 60 + int(minute)) * 60 + int(second)
+            seconds = array(TIME_TYPECODE, [int(day) * 86400 + times[time]
+                                            for day, time in zip(fields[0::3], fields[1::3])])
+            values = array(str("d"), map(float, fields[2::3]))
+        except ValueError:
+            return None
+        if values and min(values) < 0:
+            return None
+        return seconds, values
+
+    def convert(self, values, source_unit, unit):
+        return array(str("d"), (unit.from_CMD(source_unit.to_CMD(value))
+                                for value in values))
+
+    def largest(self, values):
+        return max(values) if len(values) else float("-inf")
+
+    DEFAULT_PRECISION = 2
+
+    VALUE_FORMAT = "%.*f"
+
+    DATE_CACHE_SIZE = 1 << 8
+    TIME_CACHE_SIZE = 1 << 12
+
+    def __init__(self):
+        self._dates = {}
+        self._times_of_day = {}
+
+    def format_records(self, start_date, seconds, values, precision=DEFAULT_PRECISION):
+        """
+        Format the given columns as HDG data lines, as text
+        """
+        buffer = bytearray()
+        self.format_into(buffer, start_date, seconds, values, precision)
+        return buffer.decode("ascii")
+
+    def format_into(self, buffer, start_date, seconds, values, precision=DEFAULT_PRECISION):
+        """
+        Append the given columns, as HDG data lines encoded in ASCII, to
+        the given bytearray, with the given number of decimals. The
+        "year,month,day," and "hour,minute,second," prefixes are
+        formatted once and kept in tables shared by all the calls. These
+        are emptied when full: rows come in chronological order, so few
+        dates are needed at a time, but a whole day of times of day.
+        """
+        first_day = start_date.toordinal()
+        offset = start_date.hour * 3600 + start_date.minute * 60 + start_date.second
+        value_format = _ascii_format("%%.%df\n" % precision)
+        dates = self._dates
+        times_of_day = self._times_of_day
+        for time, value in zip(seconds, values):
+            day, time = divmod(offset + time, 86400)
+            day_prefix = dates.get(first_day + day)
+            if day_prefix is None:
+                if len(dates) >= self.DATE_CACHE_SIZE:
+                    dates.clear()
+                day_prefix = dates[first_day + day] = self._date_prefix(first_day + day)
+            time_prefix = times_of_day.get(time)
+            if time_prefix is None:
+                if len(times_of_day) >= self.TIME_CACHE_SIZE:
+                    times_of_day.clear()
+                time_prefix = times_of_day[time] = self._time_prefix(time)
+            buffer += day_prefix
+            buffer += time_prefix
+            buffer += value_format % value
+
+    @staticmethod
+    def _date_prefix(ordinal):
+        day = date.fromordinal(ordinal)
+        return _PREFIX_FORMAT % (day.year, day.month, day.day)
+
+    @staticmethod
+    def _time_prefix(time):
+        hour, time = divmod(time, 3600)
+        minute, second = divmod(time, 60)
+        return _PREFIX_FORMAT % (hour, minute, second)
+
+
+class NumpyBackend(PythonBackend):
+    """
+    Convert and format columns of times and values as NumPy arrays.
+    Results are identical to those of the Python backend: values whose
+    rounding to the requested decimals is a near tie are formatted by
+    Python.
+    SWMM rows are still parsed as the Python backend does, since
+    bytes.split and the number conversions it relies on already run in
+    C, and proved faster than parsing digits with NumPy.
+    """
+
+    NAME = Backends.NUMPY
+
+    CHUNK_SIZE = 8192
+
+    _LARGEST_FIXED_POINT = 1e15
+
+    def __init__(self):
+        try:
+            import numpy
+        except ImportError:
+            raise UnavailableBackendError(Backends.NUMPY)
+        PythonBackend.__init__(self)
+        self._numpy = numpy
+
+    def convert(self, values, source_unit, unit):
+        if len(values) == 0:
+            return array(str("d"))
+        converted = unit.from_CMD(source_unit.to_CMD(self._view_of("d", values)))
+        return self._array_of("d", converted)
+
+    def largest(self, values):
+        if len(values) == 0:
+            return float("-inf")
+        return float(self._view_of("d", values).max())
+
+    def format_into(self, buffer, start_date, seconds, values,
+                    precision=PythonBackend.DEFAULT_PRECISION):
+        np = self._numpy
+        if len(seconds) == 0:
+            return
+        seconds = self._view_of("q", seconds)
+        values = self._view_of("d", values)
+
+        origin = np.datetime64(start_date.replace(microsecond=0), "s")
+        moments = origin + seconds.astype("timedelta64[s]")
+        days = moments.astype("datetime64[D]")
+        unique_days, day_index = np.unique(days, return_inverse=True)
+        dates = self._table_of(["%d,%d,%d," % (d.year, d.month, d.day)
+                                for d in unique_days.astype(object)])
+        times_of_day = (moments - days).astype(np.int64)
+        unique_times, time_index = np.unique(times_of_day, return_inverse=True)
+        times = self._table_of(["%d,%d,%d," % (t // 3600, t // 60 % 60, t % 60)
+                                for t in unique_times.tolist()])
+
+        rows = np.hstack([dates[day_index.ravel()],
+                          times[time_index.ravel()],
+                          self._numbers_of(values, precision),
+                          np.full((len(values), 1), ord(b"\n"), dtype=np.uint8)])
+        characters = rows.ravel()
+        buffer += characters[characters != 0].tobytes()
+
+    def _numbers_of(self, values, precision):
+        """
+        Format values with the given number of decimals, as a table of
+        ASCII codes padded with zeros. Values are rounded as fixed-point
+        integers, except near ties, where the exact binary value decides,
+        as in Python. Negative values (and -0.0) are left to Python too.
+        """
+        np = self._numpy
+        scale = 10 ** precision
+        with np.errstate(invalid="ignore", over="ignore"):
+            scaled = values * scale
+            fraction = scaled - np.floor(scaled)
+            exact = np.isfinite(scaled) \
+                & ~np.signbit(values) \
+                & (scaled < self._LARGEST_FIXED_POINT) \
+                & (np.abs(fraction - 0.5) > scaled * 1e-15 + 1e-9)
+        fixed_point = np.where(exact, np.rint(scaled), 0).astype(np.int64)
+        units, decimals = np.divmod(fixed_point, scale)
+
+        width = len(str(int(units.max())))
+        powers = self._powers_of_ten(width)
+        digits = (units[:, None] // powers) % 10 + ord(b"0")
+        digits[(units[:, None] < powers) & (powers > 1)] = 0
+
+        inexact = np.flatnonzero(~exact)
+        others = [self.VALUE_FORMAT % (precision, v) for v in values[inexact].tolist()]
+        length = width + 1 + precision if precision else width
+        table = np.zeros((len(values), max([length] + [len(t) for t in others])),
+                         dtype=np.uint8)
+        table[:, :width] = digits
+        if precision:
+            table[:, width] = ord(b".")
+            powers = self._powers_of_ten(precision)
+            table[:, width + 1:length] = (decimals[:, None] // powers) % 10 + ord(b"0")
+        if others:
+            table[inexact] = self._table_of(others, table.shape[1])
+        return table
+
+    def _powers_of_ten(self, count):
+        return 10 ** self._numpy.arange(count - 1, -1, -1, dtype=self._numpy.int64)
+
+    def _table_of(self, texts, width=None):
+        np = self._numpy
+        width = width or max(len(t) for t in texts)
+        table = np.zeros((len(texts), width), dtype=np.uint8)
+        for index, text in enumerate(texts):
+            table[index, :len(text)] = bytearray(text.encode("ascii"))
+        return table
+
+    def _view_of(self, code, column):
+        if isinstance(column, array):
+            return self._numpy.frombuffer(column, dtype=column.typecode) \
+                if len(column) else self._numpy.zeros(0, dtype=code)
+        return self._numpy.asarray(column, dtype=code)
+
+    def _array_of(self, code, values):
+        column = array(str(code))
+        column.frombytes(self._numpy.ascontiguousarray(values, dtype=code).tobytes())
+        return column
+
+
+_BACKEND = None
+
+SMALL_INPUT = 1 << 22
+
+
+def select_backend(name=Backends.AUTO, input_size=None):
+    """
+    Use the given backend from now on. The automatic choice falls back
+    on the Python backend when NumPy is not installed, or when the input
+    size is known to be smaller than SMALL_INPUT bytes: importing NumPy
+    would then take longer than it saves.
+    """
+    global _BACKEND
+    name = Backends.match(name)
+    if name == Backends.PYTHON:
+        _BACKEND = PythonBackend()
+    elif name == Backends.NUMPY:
+        _BACKEND = NumpyBackend()
+    elif input_size is not None and input_size < SMALL_INPUT:
+        _BACKEND = PythonBackend()
+    else:
+        try:
+            _BACKEND = NumpyBackend()
+        except UnavailableBackendError:
+            _BACKEND = PythonBackend()
+    return _BACKEND
+
+
+def current_backend():
+    if _BACKEND is None:
+        return select_backend(Backends.AUTO)
+    return _BACKEND
@@ -0,0 +1,447 @@
+#
+# hdg-from -- Generate HDG files for GEMSS
+#
+# Copyright (C) 2017 Di WU
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the MIT license.  See the LICENSE file for details.
+#
+
+# Compatibility with Pyhton 2.7
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import os
+import sqlite3
+
+from datetime import datetime
+from errno import ENOENT
+from os.path import abspath, isdir, join, relpath
+
+from hdgfrom.adapters import HDGWriter
+from hdgfrom.flow import Unit
+
+
+class Entry:
+    """
+    One HDG file of the archive, as described by its header. The first
+    and last dates are those of its first and last data lines (None if
+    it has none), and the data offset is the position of its first data
+    line.
+    """
+
+    def __init__(self, path, water_body, user_name, start_date, first_date,
+                 last_date, row_count, unit, data_offset, size):
+        self._path = path
+        self._water_body = water_body
+        self._user_name = user_name
+        self._start_date = start_date
+        self._first_date = first_date
+        self._last_date = last_date
+        self._row_count = row_count
+        self._unit = unit
+        self._data_offset = data_offset
+        self._size = size
+
+    @property
+    def path(self):
+        return self._path
+
+    @property
+    def water_body(self):
+        return self._water_body
+
+    @property
+    def user_name(self):
+        return self._user_name
+
+    @property
+    def start_date(self):
+        return self._start_date
+
+    @property
+    def first_date(self):
+        return self._first_date
+
+    @property
+    def last_date(self):
+        return self._last_date
+
+    @property
+    def row_count(self):
+        return self._row_count
+
+    @property
+    def unit(self):
+        return self._unit
+
+    @property
+    def data_offset(self):
+        return self._data_offset
+
+    @property
+    def size(self):
+        return self._size
+
+
+class RefreshSummary:
+    """
+    The number of files that a refresh of the catalog added, updated,
+    removed, left unchanged or rejected (as invalid HDG files)
+    """
+
+    def __init__(self, added, updated, removed, unchanged, rejected):
+        self._added = added
+        self._updated = updated
+        self._removed = removed
+        self._unchanged = unchanged
+        self._rejected = rejected
+
+    @property
+    def added(self):
+        return self._added
+
+    @property
+    def updated(self):
+        return self._updated
+
+    @property
+    def removed(self):
+        return self._removed
+
+    @property
+    def unchanged(self):
+        return self._unchanged
+
+    @property
+    def rejected(self):
+        return self._rejected
+
+
+class HeaderReader:
+    """
+    Read the header of an HDG file, and the dates of its first and last
+    data lines, without reading the data lines in between
+    """
+
+    EXTENSION = ".hdg"
+
+    WATER_BODY = b"$Waterbody Name: "
+    USER_NAME = b"$Created by: "
+    START_DATE = b"$Start Date: "
+    ROW_COUNT = b"$Number of Data Lines: "
+    COLUMNS = b"$Year,"
+
+    HEADER_SIZE = 14
+    UNIT_LINE = 12
+
+    LAST_ROW_SIZE = 256
+
+    UNITS_BY_CODE = dict((code, unit) for unit, code in HDGWriter.HDG_UNIT_CODES.items())
+
+    def read_from_path(self, path, status=None):
+        """
+        Return the entry describing the given HDG file, or None if its
+        header is not a valid HDG header
+        """
+        status = status or os.stat(path)
+        with open(path, "rb") as hdg_file:
+            lines = [hdg_file.readline() for _ in range(self.HEADER_SIZE)]
+            data_offset = hdg_file.tell()
+            try:
+                return self._entry_of(path, lines, data_offset, status.st_size, hdg_file)
+            except (IndexError, KeyError, ValueError):
+                return None
+
+    def _entry_of(self, path, lines, data_offset, size, hdg_file):
+        fields = {}
+        for each_line in lines:
+            for each_field in (self.WATER_BODY, self.USER_NAME,
+                               self.START_DATE, self.ROW_COUNT):
+                if each_line.startswith(each_field):
+                    fields[each_field] = each_line[len(each_field):].rstrip(b"\r\n").decode("utf-8")
+        if not lines[-1].startswith(self.COLUMNS):
+            raise ValueError("No column names")
+        unit = self.UNITS_BY_CODE[int(lines[self.UNIT_LINE].split(b",")[2])]
+
+        first_date = last_date = None
+        if data_offset < size:
+            first_date = self.date_of(hdg_file.readline())
+            hdg_file.seek(max(data_offset, size - self.LAST_ROW_SIZE))
+            last_date = self.date_of(hdg_file.read().rstrip(b"\r\n").rsplit(b"\n", 1)[-1])
+
+        return Entry(path,
+                     water_body=fields[self.WATER_BODY],
+                     user_name=fields[self.USER_NAME],
+                     start_date=self._header_date_of(fields[self.START_DATE]),
+                     first_date=first_date,
+                     last_date=last_date,
+                     row_count=int(fields[self.ROW_COUNT]),
+                     unit=unit.symbol,
+                     data_offset=data_offset,
+                     size=size)
+
+    @staticmethod
+    def date_of(row):
+        year, month, day, hour, minute, second = row.split(b",", 6)[:6]
+        return datetime(int(year), int(month), int(day),
+                        int(hour), int(minute), int(second))
+
+    @staticmethod
+    def _header_date_of(text):
+        date, time = text.split()
+        day, month, year = date.split("/")
+        hour, minute = time.split(":")
+        return datetime(int(year), int(month), int(day), int(hour), int(minute))
+
+
+class Catalog:
+    """
+    Index the headers of the HDG files found in an archive directory
+    (and its sub-directories) into a SQLite database, so that the files
+    covering a given water body and time window are found without
+    opening them. The index is refreshed incrementally: only the files
+    whose size or modification time changed are read again.
+
+    Data lines of the files are expected in chronological order, as for
+    --split-by, so that the rows within a time window are found by
+    binary search on the byte offsets of each file.
+    """
+
+    FILE_NAME = ".hdg-from.catalog"
+
+    SCHEMA_VERSION = 1
+
+    SCHEMA = ("CREATE TABLE IF NOT EXISTS files ("
+              " path TEXT PRIMARY KEY,"
+              " mtime REAL NOT NULL,"
+              " size INTEGER NOT NULL,"
+              " water_body TEXT NOT NULL,"
+              " user_name TEXT NOT NULL,"
+              " start_date TEXT NOT NULL,"
+              " first_date TEXT,"
+              " last_date TEXT,"
+              " row_count INTEGER NOT NULL,"
+              " unit TEXT NOT NULL,"
+              " data_offset INTEGER NOT NULL);"
+              "CREATE INDEX IF NOT EXISTS files_by_water_body"
+              " ON files (water_body, first_date, last_date);"
+              "CREATE INDEX IF NOT EXISTS files_by_date"
+              " ON files (first_date, last_date);")
+
+    COLUMNS = ("path, water_body, user_name, start_date, first_date,"
+               " last_date, row_count, unit, data_offset, size")
+
+    DATE_FORMAT = "%Y-%m-%dT%H:%M:%S"
+
+    BLOCK_SIZE = 1 << 20
+
+    @staticmethod
+    def of(archive, index=None):
+        return Catalog(archive, index or join(archive, Catalog.FILE_NAME))
+
+    def __init__(self, archive, index, reader=None):
+        self._archive = archive
+        self._index = index
+        self._reader = reader or HeaderReader()
+        self._connection = None
+
+    @property
+    def index(self):
+        return self._index
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+
+    def refresh(self):
+        """
+        Bring the index up to date with the HDG files of the archive
+        """
+        if not isdir(self._archive):
+            raise IOError(ENOENT, os.strerror(ENOENT), self._archive)
+        database = self._database()
+        known = dict((path, (mtime, size)) for path, mtime, size
+                     in database.execute("SELECT path, mtime, size FROM files"))
+        counts = dict(added=0, updated=0, unchanged=0, rejected=0)
+        with database:
+            for path, status in self._scan():
+                recorded = known.pop(path, None)
+                if recorded == (status.st_mtime, status.st_size):
+                    counts["unchanged"] += 1
+                    continue
+                entry = self._reader.read_from_path(join(self._archive, path), status)
+                if entry is None:
+                    counts["rejected"] += 1
+                    if recorded is not None:
+                        known[path] = recorded
+                    continue
+                database.execute(
+                    "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (path, status.st_mtime, status.st_size, entry.water_body,
+                     entry.user_name, self._text_of(entry.start_date),
+                     self._text_of(entry.first_date), self._text_of(entry.last_date),
+                     entry.row_count, entry.unit, entry.data_offset))
+                counts["added" if recorded is None else "updated"] += 1
+            database.executemany("DELETE FROM files WHERE path = ?",
+                                 [(path,) for path in known])
+        return RefreshSummary(removed=len(known), **counts)
+
+    def find(self, water_body=None, start=None, end=None):
+        """
+        The entries of the given water body (any, by default), whose
+        data lines overlap the given time window (open-ended if either
+        date is None), sorted by water body and first date
+        """
+        conditions = []
+        parameters = []
+        if water_body is not None:
+            conditions.append("water_body = ?")
+            parameters.append(water_body)
+        if start is not None:
+            conditions.append("last_date >= ?")
+            parameters.append(self._text_of(start))
+        if end is not None:
+            conditions.append("first_date <= ?")
+            parameters.append(self._text_of(end))
+        query = "SELECT %s FROM files" % self.COLUMNS
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY water_body, first_date, path"
+        return [self._entry_of(row)
+                for row in self._database().execute(query, parameters)]
+
+    def extract(self, entry, output_path, start=None, end=None, writer=None):
+        """
+        Write, as a new HDG file, the data lines of the given entry that
+        fall within the given time window. The range of lines is found
+        by binary search, and then copied as is. Return the number of
+        lines extracted.
+        """
+        writer = writer or HDGWriter()
+        with open(entry.path, "rb") as hdg_file:
+            first = entry.data_offset
+            last = entry.size
+            if start is not None:
+                first = self._offset_of(hdg_file, first, last, lambda date: date < start)
+            if end is not None:
+                last = self._offset_of(hdg_file, first, last, lambda date: date <= end)
+            row_count = self._count_rows(hdg_file, first, last)
+
+            with open(output_path, "wb") as output:
+                start_date = end_date = entry.start_date
+                if row_count:
+                    if first > entry.data_offset:
+                        hdg_file.seek(first)
+                        start_date = self._reader.date_of(hdg_file.readline())
+                    hdg_file.seek(self._last_row_start(hdg_file, first, last))
+                    end_date = self._reader.date_of(hdg_file.readline())
+                writer.write_header_to(output,
+                                       water_body=entry.water_body,
+                                       user_name=entry.user_name,
+                                       start_date=start_date,
+                                       end_date=end_date,
+                                       observation_count=row_count,
+                                       unit=Unit.by_name(entry.unit))
+                self._copy(hdg_file, first, last, output)
+        return row_count
+
+    def _offset_of(self, hdg_file, low, high, is_before):
+        """
+        The offset of the first data line, between the given offsets
+        (both at the start of a line, or at the end of the file), whose
+        date is not 'before', as decided by the given predicate
+        """
+        while low < high:
+            middle = (low + high) // 2
+            hdg_file.seek(middle)
+            hdg_file.readline()
+            row_start = hdg_file.tell()
+            if row_start >= high:
+                break
+            row = hdg_file.readline()
+            if is_before(self._reader.date_of(row)):
+                low = row_start + len(row)
+            else:
+                high = row_start
+
+        hdg_file.seek(low)
+        while low < high:
+            row = hdg_file.readline()
+            if not is_before(self._reader.date_of(row)):
+                break
+            low += len(row)
+        return low
+
+    def _count_rows(self, hdg_file, first, last):
+        count = 0
+        for each_block in self._blocks_of(hdg_file, first, last):
+            count += each_block.count(b"\n")
+        return count
+
+    def _copy(self, hdg_file, first, last, output):
+        for each_block in self._blocks_of(hdg_file, first, last):
+            output.write(each_block)
+
+    def _blocks_of(self, hdg_file, first, last):
+        hdg_file.seek(first)
+        remaining = last - first
+        while remaining > 0:
+            block = hdg_file.read(min(remaining, self.BLOCK_SIZE))
+            if not block:
+                break
+            remaining -= len(block)
+            yield block
+
+    def _last_row_start(self, hdg_file, first, last):
+        start = max(first, last - HeaderReader.LAST_ROW_SIZE)
+        hdg_file.seek(start)
+        tail = hdg_file.read(last - start).rstrip(b"\r\n")
+        return start + tail.rfind(b"\n") + 1
+
+    def _scan(self):
+        for directory, _, files in os.walk(self._archive):
+            for each_file in sorted(files):
+                if each_file.lower().endswith(HeaderReader.EXTENSION):
+                    path = join(directory, each_file)
+                    yield relpath(path, self._archive), os.stat(path)
+
+    def _database(self):
+        if self._connection is None:
+            self._connection = sqlite3.connect(self._index)
+            version = self._connection.execute("PRAGMA user_version").fetchone()[0]
+            if version != self.SCHEMA_VERSION:
+                self._connection.executescript(
+                    "DROP TABLE IF EXISTS files;"
+                    + self.SCHEMA
+                    + "PRAGMA user_version = %d;" % self.SCHEMA_VERSION)
+        return self._connection
+
+    def _entry_of(self, row):
+        (path, water_body, user_name, start_date, first_date, last_date,
+         row_count, unit, data_offset, size) = row
+        return Entry(abspath(join(self._archive, path)),
+                     water_body=water_body,
+                     user_name=user_name,
+                     start_date=self._date_of(start_date),
+                     first_date=self._date_of(first_date),
+                     last_date=self._date_of(last_date),
+                     row_count=row_count,
+                     unit=unit,
+                     data_offset=data_offset,
+                     size=size)
+
+    @staticmethod
+    def _text_of(date):
+        return None if date is None else date.strftime(Catalog.DATE_FORMAT)
+
+    @staticmethod
+    def _date_of(text):
+        return None if text is None else datetime.strptime(text, Catalog.DATE_FORMAT)
@@ -11,13 +11,25 @@
 # Compatibility with Pyhton 2.7
 from __future__ import absolute_import, division, print_function, unicode_literals
 
-from argparse import ArgumentParser
-from datetime import datetime
-from sys import argv, stdout
+import re
+
+from datetime import datetime, timedelta
+from os import makedirs
+from os.path import abspath, dirname, isdir, join, relpath
+from sys import argv, stderr, stdout
 
 from hdgfrom.flow import Flow, Unit
-from hdgfrom.adapters import FileFormats, AdapterLibrary
-from hdgfrom.errors import InvalidDateError
+from hdgfrom.backends import Backends, select_backend
+from hdgfrom.errors import InvalidDateError, InvalidTargetError, TooManyErrorsError, \
+    UnavailableBackendError, StandardStreamError, IncompatibleOptionsError
+from hdgfrom.streams import STANDARD_STREAM, is_standard_stream, open_input, \
+    open_output, size_of
+
+
+# The adapters and the other modules needed by a conversion are imported
+# where they are first used, so that the command line starts faster.
+
+DEFAULT_PRECISION = 2  # as HDGWriter.DEFAULT_PRECISION
 
 
 class Arguments:
@@ -36,17 +48,38 @@ class Arguments:
             user_name=arguments.user_name,
             water_body=arguments.water_body,
             output_file=arguments.output,
-            unit=arguments.unit
+            unit=arguments.unit,
+            filling=arguments.fill,
+            drop_duplicates=arguments.drop_duplicates,
+            sort=arguments.sort,
+            pipeline=arguments.pipeline,
+            batch_size=arguments.batch_size,
+            queue_depth=arguments.queue_depth,
+            incremental=arguments.incremental,
+            max_errors=arguments.max_errors,
+            error_log=arguments.error_log,
+            workers=arguments.workers,
+            targets=arguments.target,
+            max_memory=arguments.max_memory,
+            mapped=arguments.mmap,
+            split_by=arguments.split_by,
+            max_rows=arguments.max_rows,
+            backend=arguments.backend,
+            progress=arguments.progress,
+            buffer_size=arguments.buffer_size,
+            precision=arguments.precision
         )
 
     @staticmethod
     def _prepare_parser():
+        from argparse import ArgumentParser
+        from hdgfrom.memory import MemoryBudget
         parser = ArgumentParser(
             "hdg-from",
             description="Generate HDG file for GEMSS")
         parser.add_argument(
             "input_file",
-            help="The file that must be converted to HDG")
+            help="The file that must be converted to HDG, or '-' to read the standard input")
         parser.add_argument(
             "-f",
             "--format",
@@ -55,7 +88,7 @@ class Arguments:
             help="Format of the input file")
         parser.add_argument(
             "-o", "--output",
-            help="The HDG file to generate")
+            help="The HDG file to generate, or '-' to write on the standard output")
         parser.add_argument(
             "-s", "--start-date",
             default="2017-1-1T12:00:00",
@@ -71,10 +104,101 @@ class Arguments:
         parser.add_argument(
             "-w", "--water-body",
             help="The name of the water body")
+        parser.add_argument(
+            "--fill",
+            choices=["none", "missing", "hold", "linear"],
+            default="none",
+            help="How to fill the gaps found in the time series")
+        parser.add_argument(
+            "--drop-duplicates",
+            action="store_true",
+            help="Keep only the first of duplicated timestamps")
+        parser.add_argument(
+            "--sort",
+            action="store_true",
+            help="Sort observations by time and drop duplicates, out of memory")
+        parser.add_argument(
+            "--pipeline",
+            action="store_true",
+            help="Read, convert and write concurrently (ignored with --sort, --fill or --drop-duplicates)")
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            help="Number of observations per batch in pipelined mode (default: 10000)")
+        parser.add_argument(
+            "--queue-depth",
+            type=int,
+            help="Number of batches buffered between stages in pipelined mode (default: 8)")
+        parser.add_argument(
+            "--mmap",
+            action="store_true",
+            help="Map the input file in memory and parse it as bytes (uncompressed local files only)")
+        parser.add_argument(
+            "--incremental",
+            action="store_true",
+            help="Skip the conversion if neither the input file nor the options changed")
+        parser.add_argument(
+            "--max-errors",
+            type=int,
+            help="Skip (or repair) up to this number of malformed rows, instead of aborting")
+        parser.add_argument(
+            "--error-log",
+            help="The CSV file where to record malformed rows (implies --max-errors)")
+        parser.add_argument(
+            "--workers",
+            type=int,
+            help="Format the HDG file using this number of worker processes")
+        parser.add_argument(
+            "-t", "--target",
+            action="append",
+            default=[],
+            help="An additional HDG file to generate, as 'PATH[,unit=U][,start-date=D][,user-name=N][,water-body=W]'")
+        parser.add_argument(
+            "--max-memory",
+            type=MemoryBudget.parse,
+            help="The memory the conversion may use (e.g., 512M or 2G)")
+        parser.add_argument(
+            "--split-by",
+            choices=["year", "month"],
+            help="Generate one HDG file per calendar period")
+        parser.add_argument(
+            "--max-rows",
+            type=int,
+            help="Generate several HDG files, with at most this number of rows each")
+        parser.add_argument(
+            "--backend",
+            choices=[Backends.AUTO, Backends.NUMPY, Backends.PYTHON],
+            default=Backends.AUTO,
+            help="Compute with NumPy, with Python only, or with NumPy when available and worth it (default)")
+        parser.add_argument(
+            "--progress",
+            choices=["none", "human", "json"],
+            default="none",
+            help="Report the rows processed, the throughput and the time left, as text or as JSON lines")
+        parser.add_argument(
+            "--buffer-size",
+            type=MemoryBudget.parse_size,
+            help="The size of the buffers used to read and write files and standard streams (e.g., 64K or 4M)")
+        parser.add_argument(
+            "--precision",
+            type=int,
+            choices=range(0, 10),
+            metavar="{0..9}",
+            default=DEFAULT_PRECISION,
+            help="The number of decimals of the flow rates (default 2)")
         return parser
 
     def __init__(self, input_file, input_format, start_date, user_name,
-                 water_body, output_file, unit):
+                 water_body, output_file, unit, filling="none",
+                 drop_duplicates=False, sort=False, pipeline=False,
+                 batch_size=None, queue_depth=None, incremental=False,
+                 max_errors=None, error_log=None, workers=None, targets=None,
+                 max_memory=None, mapped=False, split_by=None, max_rows=None,
+                 backend=Backends.AUTO, progress="none",
+                 buffer_size=None, precision=DEFAULT_PRECISION):
+        from hdgfrom.adapters import FileFormats
+        from hdgfrom.progress import ProgressFormats
+        from hdgfrom.validation import Filling
         self._input_file = input_file
         self._input_format = FileFormats.match(input_format)
         self._start_date = self._validate(start_date)
@@ -82,16 +206,102 @@ class Arguments:
         self._water_body = water_body
         self._output_file = output_file
         self._unit = Unit.by_name(unit)
+        self._filling = Filling.match(filling)
+        self._drop_duplicates = drop_duplicates
+        self._sort = sort
+        self._pipeline = pipeline
+        self._batch_size = batch_size
+        self._queue_depth = queue_depth
+        self._incremental = incremental
+        self._max_errors = max_errors
+        self._error_log = error_log
+        self._workers = workers
+        self._target_specs = targets or []
+        self._extra_targets = [self._parse_target(t) for t in self._target_specs]
+        self._max_memory = max_memory
+        self._mapped = mapped
+        self._split_by = split_by and self._period_of(split_by)
+        self._max_rows = max_rows
+        self._backend = Backends.match(backend)
+        self._progress = ProgressFormats.match(progress)
+        self._buffer_size = buffer_size
+        self._precision = precision
+        self._check_standard_streams()
+        self._check_split_targets()
+
+    @staticmethod
+    def _period_of(name):
+        from hdgfrom.partition import Period
+        return Period.match(name)
 
     DATE_FORMAT = "%Y-%m-%dT%H:%M:%S"
 
+    DATE_PATTERN = re.compile(r"(\d{4})-(\d{1,2})-(\d{1,2})T(\d{1,2}):(\d{1,2}):(\d{1,2})\Z")
+
     @staticmethod
     def _validate(text):
+        """
+        Read a date formatted as DATE_FORMAT. Avoid datetime.strptime,
+        whose first call imports the locale machinery.
+        """
+        match = Arguments.DATE_PATTERN.match(text)
         try:
-            return datetime.strptime(text, Arguments.DATE_FORMAT)
+            if match is None:
+                raise ValueError(text)
+            return datetime(*[int(each_field) for each_field in match.groups()])
         except ValueError:
             raise InvalidDateError(text)
 
+    def _check_standard_streams(self):
+        if self._incremental and (self.reads_from_standard_input
+                                  or self.writes_to_standard_output):
+            raise StandardStreamError("--incremental")
+        if len([t for t in self.targets if is_standard_stream(t.path)]) > 1:
+            raise StandardStreamError("--target")
+        if is_standard_stream(self.output_file):
+            if self._split_by is not None:
+                raise StandardStreamError("--split-by")
+            if self._max_rows is not None:
+                raise StandardStreamError("--max-rows")
+
+    def _check_split_targets(self):
+        if self._extra_targets:
+            if self._split_by is not None:
+                raise IncompatibleOptionsError("--split-by", "--target")
+            if self._max_rows is not None:
+                raise IncompatibleOptionsError("--max-rows", "--target")
+
+    HDG_UNITS = ["CMS", "CFS", "MGD", "GPM", "CMD", "CMH"]
+
+    def _parse_target(self, spec):
+        from hdgfrom.fanout import Target
+        parts = spec.split(",")
+        settings = {
+            "unit": self._unit,
+            "start-date": self._start_date,
+            "user-name": self._user_name,
+            "water-body": self._water_body
+        }
+        for each_setting in parts[1:]:
+            key, _, value = each_setting.partition("=")
+            key = key.strip().lower()
+            if key not in settings:
+                raise InvalidTargetError(spec)
+            if key == "unit":
+                if value.strip().upper() not in self.HDG_UNITS:
+                    raise InvalidTargetError(spec)
+                value = Unit.by_name(value)
+            elif key == "start-date":
+                value = self._validate(value.strip())
+            settings[key] = value
+        if not parts[0].strip():
+            raise InvalidTargetError(spec)
+        return Target(parts[0].strip(),
+                      settings["unit"],
+                      settings["start-date"],
+                      settings["user-name"],
+                      settings["water-body"])
+
     @property
     def input_file(self):
         return self._input_file
@@ -103,9 +313,24 @@ class Arguments:
     @property
     def output_file(self):
         if self._output_file is None:
+            if is_standard_stream(self._input_file):
+                return STANDARD_STREAM
             return self._input_file.replace(".txt", ".hdg")
         return self._output_file
 
+    @property
+    def reads_from_standard_input(self):
+        return is_standard_stream(self._input_file)
+
+    @property
+    def writes_to_standard_output(self):
+        return any(is_standard_stream(each_target.path)
+                   for each_target in self.targets)
+
+    @property
+    def buffer_size(self):
+        return self._buffer_size
+
     @property
     def start_date(self):
         return self._start_date
@@ -130,6 +355,265 @@ class Arguments:
     def unit(self):
         return self._unit
 
+    @property
+    def filling(self):
+        return self._filling
+
+    @property
+    def drop_duplicates(self):
+        return self._drop_duplicates
+
+    @property
+    def sort(self):
+        return self._sort
+
+    @property
+    def pipeline(self):
+        return self._pipeline and self.streamable
+
+    @property
+    def streamable(self):
+        return not self._extra_targets \
+            and not self.split \
+            and not self._sort \
+            and not self._drop_duplicates \
+            and self._filling == "none"
+
+    @property
+    def max_memory(self):
+        return self._max_memory
+
+    @property
+    def batch_size(self):
+        return self._batch_size
+
+    @property
+    def queue_depth(self):
+        return self._queue_depth
+
+    @property
+    def mapped(self):
+        return self._mapped and not self.reads_from_standard_input
+
+    @property
+    def block_size(self):
+        if self._max_memory is None:
+            return None
+        return self._max_memory.block_size()
+
+    @property
+    def incremental(self):
+        return self._incremental
+
+    @property
+    def lenient(self):
+        return self._max_errors is not None or self._error_log is not None
+
+    @property
+    def max_errors(self):
+        return self._max_errors
+
+    @property
+    def error_log(self):
+        return self._error_log
+
+    @property
+    def workers(self):
+        if is_standard_stream(self.output_file):
+            return None
+        return self._workers
+
+    @property
+    def backend(self):
+        return self._backend
+
+    @property
+    def progress(self):
+        return self._progress
+
+    @property
+    def precision(self):
+        return self._precision
+
+    @property
+    def resolution(self):
+        """
+        The smallest non-zero value that the HDG files can show
+        """
+        return 10. ** -self._precision
+
+    @property
+    def split_by(self):
+        return self._split_by
+
+    @property
+    def max_rows(self):
+        return self._max_rows
+
+    @property
+    def split(self):
+        return self._split_by is not None or self._max_rows is not None
+
+    @property
+    def fan_out(self):
+        return len(self._extra_targets) > 0
+
+    @property
+    def targets(self):
+        from hdgfrom.fanout import Target
+        main_target = Target(self.output_file,
+                             self._unit,
+                             self._start_date,
+                             self._user_name,
+                             self._water_body)
+        return [main_target] + self._extra_targets
+
+    @property
+    def options(self):
+        """
+        The options that affect the content of the generated file
+        """
+        return {
+            "format": self._input_format,
+            "unit": self._unit.symbol,
+            "start_date": self._start_date.strftime(self.DATE_FORMAT),
+            "user_name": self._user_name,
+            "water_body": self._water_body,
+            "fill": self._filling,
+            "drop_duplicates": self._drop_duplicates,
+            "sort": self._sort,
+            "targets": self._target_specs,
+            "split_by": self._split_by,
+            "max_rows": self._max_rows,
+            "precision": self._precision
+        }
+
+
+class ServerArguments:
+    """
+    Encapsulate the arguments of the 'serve' command
+    """
+
+    @staticmethod
+    def read_from(command_line):
+        parser = ServerArguments._prepare_parser()
+        arguments = parser.parse_args(command_line)
+        return ServerArguments(arguments.host, arguments.port, arguments.workers)
+
+    @staticmethod
+    def _prepare_parser():
+        from argparse import ArgumentParser
+        parser = ArgumentParser(
+            "hdg-from serve",
+            description="Serve HDG conversions over HTTP")
+        parser.add_argument(
+            "--host",
+            default="127.0.0.1",
+            help="The address to listen on")
+        parser.add_argument(
+            "-p", "--port",
+            type=int,
+            default=8080,
+            help="The port to listen on")
+        parser.add_argument(
+            "--workers",
+            type=int,
+            help="The number of worker processes that run conversions")
+        return parser
+
+    def __init__(self, host, port, workers):
+        self._host = host
+        self._port = port
+        self._workers = workers
+
+    @property
+    def host(self):
+        return self._host
+
+    @property
+    def port(self):
+        return self._port
+
+    @property
+    def workers(self):
+        return self._workers
+
+
+class CatalogArguments:
+    """
+    Encapsulate the arguments of the 'catalog' command
+    """
+
+    @staticmethod
+    def read_from(command_line):
+        parser = CatalogArguments._prepare_parser()
+        arguments = parser.parse_args(command_line)
+        return CatalogArguments(arguments.archive, arguments.index,
+                                arguments.water_body, arguments.start,
+                                arguments.end, arguments.extract)
+
+    @staticmethod
+    def _prepare_parser():
+        from argparse import ArgumentParser
+        parser = ArgumentParser(
+            "hdg-from catalog",
+            description="Index and query an archive of HDG files")
+        parser.add_argument(
+            "archive",
+            help="The directory that contains the HDG files")
+        parser.add_argument(
+            "--index",
+            help="The index file to maintain (default: ARCHIVE/.hdg-from.catalog)")
+        parser.add_argument(
+            "-w", "--water-body",
+            help="Only list the files of this water body")
+        parser.add_argument(
+            "--from",
+            dest="start",
+            help="Only list the files with observations from this date (e.g., 2017-01-01T00:00:00)")
+        parser.add_argument(
+            "--to",
+            dest="end",
+            help="Only list the files with observations until this date (e.g., 2017-12-31T23:59:59)")
+        parser.add_argument(
+            "--extract",
+            metavar="DIRECTORY",
+            help="Copy the observations of the listed files that fall between both dates into new HDG files")
+        return parser
+
+    def __init__(self, archive, index=None, water_body=None, start=None, end=None,
+                 extract=None):
+        self._archive = archive
+        self._index = index
+        self._water_body = water_body
+        self._start = start and Arguments._validate(start)
+        self._end = end and Arguments._validate(end)
+        self._extract = extract
+
+    @property
+    def archive(self):
+        return self._archive
+
+    @property
+    def index(self):
+        return self._index
+
+    @property
+    def water_body(self):
+        return self._water_body
+
+    @property
+    def start(self):
+        return self._start
+
+    @property
+    def end(self):
+        return self._end
+
+    @property
+    def extract(self):
+        return self._extract
+
 
 class Display:
     """
@@ -144,11 +628,73 @@ class Display:
         "File '{file}' successfully generated.\n"
     )
 
+    SERVING = (
+        "Serving conversions on http://{host}:{port}/convert (statistics on /stats).\n"
+    )
+
+    SERVER_STOPPED = (
+        "Server stopped.\n"
+    )
+
+    CONVERSION_SKIPPED = (
+        "File '{file}' is up to date.\n"
+    )
+
+    CATALOG_REFRESHED = (
+        "Catalog '{index}' refreshed: {added} file(s) added, {updated} updated,"
+        " {removed} removed and {unchanged} unchanged.\n"
+    )
+
+    CATALOG_ENTRY = (
+        "{file}: '{water_body}', {rows} row(s) in {unit}, from {first} to {last}.\n"
+    )
+
+    CATALOG_EXTRACTED = (
+        "{rows} row(s) extracted from '{source}' into '{file}'.\n"
+    )
+
+    WARNING_INVALID_HDG_FILES = (
+        "WARNING: {count} file(s) ignored, whose header is not a valid HDG header.\n"
+    )
+
     WARNING_ALL_ZERO_FLOW = (
         "WARNING: The conversion to '{unit}' leads to only near-zero values\n"
-        "         You may need a different unit.\n"
+        "         You may need a different unit, or a higher precision.\n"
+    )
+
+    WARNING_IRREGULAR_SERIES = (
+        "WARNING: Irregular time series (reporting step: {step} s)\n"
+        "         {gaps} gap(s) ({missing} missing observation(s)),\n"
+        "         {duplicates} duplicated and {disorders} out-of-order timestamp(s).\n"
+    )
+
+    SERIES_REPAIRED = (
+        "{filled} observation(s) filled and {dropped} duplicate(s) dropped.\n"
+    )
+
+    WARNING_MALFORMED_ROWS = (
+        "WARNING: {skipped} malformed row(s) skipped and {repaired} repaired.\n"
+    )
+
+    ROW_ERROR = (
+        "         line {line} (byte {offset}): {reason}\n"
+    )
+
+    MORE_ROW_ERRORS = (
+        "         ... and {count} more.\n"
+    )
+
+    PROGRESS = (
+        "{phase}: {rows} row(s), {megabytes:.1f} MB, "
+        "{rows_per_second:.0f} rows/s, {megabytes_per_second:.1f} MB/s, {status}\n"
     )
 
+    PROGRESS_ETA = "{percent:.0f}% done, ETA {eta}"
+
+    PROGRESS_UNKNOWN_ETA = "ETA unknown"
+
+    PROGRESS_DONE = "done in {elapsed}"
+
     ERROR_INPUT_FILE_NOT_FOUND = (
         "ERROR: Unable to open the input file '{file}'.\n"
         "       {hint}\n"
@@ -159,22 +705,151 @@ class Display:
         "       ISO 8601 format is YYYY-MM-DDThh:mm:ss.\n"
     )
 
+    ERROR_INVALID_TARGET = (
+        "ERROR: The value '{target}' is not a valid target.\n"
+        "       Targets are formatted as PATH[,unit=U][,start-date=D][,user-name=N][,water-body=W].\n"
+    )
+
+    ERROR_TOO_MANY_ERRORS = (
+        "ERROR: More than {budget} malformed row(s), conversion aborted.\n"
+    )
+
+    ERROR_UNAVAILABLE_BACKEND = (
+        "ERROR: The '{backend}' backend is not available.\n"
+        "       Install it with 'pip install hdgfrom[{backend}]'.\n"
+    )
+
+    ERROR_ARCHIVE_NOT_FOUND = (
+        "ERROR: Unable to open the archive '{directory}'.\n"
+        "       {hint}\n"
+    )
+
+    ERROR_STANDARD_STREAM = (
+        "ERROR: The option '{option}' cannot be used with the standard input or output.\n"
+    )
+
+    ERROR_INCOMPATIBLE_OPTIONS = (
+        "ERROR: The options '{option}' and '{other_option}' cannot be used together.\n"
+    )
+
+    MAX_ROW_ERRORS = 10
+
     def __init__(self, output):
         self._output = output or stdout
+        self._on_console = output is None
 
-    def input_file_loaded(self, path, flow):
+    @property
+    def on_console(self):
+        return self._on_console
+
+    def input_file_loaded(self, path, count):
         self._display(self.INPUT_FILE_LOADED,
                       file=path,
-                      count=len(flow.observations))
+                      count=count)
 
     def conversion_complete(self, path):
         self._display(self.CONVERSION_COMPLETE,
                       file=path)
 
+    def serving(self, host, port):
+        self._display(self.SERVING,
+                      host=host,
+                      port=port)
+
+    def server_stopped(self):
+        self._display(self.SERVER_STOPPED)
+
+    def conversion_skipped(self, path):
+        self._display(self.CONVERSION_SKIPPED,
+                      file=path)
+
+    def catalog_refreshed(self, index, summary):
+        self._display(self.CATALOG_REFRESHED,
+                      index=index,
+                      added=summary.added,
+                      updated=summary.updated,
+                      removed=summary.removed,
+                      unchanged=summary.unchanged)
+        if summary.rejected:
+            self._display(self.WARNING_INVALID_HDG_FILES,
+                          count=summary.rejected)
+
+    def catalog_entry(self, entry):
+        self._display(self.CATALOG_ENTRY,
+                      file=entry.path,
+                      water_body=entry.water_body,
+                      rows=entry.row_count,
+                      unit=entry.unit,
+                      first=entry.first_date,
+                      last=entry.last_date)
+
+    def rows_extracted(self, source, path, count):
+        self._display(self.CATALOG_EXTRACTED,
+                      rows=count,
+                      source=source,
+                      file=path)
+
     def warn_about_only_zeros(self, unit):
         self._display(self.WARNING_ALL_ZERO_FLOW,
                       unit=unit.symbol)
 
+    def series_checked(self, report):
+        if not report.is_regular:
+            self._display(self.WARNING_IRREGULAR_SERIES,
+                          step=report.step,
+                          gaps=report.gaps,
+                          missing=report.missing,
+                          duplicates=report.duplicates,
+                          disorders=report.disorders)
+        if report.filled or report.dropped:
+            self._display(self.SERIES_REPAIRED,
+                          filled=report.filled,
+                          dropped=report.dropped)
+
+    def rows_rejected(self, errors):
+        if len(errors) == 0:
+            return
+        self._display(self.WARNING_MALFORMED_ROWS,
+                      skipped=errors.skipped,
+                      repaired=errors.repaired)
+        for index, each_error in enumerate(errors):
+            if index == self.MAX_ROW_ERRORS:
+                self._display(self.MORE_ROW_ERRORS,
+                              count=len(errors) - index)
+                break
+            self._display(self.ROW_ERROR,
+                          line=each_error.line,
+                          offset=each_error.offset,
+                          reason=each_error.reason)
+
+    MEGABYTE = 1 << 20
+
+    def progress(self, report):
+        if report.done:
+            status = self.PROGRESS_DONE.format(elapsed=self._duration(report.elapsed))
+        elif report.eta is None:
+            status = self.PROGRESS_UNKNOWN_ETA
+        else:
+            status = self.PROGRESS_ETA.format(percent=100 * report.fraction,
+                                              eta=self._duration(report.eta))
+        self._display(self.PROGRESS,
+                      phase=report.phase.capitalize(),
+                      rows=report.rows,
+                      megabytes=report.size / self.MEGABYTE,
+                      rows_per_second=report.rows_per_second,
+                      megabytes_per_second=report.bytes_per_second / self.MEGABYTE,
+                      status=status)
+        self._output.flush()
+
+    def progress_as_json(self, report):
+        from json import dumps
+        self._output.write(dumps(report.as_dictionary(), sort_keys=True) + "\n")
+        self._output.flush()
+
+    @staticmethod
+    def _duration(seconds):
+        return str(timedelta(seconds=int(round(seconds))))
+
     def error_input_file_not_found(self, arguments, error):
         self._display(self.ERROR_INPUT_FILE_NOT_FOUND,
                       file=arguments.input_file,
@@ -184,6 +859,32 @@ class Display:
         self._display(self.ERROR_INVALID_DATE,
                       date=date)
 
+    def error_invalid_target(self, target):
+        self._display(self.ERROR_INVALID_TARGET,
+                      target=target)
+
+    def error_too_many_errors(self, budget):
+        self._display(self.ERROR_TOO_MANY_ERRORS,
+                      budget=budget)
+
+    def error_unavailable_backend(self, backend):
+        self._display(self.ERROR_UNAVAILABLE_BACKEND,
+                      backend=backend)
+
+    def error_archive_not_found(self, directory, error):
+        self._display(self.ERROR_ARCHIVE_NOT_FOUND,
+                      directory=directory,
+                      hint=error.strerror)
+
+    def error_standard_stream(self, option):
+        self._display(self.ERROR_STANDARD_STREAM,
+                      option=option)
+
+    def error_incompatible_options(self, option, other_option):
+        self._display(self.ERROR_INCOMPATIBLE_OPTIONS,
+                      option=option,
+                      other_option=other_option)
+
     def _display(self, message, **arguments):
         text = message.format(**arguments)
         self._output.write(text)
@@ -196,36 +897,348 @@ class CLI:
     """
 
 
-    def __init__(self, adapters=None, output=None):
-        self._adapters = adapters or AdapterLibrary()
+    def __init__(self, adapters=None, output=None, sorter=None):
+        self._adapters = adapters
         self._display = Display(output)
+        self._sorter = sorter
+
+    @property
+    def _library(self):
+        if self._adapters is None:
+            from hdgfrom.adapters import AdapterLibrary
+            self._adapters = AdapterLibrary()
+        return self._adapters
+
+    SERVE = "serve"
+    CATALOG = "catalog"
 
     def run(self, command_line):
+        if command_line and command_line[0] == self.SERVE:
+            self._serve(ServerArguments.read_from(command_line[1:]))
+            return
+
+        if command_line and command_line[0] == self.CATALOG:
+            self._run_catalog(command_line[1:])
+            return
+
         try:
             arguments = Arguments.read_from(command_line)
-            flow = self._read_flow_from(arguments.input_format, arguments.input_file)
-            flow = self._convert_to_unit(flow, arguments.unit)
-            self._adjust_metadata(flow, arguments)
-            self._write_flow_to(flow, FileFormats.HDG, arguments.output_file)
+            if arguments.writes_to_standard_output and self._display.on_console:
+                self._display = Display(stderr)
+            select_backend(arguments.backend, size_of(arguments.input_file))
+            if arguments.incremental:
+                self._run_incremental(arguments)
+            else:
+                self._convert(arguments)
 
         except InvalidDateError as error:
             self._display.error_invalid_date(error.date)
 
+        except InvalidTargetError as error:
+            self._display.error_invalid_target(error.target)
+
+        except TooManyErrorsError as error:
+            self._display.error_too_many_errors(error.budget)
+
+        except UnavailableBackendError as error:
+            self._display.error_unavailable_backend(error.backend)
+
+        except StandardStreamError as error:
+            self._display.error_standard_stream(error.option)
+
+        except IncompatibleOptionsError as error:
+            self._display.error_incompatible_options(error.option, error.other_option)
+
         except IOError as e:
             self._display.error_input_file_not_found(arguments, e)
 
-    def _read_flow_from(self, file_format, path):
-        with open(path, "r") as input_file:
-            flow = self._adapters.read_from(file_format, input_file)
-            self._display.input_file_loaded(path, flow)
-            return flow
+    def _serve(self, arguments):
+        from hdgfrom.server import ConversionServer
+        server = ConversionServer((arguments.host, arguments.port),
+                                  arguments.workers)
+        self._display.serving(*server.server_address[:2])
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self._display.server_stopped()
 
-    def _convert_to_unit(self, flow, unit):
+    def _run_catalog(self, command_line):
+        try:
+            arguments = CatalogArguments.read_from(command_line)
+            self._catalog(arguments)
+
+        except InvalidDateError as error:
+            self._display.error_invalid_date(error.date)
+
+        except IOError as error:
+            self._display.error_archive_not_found(arguments.archive, error)
+
+    def _catalog(self, arguments):
+        from hdgfrom.catalog import Catalog
+        with Catalog.of(arguments.archive, arguments.index) as catalog:
+            self._display.catalog_refreshed(catalog.index, catalog.refresh())
+            entries = catalog.find(arguments.water_body, arguments.start, arguments.end)
+            for each_entry in entries:
+                self._display.catalog_entry(each_entry)
+                if arguments.extract is not None:
+                    path = join(arguments.extract,
+                                relpath(each_entry.path, abspath(arguments.archive)))
+                    if not isdir(dirname(path)):
+                        makedirs(dirname(path))
+                    count = catalog.extract(each_entry, path,
+                                            arguments.start, arguments.end)
+                    self._display.rows_extracted(each_entry.path, path, count)
+
+    def _run_incremental(self, arguments):
+        from hdgfrom.manifest import Manifest
+        manifest = Manifest.next_to(arguments.output_file)
+        if manifest.is_up_to_date(arguments.input_file,
+                                  arguments.output_file,
+                                  arguments.options):
+            self._display.conversion_skipped(arguments.output_file)
+        else:
+            outputs = self._convert(arguments)
+            manifest.record(arguments.input_file,
+                            arguments.output_file,
+                            arguments.options,
+                            outputs)
+        manifest.save()
+
+    def _convert(self, arguments):
+        """
+        Convert the input file and return the paths of the files produced
+        """
+        from hdgfrom.diagnostics import ErrorLog
+        from hdgfrom.memory import Strategy
+        errors = ErrorLog(arguments.max_errors) if arguments.lenient else None
+        progress = self._progress_for(arguments)
+        strategy = self._strategy_for(arguments)
+        outputs = [arguments.output_file]
+        if strategy == Strategy.STREAMING:
+            self._run_pipeline(arguments, errors, progress)
+
+        elif arguments.fan_out:
+            self._run_fan_out(arguments, errors, strategy, progress)
+            outputs = [each_target.path for each_target in arguments.targets]
+
+        else:
+            if arguments.sort or strategy == Strategy.EXTERNAL:
+                flow = self._read_spilled_flow_from(arguments, errors, arguments.unit,
+                                                    progress)
+                self._check_for_zeros(flow, arguments.resolution)
+            else:
+                flow = self._read_flow_from(arguments.input_format,
+                                            arguments.input_file,
+                                            errors,
+                                            arguments.mapped,
+                                            progress,
+                                            arguments.buffer_size,
+                                            arguments.block_size)
+                flow = self._convert_to_unit(flow, arguments.unit, arguments.resolution)
+            flows = [flow]
+            try:
+                flow = self._validate(flow, arguments)
+                flows.append(flow)
+                self._adjust_metadata(flow, arguments)
+                if arguments.split:
+                    parts = self._write_partitioned_flow_to(flow, arguments)
+                    outputs = [each_part.path for each_part in parts]
+                elif arguments.workers and strategy == Strategy.IN_MEMORY:
+                    self._write_flow_in_parallel_to(flow, arguments.output_file,
+                                                    arguments.workers, arguments.precision)
+                else:
+                    from hdgfrom.adapters import HDGWriter
+                    self._write_flow_to(flow, HDGWriter(arguments.precision),
+                                        arguments.output_file, progress,
+                                        arguments.buffer_size)
+            finally:
+                for each_flow in flows:
+                    each_flow.close()
+
+        if errors is not None:
+            self._report_errors(errors, arguments.error_log)
+        return outputs
+
+    def _progress_for(self, arguments):
+        from hdgfrom.progress import Progress, ProgressFormats
+        if arguments.progress == ProgressFormats.HUMAN:
+            return Progress(self._display.progress)
+        if arguments.progress == ProgressFormats.JSON:
+            return Progress(self._display.progress_as_json)
+        return None
+
+    @staticmethod
+    def _start_reading(progress, path):
+        if progress is not None:
+            progress.start(progress.READING, total_size=size_of(path))
+
+    @staticmethod
+    def _finish(progress):
+        if progress is not None:
+            progress.finish()
+
+    @staticmethod
+    def _strategy_for(arguments):
+        from hdgfrom.memory import Strategy
+        if arguments.max_memory is None:
+            return Strategy.STREAMING if arguments.pipeline else Strategy.IN_MEMORY
+        return arguments.max_memory.strategy_for(size_of(arguments.input_file),
+                                                 arguments.streamable)
+
+    def _run_pipeline(self, arguments, errors, progress=None):
+        from hdgfrom.adapters import HDGWriter
+        from hdgfrom.pipeline import Pipeline
+        batch_size = arguments.batch_size or Pipeline.DEFAULT_BATCH_SIZE
+        queue_depth = arguments.queue_depth or Pipeline.DEFAULT_QUEUE_DEPTH
+        if arguments.max_memory is not None:
+            batch_size = arguments.max_memory.batch_size(queue_depth, batch_size)
+        pipeline = Pipeline(self._library,
+                            writer=HDGWriter(arguments.precision),
+                            batch_size=batch_size,
+                            queue_depth=queue_depth,
+                            mapped=arguments.mapped,
+                            progress=progress,
+                            buffer_size=arguments.buffer_size,
+                            block_size=arguments.block_size)
+        self._start_reading(progress, arguments.input_file)
+        summary = pipeline.convert(arguments.input_format,
+                                   arguments.input_file,
+                                   arguments.output_file,
+                                   arguments.unit,
+                                   arguments.start_date,
+                                   arguments.user_name,
+                                   arguments.water_body,
+                                   errors)
+        self._finish(progress)
+        self._display.input_file_loaded(arguments.input_file, summary.count)
+        if summary.contains_only_values_smaller_than(arguments.resolution):
+            self._display.warn_about_only_zeros(summary.unit)
+        self._display.conversion_complete(arguments.output_file)
+
+    def _run_fan_out(self, arguments, errors, strategy, progress=None):
+        from hdgfrom.adapters import HDGWriter
+        from hdgfrom.fanout import FanOutWriter
+        from hdgfrom.memory import Strategy
+        from hdgfrom.validation import SeriesValidator
+        if arguments.sort or strategy == Strategy.EXTERNAL:
+            flow = self._read_spilled_flow_from(arguments, errors, progress=progress)
+        else:
+            flow = self._read_flow_from(arguments.input_format,
+                                        arguments.input_file,
+                                        errors,
+                                        arguments.mapped,
+                                        progress,
+                                        arguments.buffer_size,
+                                        arguments.block_size)
+        flows = [flow]
+        try:
+            flow = self._validate(flow, arguments)
+            flows.append(flow)
+            largest = max([value for _, value in flow.records
+                           if value != SeriesValidator.MISSING_VALUE] or [0.])
+            for each_target in arguments.targets:
+                if each_target.unit.from_CMD(flow.unit.to_CMD(largest)) < arguments.resolution:
+                    self._display.warn_about_only_zeros(each_target.unit)
+            FanOutWriter(writer=HDGWriter(arguments.precision),
+                         missing_value=SeriesValidator.MISSING_VALUE,
+                         buffer_size=arguments.buffer_size)\
+                .write_to(flow, arguments.targets)
+        finally:
+            for each_flow in flows:
+                each_flow.close()
+        for each_target in arguments.targets:
+            self._display.conversion_complete(each_target.path)
+
+    def _report_errors(self, errors, path):
+        self._display.rows_rejected(errors)
+        if path is not None:
+            with open(path, "w") as error_log:
+                errors.write_to(error_log)
+
+    def _read_flow_from(self, file_format, path, errors=None, mapped=False,
+                        progress=None, buffer_size=None, block_size=None):
+        self._start_reading(progress, path)
+        if mapped:
+            flow = self._library.read_from_path(file_format, path, errors, progress,
+                                                 block_size)
+        else:
+            with open_input(path, buffer_size) as input_file:
+                flow = self._library.read_from(file_format, input_file, errors,
+                                                progress)
+        self._finish(progress)
+        self._display.input_file_loaded(path, len(flow.observations))
+        return flow
+
+    def _read_spilled_flow_from(self, arguments, errors=None, unit=None,
+                                progress=None):
+        """
+        Read the flow into a temporary file, sorting it on the way if
+        requested, and converting it if a unit is given
+        """
+        path = arguments.input_file
+        self._start_reading(progress, path)
+        if arguments.mapped:
+            water_body, source_unit, records = \
+                self._library.read_records_from_path(arguments.input_format,
+                                                      path,
+                                                      errors,
+                                                      progress,
+                                                      arguments.block_size)
+            return self._spill_flow(arguments, water_body, source_unit, records, unit,
+                                    progress)
+
+        with open_input(path, arguments.buffer_size) as input_file:
+            water_body, source_unit, records = \
+                self._library.read_records_from(arguments.input_format,
+                                                 input_file,
+                                                 errors,
+                                                 progress)
+            return self._spill_flow(arguments, water_body, source_unit, records, unit,
+                                    progress)
+
+    def _spill_flow(self, arguments, water_body, source_unit, records, unit,
+                    progress=None):
+        from hdgfrom.sorting import RecordObservations, spill
+        if unit is not None:
+            records = ((seconds, unit.from_CMD(source_unit.to_CMD(value)))
+                       for seconds, value in records)
+        if arguments.sort:
+            records = self._sorter_for(arguments).sort(records)
+        else:
+            records = spill(records)
+        self._finish(progress)
+        flow = Flow(water_body, RecordObservations(records, unit or source_unit))
+        self._display.input_file_loaded(arguments.input_file, len(flow.observations))
+        return flow
+
+    def _sorter_for(self, arguments):
+        from hdgfrom.sorting import ExternalSorter
+        if arguments.max_memory is not None:
+            return ExternalSorter(run_size=arguments.max_memory.run_size())
+        if self._sorter is None:
+            self._sorter = ExternalSorter()
+        return self._sorter
+
+    def _convert_to_unit(self, flow, unit, resolution):
         new_flow = flow.convert_to(unit)
-        if new_flow.contains_only_values_smaller_than(1e-2):
-            self._display.warn_about_only_zeros(new_flow.unit)
+        self._check_for_zeros(new_flow, resolution)
         return new_flow
 
+    def _check_for_zeros(self, flow, resolution):
+        if flow.contains_only_values_smaller_than(resolution):
+            self._display.warn_about_only_zeros(flow.unit)
+
+    def _validate(self, flow, arguments):
+        from hdgfrom.validation import SeriesValidator
+        validator = SeriesValidator(arguments.filling,
+                                    arguments.drop_duplicates)
+        flow, report = validator.repair(flow)
+        self._display.series_checked(report)
+        return flow
+
     def _adjust_metadata(self, flow, arguments):
         flow.start_date = arguments.start_date
         if arguments.include_user_name:
@@ -233,11 +1246,31 @@ class CLI:
         if arguments.include_water_body:
             flow.water_body = arguments.water_body
 
-    def _write_flow_to(self, flow, format, path):
-        with open(path, "w") as output:
-            self._adapters.write_to(flow, format, output)
+    def _write_flow_to(self, flow, writer, path, progress=None, buffer_size=None):
+        if progress is not None:
+            progress.start(progress.WRITING, total_rows=len(flow.observations))
+        with open_output(path, buffer_size, binary=True) as output:
+            writer.write_to(flow, output, progress)
+            self._finish(progress)
             self._display.conversion_complete(path)
 
+    def _write_flow_in_parallel_to(self, flow, path, workers, precision):
+        from hdgfrom.adapters import HDGWriter
+        from hdgfrom.parallel import ParallelHDGWriter
+        ParallelHDGWriter(HDGWriter(precision), workers=workers).write_to_path(flow, path)
+        self._display.conversion_complete(path)
+
+    def _write_partitioned_flow_to(self, flow, arguments):
+        from hdgfrom.adapters import HDGWriter
+        from hdgfrom.partition import PartitionedHDGWriter
+        parts = PartitionedHDGWriter(HDGWriter(arguments.precision),
+                                     workers=arguments.workers)\
+            .write_to_path(flow, arguments.output_file,
+                           arguments.split_by, arguments.max_rows)
+        for each_part in parts:
+            self._display.conversion_complete(each_part.path)
+        return parts
+
 
 def main():
     """
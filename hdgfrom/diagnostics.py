@@ -0,0 +1,107 @@
+#
+# hdg-from -- Generate HDG files for GEMSS
+#
+# Copyright (C) 2017 Di WU
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the MIT license.  See the LICENSE file for details.
+#
+
+# Compatibility with Pyhton 2.7
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from array import array
+
+from hdgfrom.backends import TIME_TYPECODE
+from hdgfrom.errors import TooManyErrorsError
+
+
+class RowError:
+    """
+    A row that could not be read as is
+    """
+
+    def __init__(self, line, offset, reason, skipped):
+        self._line = line
+        self._offset = offset
+        self._reason = reason
+        self._skipped = skipped
+
+    @property
+    def line(self):
+        return self._line
+
+    @property
+    def offset(self):
+        return self._offset
+
+    @property
+    def reason(self):
+        return self._reason
+
+    @property
+    def skipped(self):
+        return self._skipped
+
+
+class ErrorLog:
+    """
+    Collect the rows that readers had to skip or to repair, in compact
+    typed arrays (line numbers and offsets take the 64-bit typecode of
+    times). Once more rows than the given budget have been skipped,
+    reading is aborted.
+    """
+
+    MALFORMED_ROW = 0
+    INVALID_NUMBER = 1
+    NEGATIVE_RATE = 2
+    REPAIRED_ROW = 3
+
+    REASONS = [ "malformed row",
+                "invalid number",
+                "negative rate",
+                "repaired row" ]
+
+    def __init__(self, budget=None):
+        self._budget = budget
+        self._lines = array(TIME_TYPECODE)
+        self._offsets = array(TIME_TYPECODE)
+        self._reasons = array(str("B"))
+        self._skipped = 0
+
+    @property
+    def budget(self):
+        return self._budget
+
+    @property
+    def skipped(self):
+        return self._skipped
+
+    @property
+    def repaired(self):
+        return len(self._reasons) - self._skipped
+
+    def __len__(self):
+        return len(self._reasons)
+
+    def __iter__(self):
+        for line, offset, reason in zip(self._lines, self._offsets, self._reasons):
+            yield RowError(line, offset, self.REASONS[reason],
+                           reason != self.REPAIRED_ROW)
+
+    def record(self, line, offset, reason):
+        self._lines.append(line)
+        self._offsets.append(offset)
+        self._reasons.append(reason)
+        if reason != self.REPAIRED_ROW:
+            self._skipped += 1
+            if self._budget is not None and self._skipped > self._budget:
+                raise TooManyErrorsError(self._budget)
+
+    def write_to(self, output_stream):
+        output_stream.write("line,offset,reason\n")
+        for each_error in self:
+            output_stream.write("%d,%d,%s\n" % (each_error.line,
+                                                each_error.offset,
+                                                each_error.reason))
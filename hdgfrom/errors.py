@@ -12,12 +12,101 @@
 from __future__ import absolute_import, division, print_function, unicode_literals
 
 
-class InvalidDateError(Exception):
+class HDGFromError(Exception):
+    """
+    Base class of the errors that hdg-from reports
+    """
+    pass
+
+
+class InvalidDateError(HDGFromError):
 
     def __init__(self, date):
+        super(InvalidDateError, self).__init__(date)
         self._date = date
 
     @property
     def date(self):
         return self._date
 
+
+class TooManyErrorsError(HDGFromError):
+
+    def __init__(self, budget):
+        super(TooManyErrorsError, self).__init__(budget)
+        self._budget = budget
+
+    @property
+    def budget(self):
+        return self._budget
+
+
+class InvalidTargetError(HDGFromError):
+
+    def __init__(self, target):
+        super(InvalidTargetError, self).__init__(target)
+        self._target = target
+
+    @property
+    def target(self):
+        return self._target
+
+
+class InvalidInputError(HDGFromError):
+
+    def __init__(self, reason):
+        super(InvalidInputError, self).__init__(reason)
+        self._reason = reason
+
+    @property
+    def reason(self):
+        return self._reason
+
+
+class InvalidUnitError(HDGFromError):
+
+    def __init__(self, unit):
+        super(InvalidUnitError, self).__init__(unit)
+        self._unit = unit
+
+    @property
+    def unit(self):
+        return self._unit
+
+
+class UnavailableBackendError(HDGFromError):
+
+    def __init__(self, backend):
+        super(UnavailableBackendError, self).__init__(backend)
+        self._backend = backend
+
+    @property
+    def backend(self):
+        return self._backend
+
+
+class IncompatibleOptionsError(HDGFromError):
+
+    def __init__(self, option, other_option):
+        super(IncompatibleOptionsError, self).__init__(option, other_option)
+        self._option = option
+        self._other_option = other_option
+
+    @property
+    def option(self):
+        return self._option
+
+    @property
+    def other_option(self):
+        return self._other_option
+
+
+class StandardStreamError(HDGFromError):
+
+    def __init__(self, option):
+        super(StandardStreamError, self).__init__(option)
+        self._option = option
+
+    @property
+    def option(self):
+        return self._option
@@ -0,0 +1,104 @@
+#
+# hdg-from -- Generate HDG files for GEMSS
+#
+# Copyright (C) 2017 Di WU
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the MIT license.  See the LICENSE file for details.
+#
+
+# Compatibility with Pyhton 2.7
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from datetime import timedelta
+from itertools import islice
+
+from hdgfrom.adapters import HDGWriter
+from hdgfrom.streams import open_output
+
+
+class Target:
+    """
+    One HDG file to generate, with its own unit and metadata. Missing
+    metadata are taken from the flow.
+    """
+
+    def __init__(self, path, unit, start_date, user_name=None, water_body=None):
+        self._path = path
+        self._unit = unit
+        self._start_date = start_date
+        self._user_name = user_name
+        self._water_body = water_body
+
+    @property
+    def path(self):
+        return self._path
+
+    @property
+    def unit(self):
+        return self._unit
+
+    @property
+    def start_date(self):
+        return self._start_date
+
+    @property
+    def user_name(self):
+        return self._user_name
+
+    @property
+    def water_body(self):
+        return self._water_body
+
+
+class FanOutWriter:
+    """
+    Write the same flow into several HDG files at once, in a single pass
+    over its observations, taken by chunks. Each value is converted to
+    CMD once and then to the unit of each target, as Rate.convert_to
+    does. Values equal to the given missing value are left untouched.
+    """
+
+    CHUNK_SIZE = 1000
+
+    def __init__(self, writer=None, missing_value=None, buffer_size=None):
+        self._writer = writer or HDGWriter()
+        self._missing_value = missing_value
+        self._buffer_size = buffer_size
+
+    def write_to(self, flow, targets):
+        end = timedelta(seconds=flow.observations.seconds_at(-1))
+        source_unit = flow.unit
+        streams = []
+        try:
+            outputs = []
+            for each_target in targets:
+                output = open_output(each_target.path, self._buffer_size)
+                streams.append(output)
+                self._writer.write_header_to(
+                    output,
+                    water_body=each_target.water_body or flow.water_body,
+                    user_name=each_target.user_name or flow.user_name,
+                    start_date=each_target.start_date,
+                    end_date=each_target.start_date + end,
+                    observation_count=len(flow.observations),
+                    unit=each_target.unit)
+                outputs.append((each_target.start_date,
+                                each_target.unit.from_CMD,
+                                output.write))
+
+            records = iter(flow.records)
+            chunk = list(islice(records, self.CHUNK_SIZE))
+            while chunk:
+                cmd = [value if value == self._missing_value else source_unit.to_CMD(value)
+                       for _, value in chunk]
+                for start_date, from_CMD, write in outputs:
+                    converted = ((seconds, value if value == self._missing_value else from_CMD(value))
+                                 for (seconds, _), value in zip(chunk, cmd))
+                    write(self._writer.format_records(start_date, converted))
+                chunk = list(islice(records, self.CHUNK_SIZE))
+
+        finally:
+            for each_stream in reversed(streams):
+                each_stream.close()
@@ -10,16 +10,48 @@
 
 # Compatibility with Pyhton 2.7
 from __future__ import absolute_import, division, print_function, unicode_literals
+__metaclass__ = type
 
-from datetime import datetime
+from array import array
+from datetime import datetime, timedelta
+from math import copysign
 
+from hdgfrom.backends import TIME_TYPECODE, current_backend
 
-class Unit:
+
+_set = object.__setattr__
+
+
+class _Immutable:
+    """
+    Forbid changing the attributes of instances once built: these are
+    shared, and set with _set by their constructors only
+    """
+
+    __slots__ = ()
+
+    ERROR_IMMUTABLE = "'{type}' objects are immutable"
+
+    def __setattr__(self, name, value):
+        raise AttributeError(self.ERROR_IMMUTABLE.format(type=type(self).__name__))
+
+    def __delattr__(self, name):
+        raise AttributeError(self.ERROR_IMMUTABLE.format(type=type(self).__name__))
+
+
+class Unit(_Immutable):
+    """
+    A unit of flow rate. Units are immutable, and only the instances
+    listed in UNITS exist: they are compared by identity, and remain
+    the same when unpickled.
+    """
+
+    __slots__ = ("_symbol", "_name", "_factor_to_cmd")
 
     def __init__(self, symbol, name, factor_to_cmd):
-        self._symbol = symbol
-        self._name = name
-        self._factor_to_cmd = factor_to_cmd
+        _set(self, "_symbol", symbol)
+        _set(self, "_name", name)
+        _set(self, "_factor_to_cmd", factor_to_cmd)
 
     @property
     def symbol(self):
@@ -37,6 +69,9 @@ class Unit:
     def __repr__(self):
         return self._symbol
 
+    def __reduce__(self):
+        return (unit_by_name, (self._symbol,))
+
 
 UNITS = [
     Unit("CFS", "cubic feet per second", 2446.575),
@@ -49,19 +84,27 @@ UNITS = [
     Unit("MLD", "millions of liter per day", 1000)
 ]
 
+_UNITS_BY_SYMBOL = {}
+
+for each_unit in UNITS:
+    _UNITS_BY_SYMBOL[each_unit.symbol] = each_unit
+    setattr(Unit, each_unit.symbol, each_unit)
+
 def unit_by_name(symbol):
-    for any_unit in UNITS:
-        if any_unit.match_symbol(symbol):
-            return any_unit
-    raise ValueError("Unknown unit '%s'" % name)
+    unit = _UNITS_BY_SYMBOL.get(symbol.strip().upper())
+    if unit is None:
+        raise ValueError("Unknown unit '%s'" % symbol)
+    return unit
 
-setattr(Unit, "by_name", staticmethod(unit_by_name))
+Unit.by_name = staticmethod(unit_by_name)
 
-for each_unit in UNITS:
-    setattr(Unit, each_unit.symbol.upper(), each_unit)
 
+class Rate(_Immutable):
+    """
+    An immutable flow rate, with its unit
+    """
 
-class Rate:
+    __slots__ = ("_value", "_unit")
 
     ERROR_INVALID_RATE = "Rate cannot be negative, but found (value={})"
 
@@ -69,8 +112,8 @@ class Rate:
         if value < 0:
             message = self.ERROR_INVALID_RATE.format(value)
             raise ValueError(message)
-        self._value = value
-        self._unit = unit or Unit.LPS
+        _set(self, "_value", value)
+        _set(self, "_unit", unit or Unit.LPS)
 
     @property
     def value(self):
@@ -85,12 +128,34 @@ class Rate:
         converted = new_unit.from_CMD(cmd)
         return Rate(converted, new_unit)
 
+    def __reduce__(self):
+        return (Rate, (self._value, self._unit))
+
+
+_new = object.__new__
+
 
-class Observation:
+def _trusted_rate(value, unit):
+    """
+    Build a rate without validating its value, for values that come
+    from columns that were validated when read
+    """
+    rate = _new(Rate)
+    _set(rate, "_value", value)
+    _set(rate, "_unit", unit)
+    return rate
+
+
+class Observation(_Immutable):
+    """
+    An immutable flow rate, observed at a given time
+    """
+
+    __slots__ = ("_rate", "_time")
 
     def __init__(self, rate, time):
-        self._rate = rate
-        self._time = time
+        _set(self, "_rate", rate)
+        _set(self, "_time", time)
 
     @property
     def rate(self):
@@ -100,14 +165,159 @@ class Observation:
     def time(self):
         return self._time
 
+    def __reduce__(self):
+        return (Observation, (self._rate, self._time))
+
+
+_OFFSETS = {}
+
+_OFFSET_CACHE_SIZE = 1 << 16
+
+_RATE_CACHE_SIZE = 1 << 12
+
+
+def offset_of(seconds):
+    """
+    The time offset of the given number of seconds. Offsets are shared
+    by all flows, as those that follow the same reporting steps are
+    made of the same offsets. At most _OFFSET_CACHE_SIZE are kept.
+    """
+    offset = _OFFSETS.get(seconds)
+    if offset is None:
+        if len(_OFFSETS) >= _OFFSET_CACHE_SIZE:
+            _OFFSETS.clear()
+        offset = _OFFSETS[seconds] = timedelta(0, seconds)
+    return offset
+
+
+def observations_of(records, unit):
+    """
+    Build Observation objects from (seconds, value) records in the
+    given unit, whose values were validated when read. Equal rates are
+    shared within a pass, and offsets across flows (see offset_of).
+    """
+    offsets = _OFFSETS
+    rates = {}
+    for seconds, value in records:
+        offset = offsets.get(seconds)
+        if offset is None:
+            offset = offset_of(seconds)
+        rate = rates.get(value)
+        # -0.0 equals 0.0, but keeps its own rate to keep its sign
+        if rate is None or (value == 0 and copysign(1., value) < 0):
+            if len(rates) >= _RATE_CACHE_SIZE:
+                rates.clear()
+            rate = _trusted_rate(value, unit)
+            if value or copysign(1., value) > 0:
+                rates[value] = rate
+        observation = _new(Observation)
+        _set(observation, "_rate", rate)
+        _set(observation, "_time", offset)
+        yield observation
+
+
+def observation_of(seconds, value, unit):
+    """
+    A single observation, built as by observations_of
+    """
+    return Observation(_trusted_rate(value, unit), offset_of(seconds))
+
+
+class Observations:
+    """
+    A sequence of observations stored as two typed columns: their times,
+    as integer seconds since the start of the flow, and their values,
+    all in the same unit. Observation objects are only built on demand.
+    """
+
+    def __init__(self, seconds=None, values=None, unit=None):
+        self._seconds = seconds if seconds is not None else array(TIME_TYPECODE)
+        self._values = values if values is not None else array(str("d"))
+        self._unit = unit
+
+    @staticmethod
+    def from_list(observations):
+        unit = observations[0].rate.unit if observations else None
+        seconds = array(TIME_TYPECODE)
+        values = array(str("d"))
+        for each_observation in observations:
+            time = each_observation.time
+            rate = each_observation.rate
+            seconds.append(time.days * 86400 + time.seconds)
+            values.append(rate.value if rate.unit is unit else rate.convert_to(unit).value)
+        return Observations(seconds, values, unit)
+
+    @staticmethod
+    def from_records(records, unit):
+        seconds = array(TIME_TYPECODE)
+        values = array(str("d"))
+        for time, value in records:
+            seconds.append(time)
+            values.append(value)
+        return Observations(seconds, values, unit)
+
+    @property
+    def seconds(self):
+        return self._seconds
+
+    @property
+    def values(self):
+        return self._values
+
+    @property
+    def unit(self):
+        return self._unit
+
+    @property
+    def records(self):
+        return zip(self._seconds, self._values)
+
+    def seconds_at(self, index):
+        return self._seconds[index]
+
+    def __len__(self):
+        return len(self._seconds)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return Observations(self._seconds[index], self._values[index], self._unit)
+        return observation_of(self._seconds[index], self._values[index], self._unit)
+
+    def __iter__(self):
+        return observations_of(zip(self._seconds, self._values), self._unit)
+
+    def __eq__(self, other):
+        try:
+            if len(self) != len(other):
+                return False
+        except TypeError:
+            return NotImplemented
+        return all(mine.time == theirs.time
+                   and mine.rate.value == theirs.rate.value
+                   and mine.rate.unit is theirs.rate.unit
+                   for mine, theirs in zip(self, other))
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    __hash__ = None
+
 
 class Flow:
+    """
+    A time series of flow rates. Observations are kept as offsets, in
+    seconds, from the start date, so that changing the start date does
+    not touch them. Dates are only computed when needed.
+    """
 
     DEFAULT_USER_NAME = "Unknown"
     DEFAULT_WATER_BODY = "Unknown"
 
     def __init__(self, water_body=None, observations=[], start_date=None, user_name=None):
         self._water_body = water_body or self.DEFAULT_WATER_BODY
+        if not hasattr(observations, "records"):
+            observations = Observations.from_list(observations)
         self._observations = observations
         self._start_date = start_date or datetime(2017, 1, 1, 12)
         self._user_name = user_name or self.DEFAULT_USER_NAME
@@ -124,6 +334,24 @@ class Flow:
     def observations(self):
         return self._observations
 
+    @property
+    def records(self):
+        """
+        The (seconds, value) pairs of the observations
+        """
+        return self._observations.records
+
+    @property
+    def times(self):
+        """
+        The times of the observations, in seconds since the start date
+        """
+        return self._observations.seconds
+
+    @property
+    def values(self):
+        return self._observations.values
+
     def rate_at(self, time):
         return None
 
@@ -137,7 +365,7 @@ class Flow:
 
     @property
     def end_date(self):
-        return self._start_date + self._observations[-1].time
+        return self._start_date + timedelta(seconds=self._observations.seconds_at(-1))
 
     @property
     def user_name(self):
@@ -151,19 +379,34 @@ class Flow:
     def unit(self):
         if len(self._observations) == 0:
             return None
-        return self._observations[0].rate.unit
+        return self._observations.unit
 
     def convert_to(self, unit):
-        observations = []
-        for each_observation in self._observations:
-            observations.append(
-                Observation(
-                    each_observation.rate.convert_to(unit),
-                    each_observation.time))
+        source_unit = self.unit
+        if isinstance(self._observations, Observations):
+            seconds = self._observations.seconds
+            values = current_backend().convert(self._observations.values,
+                                               source_unit, unit)
+        else:
+            seconds = array(TIME_TYPECODE)
+            values = array(str("d"))
+            for time, value in self.records:
+                seconds.append(time)
+                values.append(unit.from_CMD(source_unit.to_CMD(value)))
         return Flow(self.water_body,
-                    observations,
+                    Observations(seconds, values, unit),
                     self._start_date,
                     self._user_name)
 
     def contains_only_values_smaller_than(self, threshold):
-        return all(o.rate.value < threshold for o in self._observations)
+        if isinstance(self._observations, Observations):
+            return current_backend().largest(self._observations.values) < threshold
+        return all(value < threshold for _, value in self.records)
+
+    def close(self):
+        """
+        Remove the temporary file of observations spilled to disk, if any
+        """
+        close = getattr(self._observations, "close", None)
+        if close is not None:
+            close()
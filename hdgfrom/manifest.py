@@ -0,0 +1,130 @@
+#
+# hdg-from -- Generate HDG files for GEMSS
+#
+# Copyright (C) 2017 Di WU
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the MIT license.  See the LICENSE file for details.
+#
+
+# Compatibility with Pyhton 2.7
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import os
+
+from hashlib import sha256
+from json import dump, load
+from os import stat
+from os.path import abspath, basename, dirname, isfile, join
+
+from hdgfrom import __VERSION__
+
+
+def _replace(source, target):
+    """
+    Move the source file onto the target one, as os.replace does from
+    Python 3.3. Before, os.rename only replaces existing files on POSIX.
+    """
+    if hasattr(os, "replace"):
+        os.replace(source, target)
+        return
+    if os.name == "nt" and isfile(target):
+        os.remove(target)
+    os.rename(source, target)
+
+
+class Manifest:
+    """
+    Record, next to the generated files, how each one was obtained (the
+    input file, the options, the version of hdg-from and all the files
+    the conversion produced), so that conversions whose inputs and
+    options are unchanged, and whose files are all there, can be skipped.
+
+    Inputs are first compared by size and modification time, and only
+    hashed again when their modification time changed.
+    """
+
+    FILE_NAME = ".hdg-from.json"
+
+    BLOCK_SIZE = 1 << 20
+
+    @staticmethod
+    def next_to(output_file):
+        path = join(dirname(abspath(output_file)), Manifest.FILE_NAME)
+        return Manifest.load_from(path)
+
+    @staticmethod
+    def load_from(path):
+        entries = {}
+        if isfile(path):
+            try:
+                with open(path, "r") as manifest_file:
+                    entries = load(manifest_file)
+            except ValueError:
+                entries = {}
+        return Manifest(path, entries)
+
+    def __init__(self, path, entries=None):
+        self._path = path
+        self._entries = entries or {}
+        self._changed = False
+
+    def is_up_to_date(self, input_file, output_file, options):
+        entry = self._entries.get(self._key_of(output_file))
+        if entry is None \
+           or entry["version"] != __VERSION__ \
+           or entry["options"] != options \
+           or not all(isfile(each_path)
+                      for each_path in entry.get("outputs", [output_file])):
+            return False
+
+        recorded = entry["input"]
+        status = stat(input_file)
+        if status.st_size != recorded["size"]:
+            return False
+        if status.st_mtime == recorded["mtime"]:
+            return True
+        if self._hash_of(input_file) != recorded["sha256"]:
+            return False
+        recorded["mtime"] = status.st_mtime
+        self._changed = True
+        return True
+
+    def record(self, input_file, output_file, options, outputs=None):
+        status = stat(input_file)
+        self._entries[self._key_of(output_file)] = {
+            "version": __VERSION__,
+            "options": options,
+            "outputs": [abspath(p) for p in outputs or [output_file]],
+            "input": {
+                "path": abspath(input_file),
+                "size": status.st_size,
+                "mtime": status.st_mtime,
+                "sha256": self._hash_of(input_file)
+            }
+        }
+        self._changed = True
+
+    def save(self):
+        if not self._changed:
+            return
+        draft = self._path + ".tmp"
+        with open(draft, "w") as manifest_file:
+            dump(self._entries, manifest_file, indent=2, sort_keys=True)
+        _replace(draft, self._path)
+        self._changed = False
+
+    @staticmethod
+    def _key_of(output_file):
+        return basename(output_file)
+
+    @staticmethod
+    def _hash_of(path):
+        digest = sha256()
+        with open(path, "rb") as input_file:
+            block = input_file.read(Manifest.BLOCK_SIZE)
+            while block:
+                digest.update(block)
+                block = input_file.read(Manifest.BLOCK_SIZE)
+        return digest.hexdigest()
@@ -0,0 +1,124 @@
+#
+# hdg-from -- Generate HDG files for GEMSS
+#
+# Copyright (C) 2017 Di WU
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the MIT license.  See the LICENSE file for details.
+#
+
+# Compatibility with Pyhton 2.7
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+
+class Strategy:
+    """
+    The ways a conversion can be run, from the fastest to the most
+    frugal
+    """
+
+    IN_MEMORY = "in-memory"
+    STREAMING = "streaming"
+    EXTERNAL = "external"
+
+
+class MemoryBudget:
+    """
+    Decide how to run a conversion so that it fits in the given amount
+    of memory (in bytes): entirely in memory when the input is small
+    enough, as a pipeline of bounded batches when possible, or by
+    spilling observations to temporary files otherwise. Batch and run
+    sizes are derived from the budget as well.
+
+    Costs are estimated from the shortest SWMM data lines and from the
+    memory that Python objects take per observation, or per byte of a
+    mapped input being parsed.
+    """
+
+    LINE_LENGTH = 16
+    OBSERVATION_COST = 600
+    RECORD_COST = 160
+    BLOCK_COST = 16
+
+    DATA_SHARE = 0.5
+
+    ERROR_INVALID_BUDGET = "Invalid memory budget '{text}' (e.g., 512M or 2G)"
+
+    SUFFIXES = {
+        "K": 1 << 10,
+        "M": 1 << 20,
+        "G": 1 << 30
+    }
+
+    @staticmethod
+    def parse(text):
+        return MemoryBudget(MemoryBudget.parse_size(text))
+
+    @staticmethod
+    def parse_size(text):
+        """
+        The number of bytes in the given size, such as 512K, 64M or 2GB
+        """
+        text = str(text).strip().upper()
+        factor = 1
+        if text[-1:] == "B":
+            text = text[:-1]
+        if text[-1:] in MemoryBudget.SUFFIXES:
+            factor = MemoryBudget.SUFFIXES[text[-1]]
+            text = text[:-1]
+        try:
+            size = int(float(text) * factor)
+        except ValueError:
+            raise ValueError(MemoryBudget.ERROR_INVALID_BUDGET.format(text=text))
+        if size <= 0:
+            raise ValueError(MemoryBudget.ERROR_INVALID_BUDGET.format(text=text))
+        return size
+
+    def __init__(self, limit):
+        self._limit = limit
+
+    @property
+    def limit(self):
+        return self._limit
+
+    @property
+    def _data_limit(self):
+        return int(self._limit * self.DATA_SHARE)
+
+    def fits_in_memory(self, input_size):
+        if input_size is None:
+            return False
+        rows = input_size // self.LINE_LENGTH + 1
+        return rows * self.OBSERVATION_COST <= self._data_limit
+
+    def strategy_for(self, input_size, streamable):
+        if self.fits_in_memory(input_size):
+            return Strategy.IN_MEMORY
+        if streamable:
+            return Strategy.STREAMING
+        return Strategy.EXTERNAL
+
+    def batch_size(self, queue_depth, largest=None):
+        """
+        The number of records per batch, so that all the batches in
+        flight in a pipeline (those queued and those held by each of
+        its stages) fit in the budget
+        """
+        batches = 2 * queue_depth + 4
+        size = max(1, self._data_limit // (self.RECORD_COST * batches))
+        return min(size, largest) if largest else size
+
+    def block_size(self):
+        """
+        The number of bytes of a mapped input that can be parsed at once,
+        given the objects created for each of its fields, leaving half of
+        the budget to the records parsed from previous blocks
+        """
+        return max(self.LINE_LENGTH, self._data_limit // (2 * self.BLOCK_COST))
+
+    def run_size(self):
+        """
+        The number of records that can be sorted at once in memory
+        """
+        return max(1, self._data_limit // (2 * self.RECORD_COST))
@@ -0,0 +1,111 @@
+#
+# hdg-from -- Generate HDG files for GEMSS
+#
+# Copyright (C) 2017 Di WU
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the MIT license.  See the LICENSE file for details.
+#
+
+# Compatibility with Pyhton 2.7
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import os
+
+from os.path import abspath, dirname, join
+from shutil import copyfileobj, rmtree
+from tempfile import mkdtemp
+
+from hdgfrom.adapters import HDGWriter
+
+
+def _format_chunk(start_date, seconds, values, path, precision):
+    """
+    Format a chunk of records into the given part file, with the given
+    number of decimals. Runs in a worker process.
+    """
+    block = bytearray()
+    HDGWriter(precision).format_into(block, start_date, seconds, values)
+    with open(path, "wb") as part:
+        part.write(block)
+    return path
+
+
+def append_file(source_path, target):
+    """
+    Append the content of the given file to the target binary file,
+    letting the kernel copy the data when the platform allows it. The
+    source is read at explicit offsets, so that a copy interrupted by
+    an error resumes where it stopped with the next method.
+    """
+    with open(source_path, "rb") as source:
+        size = os.fstat(source.fileno()).st_size
+        offset = 0
+        for copy in (_copy_file_range, _sendfile):
+            try:
+                while offset < size:
+                    copied = copy(source.fileno(), target.fileno(), offset, size - offset)
+                    if copied == 0:
+                        break
+                    offset += copied
+                if offset == size:
+                    return
+            except (AttributeError, OSError, TypeError):
+                continue
+        source.seek(offset)
+        target.seek(0, os.SEEK_END)
+        copyfileobj(source, target)
+
+
+def _copy_file_range(source, target, offset, count):
+    return os.copy_file_range(source, target, count, offset)
+
+
+def _sendfile(source, target, offset, count):
+    return os.sendfile(target, source, offset, count)
+
+
+class ParallelHDGWriter:
+    """
+    Write a flow as an HDG file by splitting its rows into chunks that
+    are formatted concurrently, each into its own part file, by a pool
+    of worker processes. The header and the parts are finally assembled
+    into the output file using kernel-side copies. The result is the
+    same as the one of the sequential HDGWriter.
+    """
+
+    DEFAULT_CHUNK_SIZE = 250000
+
+    def __init__(self, writer=None, workers=None, chunk_size=None):
+        self._writer = writer or HDGWriter()
+        self._workers = workers
+        self._chunk_size = chunk_size or self.DEFAULT_CHUNK_SIZE
+
+    def write_to_path(self, flow, path):
+        seconds = flow.times
+        values = flow.values
+
+        with open(path, "wb") as output:
+            self._writer.write_flow_header_to(flow, output)
+
+        from concurrent.futures import ProcessPoolExecutor
+        directory = mkdtemp(dir=dirname(abspath(path)))
+        try:
+            with ProcessPoolExecutor(self._workers) as pool:
+                parts = [pool.submit(_format_chunk,
+                                     flow.start_date,
+                                     seconds[start:start + self._chunk_size],
+                                     values[start:start + self._chunk_size],
+                                     join(directory, "part-%08d" % index),
+                                     self._writer.precision)
+                         for index, start in enumerate(
+                                 range(0, len(seconds), self._chunk_size))]
+
+                with open(path, "r+b") as output:
+                    output.seek(0, os.SEEK_END)
+                    for each_part in parts:
+                        append_file(each_part.result(), output)
+
+        finally:
+            rmtree(directory, ignore_errors=True)
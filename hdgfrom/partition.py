@@ -0,0 +1,245 @@
+#
+# hdg-from -- Generate HDG files for GEMSS
+#
+# Copyright (C) 2017 Di WU
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the MIT license.  See the LICENSE file for details.
+#
+
+# Compatibility with Pyhton 2.7
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from array import array
+from bisect import bisect_left
+from datetime import datetime, timedelta
+from io import StringIO
+from itertools import islice
+from os.path import splitext
+
+from hdgfrom.adapters import HDGWriter
+from hdgfrom.backends import TIME_TYPECODE, current_backend
+from hdgfrom.flow import Observations
+
+
+class Period:
+    """
+    The calendar periods by which an HDG file can be split
+    """
+
+    YEAR = "year"
+    MONTH = "month"
+
+    _ALL_PERIODS = [ YEAR,
+                     MONTH ]
+
+    ERROR_UNKNOWN_PERIOD = "Unknown period '{name}'."
+
+    @staticmethod
+    def match(name):
+        for any_period in Period._ALL_PERIODS:
+            if name.lower() == any_period:
+                return any_period
+
+        error = Period.ERROR_UNKNOWN_PERIOD.format(name=name)
+        raise ValueError(error)
+
+    @staticmethod
+    def label_of(period, date):
+        if period == Period.YEAR:
+            return "%04d" % date.year
+        return "%04d-%02d" % (date.year, date.month)
+
+    @staticmethod
+    def next_after(period, date):
+        if period == Period.YEAR:
+            return datetime(date.year + 1, 1, 1)
+        if date.month == 12:
+            return datetime(date.year + 1, 1, 1)
+        return datetime(date.year, date.month + 1, 1)
+
+
+class Part:
+    """
+    A contiguous range of observations, written into its own HDG file
+    """
+
+    def __init__(self, path, first, last):
+        self._path = path
+        self._first = first
+        self._last = last
+
+    @property
+    def path(self):
+        return self._path
+
+    @property
+    def first(self):
+        return self._first
+
+    @property
+    def last(self):
+        return self._last
+
+    def __len__(self):
+        return self._last - self._first
+
+    def __repr__(self):
+        return "Part(%r, %d, %d)" % (self._path, self._first, self._last)
+
+
+class _Times:
+    """
+    The times of the given observations, read one at a time, so that
+    observations kept in a file can be searched without loading them
+    """
+
+    def __init__(self, observations):
+        self._observations = observations
+
+    def __len__(self):
+        return len(self._observations)
+
+    def __getitem__(self, index):
+        return self._observations.seconds_at(index)
+
+
+def _write_part(header, start_date, seconds, values, path, precision):
+    """
+    Write one part, whose header is already formatted, with the given
+    number of decimals. Runs in a worker process.
+    """
+    block = bytearray(header.encode("utf-8"))
+    HDGWriter(precision).format_into(block, start_date, seconds, values)
+    with open(path, "wb") as output:
+        output.write(block)
+    return path
+
+
+class PartitionedHDGWriter:
+    """
+    Split a flow into several HDG files, by calendar period, by number
+    of rows, or both. Observations must be in chronological order, so
+    that the boundaries of the parts are found by binary search on the
+    time column. Each part has its own header: the first one starts
+    with the flow, the others at the date of their own first row, and
+    each ends at the date of its own last row. Parts of flows held in
+    memory are written concurrently by a pool of worker processes.
+    Parts of flows kept in a file are written one after the other, in
+    a single pass over the file, so that only one chunk of observations
+    is in memory at a time.
+    """
+
+    PART_NAME = "{stem}_{label}{extension}"
+
+    def __init__(self, writer=None, workers=None):
+        self._writer = writer or HDGWriter()
+        self._workers = workers
+
+    def partition(self, flow, path, period=None, max_rows=None):
+        seconds = self._times_of(flow)
+        return self._partition(seconds, flow.start_date, path, period, max_rows)
+
+    def write_to_path(self, flow, path, period=None, max_rows=None):
+        seconds = self._times_of(flow)
+        parts = self._partition(seconds, flow.start_date, path, period, max_rows)
+        if not isinstance(flow.observations, Observations):
+            self._write_sequentially(flow, seconds, parts)
+            return parts
+
+        values = flow.values
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(self._workers) as pool:
+            futures = [pool.submit(_write_part,
+                                   self._header_of(flow, seconds, each_part),
+                                   flow.start_date,
+                                   seconds[each_part.first:each_part.last],
+                                   values[each_part.first:each_part.last],
+                                   each_part.path,
+                                   self._writer.precision)
+                       for each_part in parts]
+            for each_future in futures:
+                each_future.result()
+        return parts
+
+    def _write_sequentially(self, flow, seconds, parts):
+        records = iter(flow.records)
+        chunk_size = current_backend().CHUNK_SIZE
+        for each_part in parts:
+            with open(each_part.path, "wb") as output:
+                block = bytearray(self._header_of(flow, seconds, each_part).encode("utf-8"))
+                remaining = len(each_part)
+                while remaining > 0:
+                    times = array(TIME_TYPECODE)
+                    values = array(str("d"))
+                    for time, value in islice(records, min(chunk_size, remaining)):
+                        times.append(time)
+                        values.append(value)
+                    remaining -= len(times)
+                    self._writer.format_into(block, flow.start_date, times, values)
+                    if len(block) >= HDGWriter.BLOCK_SIZE:
+                        output.write(block)
+                        del block[:]
+                output.write(block)
+
+    @staticmethod
+    def _times_of(flow):
+        if isinstance(flow.observations, Observations):
+            return flow.times
+        return _Times(flow.observations)
+
+    def _partition(self, seconds, start_date, path, period, max_rows):
+        ranges = [(None, 0, len(seconds))] if len(seconds) else []
+        if period is not None and len(seconds):
+            ranges = self._split_by_period(seconds, start_date, period)
+        if max_rows is not None:
+            ranges = [(label, first, min(first + max_rows, last))
+                      for label, start, last in ranges
+                      for first in range(start, last, max_rows)]
+
+        stem, extension = splitext(path)
+        counts = {}
+        for label, _, _ in ranges:
+            counts[label] = counts.get(label, 0) + 1
+        indexes = {}
+        parts = []
+        for label, first, last in ranges:
+            if counts[label] > 1 or label is None:
+                indexes[label] = indexes.get(label, 0) + 1
+                index = "%03d" % indexes[label]
+                label = index if label is None else label + "-" + index
+            parts.append(Part(self.PART_NAME.format(stem=stem,
+                                                    label=label,
+                                                    extension=extension),
+                              first, last))
+        return parts
+
+    @staticmethod
+    def _split_by_period(seconds, start_date, period):
+        ranges = []
+        first = 0
+        while first < len(seconds):
+            date = start_date + timedelta(seconds=seconds[first])
+            boundary = Period.next_after(period, date)
+            offset = (boundary - start_date).days * 86400 \
+                + (boundary - start_date).seconds
+            last = bisect_left(seconds, offset, first)
+            ranges.append((Period.label_of(period, date), first, last))
+            first = last
+        return ranges
+
+    def _header_of(self, flow, seconds, part):
+        start_date = flow.start_date
+        if part.first > 0:
+            start_date += timedelta(seconds=seconds[part.first])
+        header = StringIO()
+        self._writer.write_header_to(
+            header,
+            water_body=flow.water_body,
+            user_name=flow.user_name,
+            start_date=start_date,
+            end_date=flow.start_date + timedelta(seconds=seconds[part.last - 1]),
+            observation_count=len(part),
+            unit=flow.unit)
+        return header.getvalue()
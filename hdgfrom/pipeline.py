@@ -0,0 +1,200 @@
+#
+# hdg-from -- Generate HDG files for GEMSS
+#
+# Copyright (C) 2017 Di WU
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the MIT license.  See the LICENSE file for details.
+#
+
+# Compatibility with Pyhton 2.7
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from datetime import timedelta
+from itertools import islice
+from queue import Queue, Empty, Full
+from shutil import copyfileobj
+from tempfile import TemporaryFile
+from threading import Event, Thread
+
+from hdgfrom.flow import Flow
+from hdgfrom.adapters import AdapterLibrary, HDGWriter
+from hdgfrom.streams import open_input, open_output
+
+
+class PipelineSummary:
+    """
+    What the pipeline learnt about the flow while converting it
+    """
+
+    def __init__(self, water_body, unit, count, largest_value):
+        self._water_body = water_body
+        self._unit = unit
+        self._count = count
+        self._largest_value = largest_value
+
+    @property
+    def water_body(self):
+        return self._water_body
+
+    @property
+    def unit(self):
+        return self._unit
+
+    @property
+    def count(self):
+        return self._count
+
+    def contains_only_values_smaller_than(self, threshold):
+        return self._largest_value < threshold
+
+
+class _Aborted(Exception):
+    pass
+
+
+_END = object()
+
+
+class Pipeline:
+    """
+    Convert a file by running the reader, the unit conversion and the
+    writer as concurrent stages, connected by bounded queues of record
+    batches. Data lines are spooled to a temporary file, and appended to
+    the output once the header (which needs the end date and the number
+    of observations) is known.
+    """
+
+    DEFAULT_BATCH_SIZE = 10000
+    DEFAULT_QUEUE_DEPTH = 8
+
+    POLLING_DELAY = 0.1
+
+    def __init__(self, adapters=None, writer=None, batch_size=None,
+                 queue_depth=None, mapped=False, progress=None, buffer_size=None,
+                 block_size=None):
+        self._adapters = adapters or AdapterLibrary()
+        self._writer = writer or HDGWriter()
+        self._batch_size = batch_size or self.DEFAULT_BATCH_SIZE
+        self._queue_depth = queue_depth or self.DEFAULT_QUEUE_DEPTH
+        self._mapped = mapped
+        self._progress = progress
+        self._buffer_size = buffer_size
+        self._block_size = block_size
+
+    def convert(self, file_format, input_path, output_path, unit, start_date,
+                user_name=None, water_body=None, errors=None):
+        raw_batches = Queue(self._queue_depth)
+        converted_batches = Queue(self._queue_depth)
+        failed = Event()
+        failures = []
+        state = {}
+
+        with TemporaryFile("w+b") as spool:
+            stages = [
+                Thread(target=self._guard,
+                       args=(failed, failures, self._read,
+                             file_format, input_path, errors, raw_batches, failed)),
+                Thread(target=self._guard,
+                       args=(failed, failures, self._convert,
+                             unit, raw_batches, converted_batches, state, failed)),
+                Thread(target=self._guard,
+                       args=(failed, failures, self._format,
+                             start_date, converted_batches, spool, failed))
+            ]
+            for each_stage in stages:
+                each_stage.start()
+            for each_stage in stages:
+                each_stage.join()
+            if failures:
+                raise failures[0]
+
+            water_body = water_body or state["water_body"] or Flow.DEFAULT_WATER_BODY
+            last = state["last"]
+            with open_output(output_path, self._buffer_size, binary=True) as output:
+                self._writer.write_header_to(
+                    output,
+                    water_body=water_body,
+                    user_name=user_name or Flow.DEFAULT_USER_NAME,
+                    start_date=start_date,
+                    end_date=start_date + timedelta(seconds=last or 0),
+                    observation_count=state["count"],
+                    unit=unit)
+                spool.seek(0)
+                copyfileobj(spool, output)
+
+        return PipelineSummary(water_body, unit, state["count"], state["largest"])
+
+    def _read(self, file_format, input_path, errors, batches, failed):
+        if self._mapped:
+            water_body, source_unit, records = \
+                self._adapters.read_records_from_path(file_format, input_path,
+                                                      errors, self._progress,
+                                                      self._block_size)
+            self._batch(water_body, source_unit, records, batches, failed)
+        else:
+            with open_input(input_path, self._buffer_size) as input_file:
+                water_body, source_unit, records = \
+                    self._adapters.read_records_from(file_format, input_file,
+                                                     errors, self._progress)
+                self._batch(water_body, source_unit, records, batches, failed)
+        self._put(batches, _END, failed)
+
+    def _batch(self, water_body, source_unit, records, batches, failed):
+        self._put(batches, (water_body, source_unit), failed)
+        batch = list(islice(records, self._batch_size))
+        while batch:
+            self._put(batches, batch, failed)
+            batch = list(islice(records, self._batch_size))
+
+    def _convert(self, unit, raw_batches, converted_batches, state, failed):
+        water_body, source_unit = self._get(raw_batches, failed)
+        state.update(water_body=water_body, count=0, last=None,
+                     largest=float("-inf"))
+        batch = self._get(raw_batches, failed)
+        while batch is not _END:
+            converted = [(seconds, unit.from_CMD(source_unit.to_CMD(value)))
+                         for seconds, value in batch]
+            state["count"] += len(converted)
+            state["last"] = converted[-1][0]
+            state["largest"] = max(state["largest"],
+                                   max(value for _, value in converted))
+            self._put(converted_batches, converted, failed)
+            batch = self._get(raw_batches, failed)
+        self._put(converted_batches, _END, failed)
+
+    def _format(self, start_date, batches, spool, failed):
+        batch = self._get(batches, failed)
+        while batch is not _END:
+            spool.write(self._writer.format_records(start_date, batch).encode("ascii"))
+            batch = self._get(batches, failed)
+
+    @staticmethod
+    def _guard(failed, failures, stage, *arguments):
+        try:
+            stage(*arguments)
+        except _Aborted:
+            pass
+        except Exception as error:
+            failures.append(error)
+            failed.set()
+
+    @staticmethod
+    def _put(queue, item, failed):
+        while not failed.is_set():
+            try:
+                queue.put(item, timeout=Pipeline.POLLING_DELAY)
+                return
+            except Full:
+                continue
+        raise _Aborted()
+
+    @staticmethod
+    def _get(queue, failed):
+        while not failed.is_set():
+            try:
+                return queue.get(timeout=Pipeline.POLLING_DELAY)
+            except Empty:
+                continue
+        raise _Aborted()
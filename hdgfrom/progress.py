@@ -0,0 +1,197 @@
+#
+# hdg-from -- Generate HDG files for GEMSS
+#
+# Copyright (C) 2017 Di WU
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the MIT license.  See the LICENSE file for details.
+#
+
+# Compatibility with Pyhton 2.7
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from itertools import islice
+import time
+
+
+# time.monotonic only exists from Python 3.3
+monotonic = getattr(time, "monotonic", time.time)
+
+
+class ProgressFormats:
+    """
+    The ways progress can be reported on the console
+    """
+
+    NONE = "none"
+    HUMAN = "human"
+    JSON = "json"
+
+    _ALL_FORMATS = [ NONE,
+                     HUMAN,
+                     JSON ]
+
+    ERROR_UNKNOWN_FORMAT = "Unknown progress format '{name}'."
+
+    @staticmethod
+    def match(name):
+        for any_format in ProgressFormats._ALL_FORMATS:
+            if name.lower() == any_format:
+                return any_format
+
+        error = ProgressFormats.ERROR_UNKNOWN_FORMAT.format(name=name)
+        raise ValueError(error)
+
+
+class ProgressReport:
+    """
+    A snapshot of the rows and bytes processed so far in one phase of
+    the conversion
+    """
+
+    def __init__(self, phase, rows, size, elapsed, total_rows=None,
+                 total_size=None, done=False):
+        self._phase = phase
+        self._rows = rows
+        self._size = size
+        self._elapsed = elapsed
+        self._total_rows = total_rows
+        self._total_size = total_size
+        self._done = done
+
+    @property
+    def phase(self):
+        return self._phase
+
+    @property
+    def rows(self):
+        return self._rows
+
+    @property
+    def size(self):
+        return self._size
+
+    @property
+    def elapsed(self):
+        return self._elapsed
+
+    @property
+    def done(self):
+        return self._done
+
+    @property
+    def rows_per_second(self):
+        return self._rate_of(self._rows)
+
+    @property
+    def bytes_per_second(self):
+        return self._rate_of(self._size)
+
+    @property
+    def fraction(self):
+        """
+        The fraction of the phase already completed, measured in bytes
+        when the size of the whole is known, or else in rows
+        """
+        if self._done:
+            return 1.
+        if self._total_size:
+            return min(self._size / self._total_size, 1.)
+        if self._total_rows:
+            return min(self._rows / self._total_rows, 1.)
+        return None
+
+    @property
+    def eta(self):
+        """
+        The seconds left before the end of the phase, at the current
+        throughput
+        """
+        fraction = self.fraction
+        if fraction is None or fraction == 0:
+            return None
+        return self._elapsed * (1 - fraction) / fraction
+
+    def as_dictionary(self):
+        return {
+            "phase": self._phase,
+            "rows": self._rows,
+            "bytes": self._size,
+            "elapsed": round(self._elapsed, 3),
+            "rows_per_second": round(self.rows_per_second, 1),
+            "bytes_per_second": round(self.bytes_per_second, 1),
+            "fraction": self.fraction,
+            "eta": None if self.eta is None else round(self.eta, 1),
+            "done": self._done
+        }
+
+    def _rate_of(self, quantity):
+        if self._elapsed <= 0:
+            return 0.
+        return quantity / self._elapsed
+
+
+class Progress:
+    """
+    Count the rows and bytes processed by a conversion, one phase at a
+    time, and pass a report to the given listener at most once per
+    interval. Producers call 'advance' once per batch (a block of the
+    input, or a chunk of the output), so the time is checked once per
+    batch, never per row.
+    """
+
+    READING = "reading"
+    WRITING = "writing"
+
+    DEFAULT_INTERVAL = 1.
+    BATCH_SIZE = 10000
+
+    def __init__(self, listener, interval=DEFAULT_INTERVAL, clock=monotonic):
+        self._listener = listener
+        self._interval = interval
+        self._clock = clock
+        self.start(self.READING)
+
+    def start(self, phase, total_rows=None, total_size=None):
+        self._phase = phase
+        self._total_rows = total_rows
+        self._total_size = total_size
+        self._rows = 0
+        self._size = 0
+        self._started = self._clock()
+        self._next_report = self._started + self._interval
+
+    def advance(self, rows, position=None):
+        """
+        Account for a batch of rows. The position, when known, is the
+        number of bytes processed since the start of the phase.
+        """
+        self._rows += rows
+        if position is not None:
+            self._size = position
+        now = self._clock()
+        if now >= self._next_report:
+            self._next_report = now + self._interval
+            self._listener(self._report_at(now))
+
+    def finish(self):
+        self._listener(self._report_at(self._clock(), done=True))
+
+    def track(self, records, position=None):
+        """
+        Yield the given records, accounting for them by batches. The
+        position is a function that returns the bytes consumed so far.
+        """
+        records = iter(records)
+        batch = list(islice(records, self.BATCH_SIZE))
+        while batch:
+            for each_record in batch:
+                yield each_record
+            self.advance(len(batch), position() if position else None)
+            batch = list(islice(records, self.BATCH_SIZE))
+
+    def _report_at(self, now, done=False):
+        return ProgressReport(self._phase, self._rows, self._size,
+                              now - self._started, self._total_rows,
+                              self._total_size, done)
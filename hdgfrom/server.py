@@ -0,0 +1,226 @@
+#
+# hdg-from -- Generate HDG files for GEMSS
+#
+# Copyright (C) 2017 Di WU
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the MIT license.  See the LICENSE file for details.
+#
+
+# Compatibility with Pyhton 2.7
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from json import dumps
+from socketserver import ThreadingMixIn
+from threading import Lock
+import time
+from urllib.parse import parse_qs, urlparse
+
+from hdgfrom.api import Converter
+from hdgfrom.errors import HDGFromError
+
+
+# time.perf_counter only exists from Python 3.3
+perf_counter = getattr(time, "perf_counter", time.time)
+
+
+_CONVERTER = None
+
+
+def _warm_up():
+    """
+    Prepare the converter of a worker process, once for all requests
+    """
+    global _CONVERTER
+    _CONVERTER = Converter()
+
+
+def _convert(body, options):
+    if _CONVERTER is None:
+        _warm_up()
+    result = _CONVERTER.convert(body, **options)
+    return result.content.encode("utf-8"), result.row_count, result.warnings
+
+
+class ServerStatistics:
+    """
+    Count the requests served, with their throughput and latency
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._started = perf_counter()
+        self._requests = 0
+        self._failures = 0
+        self._rows = 0
+        self._bytes_in = 0
+        self._bytes_out = 0
+        self._total_latency = 0.
+        self._max_latency = 0.
+
+    def record(self, latency, bytes_in, bytes_out=0, rows=0, failed=False):
+        with self._lock:
+            self._requests += 1
+            self._failures += 1 if failed else 0
+            self._rows += rows
+            self._bytes_in += bytes_in
+            self._bytes_out += bytes_out
+            self._total_latency += latency
+            self._max_latency = max(self._max_latency, latency)
+
+    def as_dict(self):
+        with self._lock:
+            uptime = perf_counter() - self._started
+            return {
+                "uptime": uptime,
+                "requests": self._requests,
+                "failures": self._failures,
+                "rows": self._rows,
+                "bytes_in": self._bytes_in,
+                "bytes_out": self._bytes_out,
+                "rows_per_second": self._rows / uptime if uptime else 0.,
+                "mean_latency": self._total_latency / self._requests
+                                if self._requests else 0.,
+                "max_latency": self._max_latency
+            }
+
+
+class ConversionHandler(BaseHTTPRequestHandler):
+    """
+    Convert the SWMM data posted to /convert, and report statistics on
+    /stats. Conversion options are given as query parameters, as in
+    /convert?unit=CMS&start_date=2017-01-01T12:00:00
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    OPTIONS = {
+        "unit": str,
+        "start_date": str,
+        "user_name": str,
+        "water_body": str,
+        "filling": str,
+        "drop_duplicates": lambda text: text.lower() in ("1", "true", "yes"),
+        "max_errors": int
+    }
+
+    CHUNK_SIZE = 1 << 16
+
+    def do_GET(self):
+        if urlparse(self.path).path != "/stats":
+            self._reply(404, b"Not found\n")
+            return
+        statistics = dumps(self.server.statistics.as_dict(), sort_keys=True)
+        self._reply(200, statistics.encode("utf-8"), "application/json")
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != "/convert":
+            self._reply(404, b"Not found\n")
+            return
+
+        clock = perf_counter()
+        body = None
+        try:
+            body = self._read_body()
+            options = self._options_from(url.query)
+            content, rows, warnings = \
+                self.server.pool.submit(_convert, body, options).result()
+
+        except (HDGFromError, ValueError) as error:
+            self._fail(clock, body, 400,
+                       ("%s: %s\n" % (type(error).__name__, error)).encode("utf-8"))
+            return
+
+        except Exception as error:
+            failure = {"error": type(error).__name__, "message": str(error)}
+            self._fail(clock, body, 500,
+                       dumps(failure, sort_keys=True).encode("utf-8"),
+                       "application/json")
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; charset=utf-8")
+        self.send_header("Content-Length", str(len(content)))
+        self.send_header("X-Row-Count", str(rows))
+        for each_warning in warnings:
+            self.send_header("X-Warning", each_warning)
+        self.end_headers()
+        view = memoryview(content)
+        for start in range(0, len(content), self.CHUNK_SIZE):
+            self.wfile.write(view[start:start + self.CHUNK_SIZE])
+        self.server.statistics.record(perf_counter() - clock, len(body),
+                                      len(content), rows)
+
+    def _read_body(self):
+        chunks = []
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            size = int(self.rfile.readline().split(b";")[0], 16)
+            while size > 0:
+                chunks.append(self.rfile.read(size))
+                self.rfile.readline()
+                size = int(self.rfile.readline().split(b";")[0], 16)
+            self.rfile.readline()
+        else:
+            remaining = int(self.headers.get("Content-Length", 0))
+            while remaining > 0:
+                chunk = self.rfile.read(min(remaining, self.CHUNK_SIZE))
+                if not chunk:
+                    break
+                chunks.append(chunk)
+                remaining -= len(chunk)
+        return b"".join(chunks)
+
+    def _fail(self, clock, body, status, content, content_type="text/plain; charset=utf-8"):
+        """
+        Report a failed conversion. The connection is closed when the body
+        could not be read, as the next request cannot be found anymore.
+        """
+        if body is None:
+            self.close_connection = True
+        self._reply(status, content, content_type)
+        self.server.statistics.record(perf_counter() - clock, len(body or b""),
+                                      failed=True)
+
+    def _options_from(self, query):
+        options = {}
+        for key, values in parse_qs(query).items():
+            if key not in self.OPTIONS:
+                raise ValueError("Unknown option '%s'" % key)
+            options[key] = self.OPTIONS[key](values[-1])
+        return options
+
+    def _reply(self, status, content, content_type="text/plain; charset=utf-8"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *arguments):
+        pass
+
+
+class ConversionServer(ThreadingMixIn, HTTPServer):
+    """
+    Serve conversions over HTTP, each request in its own thread, using a
+    pool of warm worker processes. Before Python 3.7, which cannot
+    initialize them, workers warm up on their first request instead.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, workers=None):
+        super(ConversionServer, self).__init__(address, ConversionHandler)
+        try:
+            self.pool = ProcessPoolExecutor(workers, initializer=_warm_up)
+        except TypeError:
+            self.pool = ProcessPoolExecutor(workers)
+        self.statistics = ServerStatistics()
+
+    def server_close(self):
+        super(ConversionServer, self).server_close()
+        self.pool.shutdown()
@@ -0,0 +1,223 @@
+#
+# hdg-from -- Generate HDG files for GEMSS
+#
+# Copyright (C) 2017 Di WU
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the MIT license.  See the LICENSE file for details.
+#
+
+# Compatibility with Pyhton 2.7
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from array import array
+from heapq import merge
+from itertools import islice
+from operator import itemgetter
+from struct import Struct
+from sys import version_info
+
+from hdgfrom.backends import TIME_TYPECODE
+from hdgfrom.flow import observation_of, observations_of
+
+
+class RecordFile:
+    """
+    A sequence of (seconds, value) records, stored in a temporary file
+    as fixed-size binary records, so that any record can be fetched by
+    seeking.
+    """
+
+    RECORD = Struct(str("<qd"))
+
+    BLOCK_SIZE = 4096
+
+    def __init__(self, storage, count):
+        self._storage = storage
+        self._count = count
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("Record index out of range")
+        self._storage.seek(index * self.RECORD.size)
+        return self.RECORD.unpack(self._storage.read(self.RECORD.size))
+
+    def __iter__(self):
+        return self.read_from(self._storage)
+
+    def close(self):
+        self._storage.close()
+
+    @staticmethod
+    def read_from(storage, block_size=BLOCK_SIZE, first=0, count=None):
+        """
+        Read the given number of records (by default, all of them) from
+        the given storage, starting with the record at index 'first', by
+        blocks of the given number of records
+        """
+        block_size *= RecordFile.RECORD.size
+        position = first * RecordFile.RECORD.size
+        end = None if count is None else position + count * RecordFile.RECORD.size
+        while True:
+            storage.seek(position)
+            block = storage.read(block_size if end is None
+                                 else min(block_size, end - position))
+            if not block:
+                break
+            position += len(block)
+            for each_record in RecordFile._unpack_all(block):
+                yield each_record
+
+    @staticmethod
+    def _unpack_all(block):
+        """
+        Unpack every record of the given block (Struct.iter_unpack is
+        only available from Python 3.4)
+        """
+        record = RecordFile.RECORD
+        if hasattr(record, "iter_unpack"):
+            return record.iter_unpack(block)
+        return (record.unpack_from(block, offset)
+                for offset in range(0, len(block), record.size))
+
+    @staticmethod
+    def write_to(records, storage):
+        pack = RecordFile.RECORD.pack
+        count = 0
+        for seconds, value in records:
+            storage.write(pack(seconds, value))
+            count += 1
+        storage.flush()
+        return count
+
+
+def spill(records, directory=None):
+    """
+    Move the given records, in the same order, into a RecordFile
+    """
+    from tempfile import TemporaryFile
+    storage = TemporaryFile(dir=directory)
+    count = RecordFile.write_to(records, storage)
+    return RecordFile(storage, count)
+
+
+class ExternalSorter:
+    """
+    Sort (seconds, value) records by time and drop duplicated
+    timestamps, keeping the first one encountered. Records are sorted
+    by runs that fit in memory, which are spilled one after the other
+    to a single temporary file, and finally k-way merged into a single
+    RecordFile. The merge reads the runs by blocks, which together hold
+    no more records than a run.
+    """
+
+    DEFAULT_RUN_SIZE = 1 << 20
+
+    def __init__(self, run_size=None, directory=None):
+        self._run_size = run_size or self.DEFAULT_RUN_SIZE
+        self._directory = directory
+
+    def sort(self, records):
+        runs = []
+        spilled = self._new_file()
+        try:
+            records = iter(records)
+            first = 0
+            run = list(islice(records, self._run_size))
+            while run:
+                run.sort(key=itemgetter(0))
+                count = RecordFile.write_to(run, spilled)
+                runs.append((first, count))
+                first += count
+                run = list(islice(records, self._run_size))
+
+            block_size = max(1, min(RecordFile.BLOCK_SIZE,
+                                    self._run_size // max(1, len(runs))))
+            merged = self._merge([RecordFile.read_from(spilled, block_size, first, count)
+                                  for first, count in runs])
+            storage = self._new_file()
+            count = RecordFile.write_to(self._unique(merged), storage)
+            return RecordFile(storage, count)
+
+        finally:
+            spilled.close()
+
+    def _new_file(self):
+        from tempfile import TemporaryFile
+        return TemporaryFile(dir=self._directory)
+
+    @staticmethod
+    def _merge(runs):
+        """
+        Merge runs sorted by time, so that records with the same time come
+        in the order of their runs. Before Python 3.5, heapq.merge takes
+        no key: records are then decorated with the index of their run,
+        so that values are never compared.
+        """
+        if version_info >= (3, 5):
+            return merge(*runs, key=itemgetter(0))
+        decorated = merge(*[ExternalSorter._tagged(each_run, index)
+                            for index, each_run in enumerate(runs)])
+        return ((seconds, value) for seconds, _, value in decorated)
+
+    @staticmethod
+    def _tagged(run, index):
+        for seconds, value in run:
+            yield seconds, index, value
+
+    @staticmethod
+    def _unique(records):
+        last = None
+        for seconds, value in records:
+            if seconds != last:
+                yield seconds, value
+                last = seconds
+
+
+class RecordObservations:
+    """
+    Expose a RecordFile as a sequence of observations, as expected by
+    flows and writers.
+    """
+
+    def __init__(self, records, unit):
+        self._records = records
+        self._unit = unit
+
+    @property
+    def records(self):
+        return self._records
+
+    @property
+    def unit(self):
+        return self._unit
+
+    @property
+    def seconds(self):
+        return array(TIME_TYPECODE, (seconds for seconds, _ in self._records))
+
+    @property
+    def values(self):
+        return array(str("d"), (value for _, value in self._records))
+
+    def seconds_at(self, index):
+        return self._records[index][0]
+
+    def __len__(self):
+        return len(self._records)
+
+    def __getitem__(self, index):
+        seconds, value = self._records[index]
+        return observation_of(seconds, value, self._unit)
+
+    def __iter__(self):
+        return observations_of(self._records, self._unit)
+
+    def close(self):
+        self._records.close()
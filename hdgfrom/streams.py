@@ -0,0 +1,72 @@
+#
+# hdg-from -- Generate HDG files for GEMSS
+#
+# Copyright (C) 2017 Di WU
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the MIT license.  See the LICENSE file for details.
+#
+
+# Compatibility with Pyhton 2.7
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from io import open
+from os.path import getsize
+from sys import stdin, stdout
+
+
+STANDARD_STREAM = "-"
+
+DEFAULT_BUFFER_SIZE = 1 << 20
+
+
+def is_standard_stream(path):
+    return path == STANDARD_STREAM
+
+
+def open_input(path, buffer_size=None):
+    """
+    Open the given file, or the standard input when the path is '-', as
+    text decoded from a binary stream buffered with the given size (by
+    default, the standard input is buffered by blocks of 1 MB).
+    """
+    if is_standard_stream(path):
+        return open(stdin.fileno(), "r",
+                    buffering=buffer_size or DEFAULT_BUFFER_SIZE,
+                    encoding="utf-8",
+                    closefd=False)
+    return open(path, "r", buffering=buffer_size or -1)
+
+
+def open_output(path, buffer_size=None, binary=False):
+    """
+    Open the given file, or the standard output when the path is '-',
+    for writing text (or bytes, if binary is set) through a binary
+    stream buffered with the given size. Closing the returned stream
+    leaves the standard output open.
+    """
+    if is_standard_stream(path):
+        stdout.flush()
+        if binary:
+            return open(stdout.fileno(), "wb",
+                        buffering=buffer_size or DEFAULT_BUFFER_SIZE,
+                        closefd=False)
+        return open(stdout.fileno(), "w",
+                    buffering=buffer_size or DEFAULT_BUFFER_SIZE,
+                    encoding="utf-8",
+                    closefd=False)
+    return open(path, "wb" if binary else "w", buffering=buffer_size or -1)
+
+
+def size_of(path):
+    """
+    The size of the given file, or None for the standard input and for
+    files that cannot be reached (opening them reports why)
+    """
+    if is_standard_stream(path):
+        return None
+    try:
+        return getsize(path)
+    except OSError:
+        return None
@@ -0,0 +1,200 @@
+#
+# hdg-from -- Generate HDG files for GEMSS
+#
+# Copyright (C) 2017 Di WU
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the MIT license.  See the LICENSE file for details.
+#
+
+# Compatibility with Pyhton 2.7
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from collections import Counter
+
+from hdgfrom.flow import Flow, Observations
+from hdgfrom.sorting import RecordObservations, spill
+
+
+class Filling:
+    """
+    The strategies available to fill the gaps of a time series
+    """
+
+    NONE = "none"
+    MISSING = "missing"
+    HOLD = "hold"
+    LINEAR = "linear"
+
+    _ALL_STRATEGIES = [ NONE,
+                        MISSING,
+                        HOLD,
+                        LINEAR ]
+
+    ERROR_UNKNOWN_STRATEGY = "Unknown filling strategy '{name}'."
+
+    @staticmethod
+    def match(name):
+        for any_strategy in Filling._ALL_STRATEGIES:
+            if name.lower() == any_strategy:
+                return any_strategy
+
+        error = Filling.ERROR_UNKNOWN_STRATEGY.format(name=name)
+        raise ValueError(error)
+
+
+class SeriesReport:
+    """
+    Summarize the irregularities found in the time column of a flow
+    """
+
+    def __init__(self, count, step, gaps, missing, duplicates, disorders,
+                 filled=0, dropped=0):
+        self._count = count
+        self._step = step
+        self._gaps = gaps
+        self._missing = missing
+        self._duplicates = duplicates
+        self._disorders = disorders
+        self._filled = filled
+        self._dropped = dropped
+
+    @property
+    def count(self):
+        return self._count
+
+    @property
+    def step(self):
+        return self._step
+
+    @property
+    def gaps(self):
+        return self._gaps
+
+    @property
+    def missing(self):
+        return self._missing
+
+    @property
+    def duplicates(self):
+        return self._duplicates
+
+    @property
+    def disorders(self):
+        return self._disorders
+
+    @property
+    def filled(self):
+        return self._filled
+
+    @property
+    def dropped(self):
+        return self._dropped
+
+    @property
+    def is_regular(self):
+        return self._gaps == 0 \
+            and self._duplicates == 0 \
+            and self._disorders == 0
+
+    def with_repairs(self, filled, dropped):
+        return SeriesReport(self._count, self._step, self._gaps,
+                            self._missing, self._duplicates,
+                            self._disorders, filled, dropped)
+
+
+class SeriesValidator:
+    """
+    Detect (and optionally repair) duplicated, out-of-order and missing
+    timestamps, using the dominant reporting step of the flow as
+    reference. Both the check and the repair run in a single linear
+    pass over the time and rate columns, and only keep the histogram of
+    the steps between consecutive timestamps in memory. Flows spilled
+    to disk remain spilled once repaired.
+    """
+
+    MISSING_VALUE = 999999999.
+
+    _BACKWARD = -1
+
+    def __init__(self, filling=Filling.NONE, drop_duplicates=False):
+        self._filling = Filling.match(filling)
+        self._drop_duplicates = drop_duplicates
+
+    @property
+    def repairs(self):
+        return self._filling != Filling.NONE or self._drop_duplicates
+
+    def check(self, flow):
+        steps = Counter()
+        count = 0
+        last_time = None
+        for time, _ in self._records_of(flow):
+            if last_time is not None:
+                steps[max(time - last_time, self._BACKWARD)] += 1
+            last_time = time
+            count += 1
+
+        step = self._dominant_step(steps)
+        gaps = missing = 0
+        for each_step, occurrences in steps.items():
+            if each_step > step:
+                gaps += occurrences
+                missing += occurrences * ((each_step - 1) // step)
+        return SeriesReport(count, step, gaps, missing,
+                            steps[0], steps[self._BACKWARD])
+
+    def repair(self, flow):
+        report = self.check(flow)
+        if not self.repairs or report.is_regular:
+            return flow, report
+
+        counts = {"filled": 0, "dropped": 0}
+        records = self._repaired(self._records_of(flow), report.step, counts)
+        unit = flow.unit
+        if isinstance(flow.observations, RecordObservations):
+            observations = RecordObservations(spill(records), unit)
+        else:
+            observations = Observations.from_records(records, unit)
+
+        repaired = Flow(flow.water_body,
+                        observations,
+                        flow.start_date,
+                        flow.user_name)
+        return repaired, report.with_repairs(counts["filled"], counts["dropped"])
+
+    def _repaired(self, records, step, counts):
+        last_time = last_value = None
+        for time, value in records:
+            if last_time is not None:
+                if time == last_time and self._drop_duplicates:
+                    counts["dropped"] += 1
+                    continue
+                if time - last_time > step and self._filling != Filling.NONE:
+                    slots = range(last_time + step, time, step)
+                    for each_slot in zip(slots, self._fill(slots, last_time, last_value,
+                                                           time, value)):
+                        yield each_slot
+                    counts["filled"] += len(slots)
+            yield time, value
+            last_time, last_value = time, value
+
+    def _fill(self, slots, start_time, start_value, end_time, end_value):
+        if self._filling == Filling.MISSING:
+            return [self.MISSING_VALUE] * len(slots)
+        if self._filling == Filling.HOLD:
+            return [start_value] * len(slots)
+        slope = (end_value - start_value) / (end_time - start_time)
+        return [start_value + slope * (t - start_time) for t in slots]
+
+    @staticmethod
+    def _dominant_step(steps):
+        positives = Counter(dict((s, c) for s, c in steps.items() if s > 0))
+        if not positives:
+            return 0
+        return positives.most_common(1)[0][0]
+
+    @staticmethod
+    def _records_of(flow):
+        return iter(flow.records)
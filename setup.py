@@ -32,6 +32,9 @@ setup(name="hdgfrom",
       url="https://github.com/wudi312858/hdg-from",
       license="LICENSE.txt",
       packages=["hdgfrom"],
+      extras_require={
+          "numpy": ["numpy"]
+      },
       test_suite="tests",
       entry_points = {
         "console_scripts": [
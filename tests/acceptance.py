@@ -15,18 +15,34 @@ from unittest import TestCase
 from mock import patch
 
 from io import StringIO
-from os import remove
-from os.path import isfile
+from json import loads
+from os import close, fdopen, pipe, remove, write
+from os.path import isfile, join
+from shutil import rmtree
+from tempfile import TemporaryFile, mkdtemp
 from datetime import datetime
 
-from hdgfrom.cli import CLI, Display
-from hdgfrom.adapters import AdapterLibrary
+from hdgfrom.cli import CLI, DEFAULT_PRECISION, Display
+from hdgfrom.adapters import AdapterLibrary, HDGWriter
+from hdgfrom.catalog import Catalog
+from hdgfrom.manifest import Manifest
+from hdgfrom.sorting import ExternalSorter
 
 
 def fake_now():
     return datetime(2017, 1, 1, 12)
 
 
+class RecordingSorter(ExternalSorter):
+    """
+    Keep the records it sorted, to check that they were removed
+    """
+
+    def sort(self, records):
+        self.result = ExternalSorter.sort(self, records)
+        return self.result
+
+
 class AcceptanceTests(TestCase):
     SWMM_OUTPUT = ("Table - Node 3\n"
                    "                            Total Inflow\n"
@@ -152,7 +168,262 @@ class AcceptanceTests(TestCase):
         self._verify_output_contains(
             Display.WARNING_ALL_ZERO_FLOW.format(unit="CMS"))
 
-        
+    @patch('hdgfrom.adapters.Writer.now', side_effect=fake_now)
+    def test_setting_precision(self, mock):
+        self._cli.run(["--unit", "CMS", "--precision", "4", self.SWMM_FILE])
+
+        hdg_lines = self.HDG_OUTPUT.splitlines(True)
+        self._verify_generated_file(
+            "".join(hdg_lines[:12])
+            + "2,0,0,1.0,0,0.0,0.0,Flow Rate,Flow Rate\n"
+            + hdg_lines[13]
+            + "2017,1,1,12,15,0,0.0002\n"
+              "2017,1,1,12,30,0,0.0023\n"
+              "2017,1,1,12,45,0,0.0021\n")
+        self.assertNotIn(Display.WARNING_ALL_ZERO_FLOW.format(unit="CMS"),
+                         self._output.getvalue())
+
+    def test_default_precision(self):
+        self.assertEqual(HDGWriter.DEFAULT_PRECISION, DEFAULT_PRECISION)
+
+    @patch('hdgfrom.adapters.Writer.now', side_effect=fake_now)
+    def test_filling_gaps(self, mock):
+        self._create_file(self.SWMM_FILE,
+                          content=self.SWMM_OUTPUT + "0         	01:30:00  	2.06\n")
+        self._cli.run(["--fill", "hold", self.SWMM_FILE])
+
+        self._verify_output_contains(
+            Display.SERIES_REPAIRED,
+            filled=2,
+            dropped=0)
+
+    @patch('hdgfrom.adapters.Writer.now', side_effect=fake_now)
+    def test_sorting_observations(self, mock):
+        lines = self.SWMM_OUTPUT.splitlines(True)
+        self._create_file(self.SWMM_FILE,
+                          content="".join(lines[:3] + lines[:2:-1] + lines[4:5]))
+        self._cli.run(["--sort", self.SWMM_FILE])
+
+        self._verify_generated_file(self.HDG_OUTPUT)
+
+    @patch('hdgfrom.adapters.Writer.now', side_effect=fake_now)
+    def test_removing_sorted_observations(self, mock):
+        sorter = RecordingSorter()
+        CLI(output=self._output, sorter=sorter).run(["--sort", self.SWMM_FILE])
+
+        self._verify_generated_file(self.HDG_OUTPUT)
+        with self.assertRaises(ValueError):
+            list(sorter.result)
+
+    @patch('hdgfrom.adapters.Writer.now', side_effect=fake_now)
+    def test_mapped_conversion(self, mock):
+        self._cli.run(["--mmap", self.SWMM_FILE])
+
+        self._verify_generated_file(self.HDG_OUTPUT)
+
+    @patch('hdgfrom.adapters.Writer.now', side_effect=fake_now)
+    def test_pipelined_conversion(self, mock):
+        self._cli.run(["--pipeline", "--batch-size", "2", self.SWMM_FILE])
+
+        self._verify_generated_file(self.HDG_OUTPUT)
+
+        self._verify_output_contains(
+            Display.INPUT_FILE_LOADED,
+            file=self.SWMM_FILE,
+            count=3)
+
+    @patch('hdgfrom.adapters.Writer.now', side_effect=fake_now)
+    def test_reporting_progress_as_json(self, mock):
+        self._cli.run(["--progress", "json", self.SWMM_FILE])
+
+        self._verify_generated_file(self.HDG_OUTPUT)
+        reports = [loads(line) for line in self._output.getvalue().splitlines()
+                   if line.startswith("{")]
+        data_lines = "".join(self.HDG_OUTPUT.splitlines(True)[-3:])
+        self.assertEqual([("reading", 3, len(self.SWMM_OUTPUT), True),
+                          ("writing", 3, len(data_lines), True)],
+                         [(r["phase"], r["rows"], r["bytes"], r["done"])
+                          for r in reports])
+
+    def test_reporting_progress_as_text(self):
+        self._cli.run(["--progress", "human", "--mmap", self.SWMM_FILE])
+
+        self.assertIn("Reading: 3 row(s), 0.0 MB, ", self._output.getvalue())
+        self.assertIn("Writing: 3 row(s), 0.0 MB, ", self._output.getvalue())
+
+    @patch('hdgfrom.adapters.Writer.now', side_effect=fake_now)
+    def test_streaming_from_stdin_to_stdout(self, mock):
+        with TemporaryFile("w+b") as fake_stdin, TemporaryFile("w+b") as fake_stdout:
+            fake_stdin.write(self.SWMM_OUTPUT.encode("utf-8"))
+            fake_stdin.seek(0)
+            with patch('hdgfrom.streams.stdin', fake_stdin), \
+                 patch('hdgfrom.streams.stdout', fake_stdout):
+                self._cli.run(["--buffer-size", "4K", "-"])
+            fake_stdout.seek(0)
+            self.assertEqual(self.HDG_OUTPUT, fake_stdout.read().decode("utf-8"))
+
+        self._verify_output_contains(
+            Display.INPUT_FILE_LOADED,
+            file="-",
+            count=3)
+
+    def test_splitting_the_standard_output(self):
+        self._cli.run(["--split-by", "month", "-o", "-", self.SWMM_FILE])
+
+        self._verify_output_contains(
+            Display.ERROR_STANDARD_STREAM,
+            option="--split-by")
+
+    def test_splitting_several_targets(self):
+        self._cli.run(["--split-by", "year", "-t", "bidon.hdg", self.SWMM_FILE])
+
+        self._verify_output_contains(
+            Display.ERROR_INCOMPATIBLE_OPTIONS,
+            option="--split-by",
+            other_option="--target")
+
+    def test_incremental_conversion(self):
+        self._cli.run(["--incremental", self.SWMM_FILE])
+        self._cli.run(["--incremental", self.SWMM_FILE])
+
+        self._verify_output_contains(
+            Display.CONVERSION_SKIPPED,
+            file=self._generated_file)
+        self._delete_file(Manifest.FILE_NAME)
+
+    def test_incremental_conversion_of_several_targets(self):
+        self._cli.run(["--incremental", "-t", "bidon.hdg,unit=CMS", self.SWMM_FILE])
+        self._delete_file("bidon.hdg")
+        self._cli.run(["--incremental", "-t", "bidon.hdg,unit=CMS", self.SWMM_FILE])
+
+        self.assertTrue(isfile("bidon.hdg"))
+        self.assertNotIn(Display.CONVERSION_SKIPPED.format(file=self._generated_file),
+                         self._output.getvalue())
+        self._delete_file(Manifest.FILE_NAME)
+
+    def test_incremental_split_conversion(self):
+        self._cli.run(["--incremental", "--max-rows", "2", "-o", "bidon.hdg", self.SWMM_FILE])
+        self._cli.run(["--incremental", "--max-rows", "2", "-o", "bidon.hdg", self.SWMM_FILE])
+
+        self._verify_output_contains(
+            Display.CONVERSION_SKIPPED,
+            file="bidon.hdg")
+        self._delete_file("bidon_002.hdg")
+        self._cli.run(["--incremental", "--max-rows", "2", "-o", "bidon.hdg", self.SWMM_FILE])
+
+        self.assertTrue(isfile("bidon_002.hdg"))
+        self._delete_file("bidon_001.hdg")
+        self._delete_file("bidon_002.hdg")
+        self._delete_file(Manifest.FILE_NAME)
+
+    @patch('hdgfrom.adapters.Writer.now', side_effect=fake_now)
+    def test_cataloging_an_archive(self, mock):
+        archive = mkdtemp()
+        try:
+            hdg_file = join(archive, "node3.hdg")
+            self._cli.run(["-o", hdg_file, self.SWMM_FILE])
+            self._cli.run(["catalog", archive, "-w", "Node 3",
+                           "--from", "2017-01-01T12:20:00",
+                           "--to", "2017-01-01T12:40:00",
+                           "--extract", join(archive, "extracts")])
+
+            self._verify_output_contains(
+                Display.CATALOG_REFRESHED,
+                index=join(archive, Catalog.FILE_NAME),
+                added=1, updated=0, removed=0, unchanged=0)
+            self._verify_output_contains(
+                Display.CATALOG_ENTRY,
+                file=hdg_file, water_body="Node 3", rows=3, unit="CMD",
+                first="2017-01-01 12:15:00", last="2017-01-01 12:45:00")
+            self._verify_output_contains(
+                Display.CATALOG_EXTRACTED,
+                rows=1, source=hdg_file, file=join(archive, "extracts", "node3.hdg"))
+        finally:
+            rmtree(archive)
+
+    def test_skipping_malformed_rows(self):
+        self._create_file(self.SWMM_FILE,
+                          content=self.SWMM_OUTPUT + "0         	01:00:00  	n/a\n")
+        self._cli.run(["--max-errors", "5", self.SWMM_FILE])
+
+        self._verify_output_contains(
+            Display.WARNING_MALFORMED_ROWS,
+            skipped=1,
+            repaired=0)
+        self._verify_output_contains(
+            Display.ROW_ERROR,
+            line=7,
+            offset=len(self.SWMM_OUTPUT),
+            reason="invalid number")
+
+    def test_skipping_malformed_rows_from_stdin(self):
+        reading, writing = pipe()
+        write(writing, (self.SWMM_OUTPUT + "0         	01:00:00  	n/a\n").encode("utf-8"))
+        close(writing)
+        with fdopen(reading, "rb") as fake_stdin, TemporaryFile("w+b") as fake_stdout:
+            with patch('hdgfrom.streams.stdin', fake_stdin), \
+                 patch('hdgfrom.streams.stdout', fake_stdout):
+                self._cli.run(["--max-errors", "5", "-"])
+
+        self._verify_output_contains(
+            Display.ROW_ERROR,
+            line=7,
+            offset=len(self.SWMM_OUTPUT),
+            reason="invalid number")
+
+    def test_exceeding_error_budget(self):
+        self._create_file(self.SWMM_FILE,
+                          content=self.SWMM_OUTPUT + "0         	01:00:00  	n/a\n")
+        self._cli.run(["--max-errors", "0", self.SWMM_FILE])
+
+        self._verify_output_contains(
+            Display.ERROR_TOO_MANY_ERRORS,
+            budget=0)
+
+    @patch('hdgfrom.adapters.Writer.now', side_effect=fake_now)
+    def test_parallel_conversion(self, mock):
+        self._cli.run(["--workers", "2", self.SWMM_FILE])
+
+        self._verify_generated_file(self.HDG_OUTPUT)
+
+    @patch('hdgfrom.adapters.Writer.now', side_effect=fake_now)
+    def test_generating_several_files(self, mock):
+        self._cli.run(["--target", "bidon.hdg,unit=CMD,water-body=Lake", self.SWMM_FILE])
+
+        self._verify_generated_file(self.HDG_OUTPUT)
+        self._verify_generated_file(self.HDG_OUTPUT.replace("Node 3", "Lake"),
+                                    "bidon.hdg")
+        self._verify_output_contains(
+            Display.CONVERSION_COMPLETE,
+            file="bidon.hdg")
+
+    @patch('hdgfrom.adapters.Writer.now', side_effect=fake_now)
+    def test_splitting_by_row_count(self, mock):
+        self._cli.run(["--max-rows", "2", "-o", "bidon.hdg", self.SWMM_FILE])
+
+        lines = self.HDG_OUTPUT.splitlines(True)
+        self._verify_generated_file(
+            "".join(lines[:16]).replace("12:45", "12:30").replace("Lines: 3", "Lines: 2"),
+            "bidon_001.hdg")
+        self._verify_generated_file(
+            "".join(lines[:14] + lines[16:]).replace("Start Date: 01/01/2017 12:00",
+                                                     "Start Date: 01/01/2017 12:45")
+                                            .replace("Lines: 3", "Lines: 1"),
+            "bidon_002.hdg")
+        self._verify_output_contains(
+            Display.CONVERSION_COMPLETE,
+            file="bidon_002.hdg")
+        self._delete_file("bidon_001.hdg")
+        self._delete_file("bidon_002.hdg")
+
+    def test_invalid_target(self):
+        target = "bidon.hdg,unit=LPS"
+        self._cli.run(["--target", target, self.SWMM_FILE])
+
+        self._verify_output_contains(
+            Display.ERROR_INVALID_TARGET,
+            target=target)
+
     def test_invalid_start_date(self):
         date = "this-is-not-a-valid-date!"
         self._cli.run(["--start-date", date, self.SWMM_FILE])
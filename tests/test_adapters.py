@@ -14,11 +14,15 @@ from __future__ import absolute_import, division, print_function, unicode_litera
 from unittest import TestCase
 from mock import patch
 
-from io import StringIO
+from io import BytesIO, StringIO
 from datetime import datetime, timedelta
+from os import remove
+from tempfile import NamedTemporaryFile
 
 from hdgfrom.flow import Flow, Observation, Rate, Unit
 from hdgfrom.adapters import SWMMReader, HDGWriter
+from hdgfrom.diagnostics import ErrorLog
+from hdgfrom.errors import TooManyErrorsError
 
 
 def fake_now():
@@ -55,6 +59,106 @@ class SWMMReaderTests(TestCase):
                          [o.rate.unit for o in flow.observations])
 
 
+class LenientSWMMReaderTests(TestCase):
+
+    SWMM_TEXT = ("Table - Node 3\n"
+                 "                            Total Inflow\n"
+                 "Days      \tHours     \t(CMD)\n"
+                 "0         \t00:15:00  \t0.18\n"
+                 "0         \t00:30:00  \tabc\n"
+                 "0 00:45:00 2.06\n"
+                 "\n"
+                 "0         \t01:00:00  \t-1.5\n"
+                 "0         \t01:15\n"
+                 "0         \t01:30:00  \t3.10\n")
+
+    def setUp(self):
+        self._reader = SWMMReader()
+        self._stream = StringIO(self.SWMM_TEXT)
+
+    def test_strict_mode_rejects_malformed_rows(self):
+        with self.assertRaises(ValueError):
+            self._reader.read_from(self._stream)
+
+    def test_skip_and_repair_malformed_rows(self):
+        errors = ErrorLog()
+        flow = self._reader.read_from(self._stream, errors)
+        self.assertEqual([0.18, 2.06, 3.10],
+                         [o.rate.value for o in flow.observations])
+        self.assertEqual(3, errors.skipped)
+        self.assertEqual(1, errors.repaired)
+
+    def test_record_rejected_rows(self):
+        errors = ErrorLog()
+        self._reader.read_from(self._stream, errors)
+        self.assertEqual([5, 6, 8, 9], [e.line for e in errors])
+        self.assertEqual(["invalid number",
+                          "repaired row",
+                          "negative rate",
+                          "malformed row"],
+                         [e.reason for e in errors])
+        lines = self.SWMM_TEXT.splitlines(True)
+        self.assertEqual([len("".join(lines[:e.line - 1])) for e in errors],
+                         [e.offset for e in errors])
+
+    def test_abort_beyond_error_budget(self):
+        with self.assertRaises(TooManyErrorsError):
+            self._reader.read_from(self._stream, ErrorLog(budget=2))
+
+
+class MappedSWMMReaderTests(TestCase):
+
+    def setUp(self):
+        self._reader = SWMMReader()
+
+    def tearDown(self):
+        remove(self._path)
+
+    def _write(self, text):
+        with NamedTemporaryFile("wb", suffix=".txt", delete=False) as swmm_file:
+            swmm_file.write(text.encode("utf-8"))
+            self._path = swmm_file.name
+
+    def test_match_the_text_reader(self):
+        self._write(SWMMReaderTests.SWMM_TEXT)
+        flow = self._reader.read_from_path(self._path)
+        expected = self._reader.read_from(StringIO(SWMMReaderTests.SWMM_TEXT))
+        self.assertEqual(expected.water_body, flow.water_body)
+        self.assertEqual([(o.time, o.rate.value) for o in expected.observations],
+                         [(o.time, o.rate.value) for o in flow.observations])
+
+    @patch('hdgfrom.adapters.SWMMReader.BLOCK_SIZE', 50)
+    def test_read_across_blocks(self):
+        rows = "".join("0\t%02d:%02d:00\t%d.5\n" % (m // 60, m % 60, m)
+                       for m in range(0, 600, 15))
+        self._write(LenientSWMMReaderTests.SWMM_TEXT.split("0  ")[0] + rows)
+        _, unit, seconds, values = self._reader.read_columns_from_path(self._path)
+        self.assertEqual(Unit.CMD, unit)
+        self.assertEqual(list(range(0, 36000, 900)), list(seconds))
+        self.assertEqual([m + .5 for m in range(0, 600, 15)], list(values))
+
+    def test_strict_mode_rejects_malformed_rows(self):
+        self._write(LenientSWMMReaderTests.SWMM_TEXT)
+        with self.assertRaises(ValueError):
+            self._reader.read_from_path(self._path)
+
+    def test_record_rejected_rows(self):
+        self._write(LenientSWMMReaderTests.SWMM_TEXT)
+        errors = ErrorLog()
+        flow = self._reader.read_from_path(self._path, errors)
+        expected = ErrorLog()
+        self._reader.read_from(StringIO(LenientSWMMReaderTests.SWMM_TEXT), expected)
+        self.assertEqual([0.18, 2.06, 3.10],
+                         [o.rate.value for o in flow.observations])
+        self.assertEqual([(e.line, e.offset, e.reason) for e in expected],
+                         [(e.line, e.offset, e.reason) for e in errors])
+
+    def test_reject_empty_files(self):
+        self._write("")
+        with self.assertRaises(ValueError):
+            self._reader.read_from_path(self._path)
+
+
 class HDGWriterTest(TestCase):
 
     def setUp(self):
@@ -90,3 +194,23 @@ class HDGWriterTest(TestCase):
         self._writer.write_to(self._flow, self._output)
         self.assertEqual(self._expected_hdg, self._output.getvalue())
 
+    @patch('hdgfrom.adapters.Writer.now', side_effect=fake_now)
+    def test_write_bytes(self, mock):
+        output = BytesIO()
+        self._writer.write_to(self._flow, output)
+        self.assertEqual(self._expected_hdg.encode("utf-8"), output.getvalue())
+
+    @patch('hdgfrom.adapters.Writer.now', side_effect=fake_now)
+    def test_write_with_precision(self, mock):
+        HDGWriter(precision=4).write_to(self._flow, self._output)
+        self.assertTrue(self._output.getvalue().endswith("2017,1,1,12,15,0,0.1000\n"
+                                                         "2017,1,1,12,30,0,0.2000\n"
+                                                         "2017,1,1,12,45,0,0.3000\n"))
+
+    @patch('hdgfrom.adapters.Writer.now', side_effect=fake_now)
+    def test_write_without_decimals(self, mock):
+        HDGWriter(precision=0).write_to(self._flow, self._output)
+        self.assertTrue(self._output.getvalue().endswith("2017,1,1,12,15,0,0\n"
+                                                         "2017,1,1,12,30,0,0\n"
+                                                         "2017,1,1,12,45,0,0\n"))
+
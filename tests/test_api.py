@@ -0,0 +1,146 @@
+#
+# hdg-from -- Generate HDG files for GEMSS
+#
+# Copyright (C) 2017 Di WU
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the MIT license.  See the LICENSE file for details.
+#
+
+# Compatibility with Pyhton 2.7
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from unittest import TestCase
+from mock import patch
+
+from io import StringIO
+from datetime import datetime
+from os import remove
+from os.path import isfile
+
+import hdgfrom
+
+from hdgfrom.flow import Unit
+from hdgfrom.api import Converter
+from hdgfrom.sorting import ExternalSorter
+from hdgfrom.errors import (HDGFromError, InvalidDateError, InvalidInputError,
+                            InvalidUnitError, TooManyErrorsError)
+
+
+def fake_now():
+    return datetime(2017, 1, 1, 12)
+
+
+class RecordingSorter(ExternalSorter):
+
+    def sort(self, records):
+        self.result = ExternalSorter.sort(self, records)
+        return self.result
+
+
+class ConverterTests(TestCase):
+
+    SWMM_TEXT = ("Table - Node 3\n"
+                 "                            Total Inflow\n"
+                 "Days      \tHours    \t(LPS)\n"
+                 "0         \t00:15:00  \t0.18\n"
+                 "0         \t00:30:00  \t2.30\n"
+                 "0         \t00:45:00  \t2.06\n")
+
+    HDG_ROWS = ("2017,1,1,12,15,0,15.55\n"
+                "2017,1,1,12,30,0,198.72\n"
+                "2017,1,1,12,45,0,177.98\n")
+
+    OUTPUT_FILE = "api_output.hdg"
+
+    def setUp(self):
+        self._converter = Converter()
+
+    def tearDown(self):
+        if isfile(self.OUTPUT_FILE):
+            remove(self.OUTPUT_FILE)
+
+    def test_convert_in_memory(self):
+        result = self._converter.convert(self.SWMM_TEXT.encode("utf-8"))
+        self.assertTrue(result.content.endswith(self.HDG_ROWS))
+        self.assertEqual(3, result.row_count)
+        self.assertEqual("Node 3", result.water_body)
+        self.assertEqual(Unit.CMD, result.unit)
+
+    def test_convert_streams(self):
+        output = StringIO()
+        result = self._converter.convert(StringIO(self.SWMM_TEXT), output)
+        self.assertIsNone(result.content)
+        self.assertTrue(output.getvalue().endswith(self.HDG_ROWS))
+
+    @patch('hdgfrom.adapters.Writer.now', side_effect=fake_now)
+    def test_convert_to_path(self, mock):
+        self._converter.convert(StringIO(self.SWMM_TEXT), self.OUTPUT_FILE,
+                                unit="CMD", start_date="2017-01-01T12:00:00",
+                                user_name="Bobby")
+        with open(self.OUTPUT_FILE) as generated:
+            content = generated.read()
+        self.assertIn("$Created by: Bobby\n", content)
+        self.assertTrue(content.endswith(self.HDG_ROWS))
+
+    def test_statistics_and_timings(self):
+        result = self._converter.convert(StringIO(self.SWMM_TEXT))
+        self.assertAlmostEqual(0.18 * 86.4, result.minimum)
+        self.assertAlmostEqual(2.30 * 86.4, result.maximum)
+        self.assertAlmostEqual((0.18 + 2.30 + 2.06) * 86.4 / 3, result.mean)
+        self.assertEqual({"read", "convert", "write"}, set(result.timings))
+
+    def test_warn_about_only_zeros(self):
+        result = self._converter.convert(StringIO(self.SWMM_TEXT), unit=Unit.CMS)
+        self.assertEqual(
+            [Converter.WARNING_ALL_ZERO_FLOW.format(unit="CMS")],
+            result.warnings)
+
+    def test_module_level_shortcut(self):
+        result = hdgfrom.convert(StringIO(self.SWMM_TEXT))
+        self.assertEqual(3, result.row_count)
+
+    def test_reject_invalid_date(self):
+        with self.assertRaises(InvalidDateError):
+            self._converter.convert(StringIO(self.SWMM_TEXT), start_date="nope")
+
+    def test_reject_unsupported_unit(self):
+        with self.assertRaises(InvalidUnitError):
+            self._converter.convert(StringIO(self.SWMM_TEXT), unit="LPS")
+
+    def test_reject_malformed_input(self):
+        with self.assertRaises(InvalidInputError) as context:
+            self._converter.convert(StringIO(self.SWMM_TEXT + "0\tbad\n"))
+        self.assertIsInstance(context.exception, HDGFromError)
+
+    def test_reject_truncated_header(self):
+        with self.assertRaises(InvalidInputError):
+            self._converter.convert(b"Table - X\n")
+
+    def test_reject_empty_table(self):
+        header = self.SWMM_TEXT[:self.SWMM_TEXT.index("0 ")]
+        with self.assertRaises(InvalidInputError):
+            self._converter.convert(StringIO(header))
+        with self.assertRaises(InvalidInputError):
+            self._converter.convert(StringIO(header), sort=True)
+        with self.assertRaises(InvalidInputError):
+            self._converter.convert(StringIO(header + "0\tbad\n"), max_errors=1)
+
+    def test_remove_sorted_observations(self):
+        sorter = RecordingSorter()
+        result = Converter(sorter=sorter).convert(StringIO(self.SWMM_TEXT), sort=True)
+        self.assertEqual(3, result.row_count)
+        with self.assertRaises(ValueError):
+            list(sorter.result)
+
+    def test_tolerate_malformed_rows(self):
+        result = self._converter.convert(StringIO(self.SWMM_TEXT + "0\tbad\n"),
+                                         max_errors=1)
+        self.assertEqual(3, result.row_count)
+        self.assertEqual(1, result.errors.skipped)
+
+    def test_exceed_error_budget(self):
+        with self.assertRaises(TooManyErrorsError):
+            self._converter.convert(StringIO(self.SWMM_TEXT + "0\tbad\n"),
+                                    max_errors=0)
@@ -0,0 +1,180 @@
+#
+# hdg-from -- Generate HDG files for GEMSS
+#
+# Copyright (C) 2017 Di WU
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the MIT license.  See the LICENSE file for details.
+#
+
+# Compatibility with Pyhton 2.7
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from unittest import TestCase, skipUnless
+from mock import patch
+
+from array import array
+from datetime import datetime, timedelta
+from io import StringIO
+from os.path import join
+from random import Random
+from shutil import rmtree
+from tempfile import mkdtemp
+
+from hdgfrom.adapters import SWMMReader, HDGWriter
+from hdgfrom.backends import (Backends, PythonBackend, TIME_TYPECODE, select_backend,
+                              _ASCIIFormat)
+from hdgfrom.errors import UnavailableBackendError
+from hdgfrom.flow import Flow, Unit
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def fake_now():
+    return datetime(2017, 1, 1, 12)
+
+
+class BackendSelectionTests(TestCase):
+
+    def tearDown(self):
+        select_backend(Backends.AUTO)
+
+    def test_select_python(self):
+        self.assertIsInstance(select_backend("Python"), PythonBackend)
+        self.assertEqual(Backends.PYTHON, select_backend(Backends.PYTHON).NAME)
+
+    def test_automatic_choice(self):
+        expected = Backends.NUMPY if numpy else Backends.PYTHON
+        self.assertEqual(expected, select_backend(Backends.AUTO).NAME)
+
+    def test_small_inputs_skip_numpy(self):
+        self.assertEqual(Backends.PYTHON,
+                         select_backend(Backends.AUTO, input_size=1000).NAME)
+
+    @skipUnless(numpy is None, "NumPy is installed")
+    def test_reject_missing_numpy(self):
+        with self.assertRaises(UnavailableBackendError):
+            select_backend(Backends.NUMPY)
+
+    def test_reject_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            select_backend("fortran")
+
+
+class PythonBackendTests(TestCase):
+
+    def test_keep_times_on_64_bits(self):
+        self.assertEqual(8, array(TIME_TYPECODE).itemsize)
+        self.assertEqual([2 ** 40], list(array(TIME_TYPECODE, [2 ** 40])))
+
+    def test_format_without_bytes_formatting(self):
+        seconds = array(TIME_TYPECODE, [900, 86400 + 1800])
+        values = array(str("d"), [0.1, 12.345])
+        expected = PythonBackend().format_records(datetime(2017, 1, 1), seconds, values)
+        with patch('hdgfrom.backends._ascii_format', side_effect=_ASCIIFormat), \
+             patch('hdgfrom.backends._PREFIX_FORMAT', _ASCIIFormat("%d,%d,%d,")):
+            text = PythonBackend().format_records(datetime(2017, 1, 1), seconds, values)
+        self.assertEqual("2017,1,1,0,15,0,0.10\n"
+                         "2017,1,2,0,30,0,12.35\n", text)
+        self.assertEqual(expected, text)
+
+
+@skipUnless(numpy, "NumPy is not installed")
+class DifferentialTests(TestCase):
+    """
+    Convert randomly generated SWMM files with both backends, and check
+    that they produce exactly the same HDG files
+    """
+
+    RUNS = 40
+
+    def setUp(self):
+        self._directory = mkdtemp()
+        self._random = Random(2017)
+
+    def tearDown(self):
+        rmtree(self._directory)
+        select_backend(Backends.AUTO)
+
+    @patch('hdgfrom.adapters.Writer.now', side_effect=fake_now)
+    def test_identical_hdg_files(self, mock):
+        for run in range(self.RUNS):
+            path = self._create_input(run)
+            unit = self._random.choice([Unit.CMD, Unit.CFS, Unit.CMS, Unit.MGD, Unit.GPM])
+            start_date = datetime(2000, 1, 1) + timedelta(minutes=self._random.randrange(10 ** 7))
+            outputs = [self._convert(each_backend, path, unit, start_date)
+                       for each_backend in (Backends.PYTHON, Backends.NUMPY)]
+            self.assertEqual(outputs[0], outputs[1], msg="run %d" % run)
+
+    def test_identical_rounding(self):
+        values = array(str("d"), [self._random.choice([
+            self._random.uniform(0, 10 ** self._random.randrange(12)),
+            self._random.randrange(10 ** 6) / 1000.,
+            self._random.randrange(10 ** 4) / 100. + 0.005,
+            999999999., 0., 1e15, 1e300])
+            for _ in range(20000)])
+        seconds = array(TIME_TYPECODE, range(0, 900 * len(values), 900))
+        texts = []
+        for each_backend in (Backends.PYTHON, Backends.NUMPY):
+            texts.append(select_backend(each_backend)
+                         .format_records(datetime(2016, 2, 28, 23, 59), seconds, values))
+        self.assertEqual(texts[0], texts[1])
+
+    def test_identical_rounding_at_any_precision(self):
+        values = array(str("d"), [self._random.choice([
+            self._random.uniform(0, 10 ** self._random.randrange(8)),
+            self._random.randrange(10 ** 6) / 1000.,
+            self._random.randrange(10 ** 4) / 100. + 0.005,
+            -self._random.uniform(0, 10), -0., 0., 1e300])
+            for _ in range(5000)])
+        seconds = array(TIME_TYPECODE, range(0, 61 * len(values), 61))
+        for precision in range(10):
+            texts = [select_backend(each_backend)
+                     .format_records(datetime(2016, 2, 28, 23, 59), seconds, values,
+                                     precision)
+                     for each_backend in (Backends.PYTHON, Backends.NUMPY)]
+            self.assertEqual(texts[0], texts[1], msg="precision %d" % precision)
+
+    def test_identical_empty_flows(self):
+        path = self._create_input(0, rows=0)
+        flows = []
+        for each_backend in (Backends.PYTHON, Backends.NUMPY):
+            select_backend(each_backend)
+            flows.append(SWMMReader().read_from_path(path).convert_to(Unit.CFS))
+            flows.append(Flow().convert_to(Unit.CMD))
+        self.assertEqual([0] * 4, [len(f.observations) for f in flows])
+        self.assertEqual(flows[0].values, flows[2].values)
+        self.assertEqual(flows[1].values, flows[3].values)
+
+    def _convert(self, backend, path, unit, start_date):
+        select_backend(backend)
+        flow = SWMMReader().read_from_path(path).convert_to(unit)
+        flow.start_date = start_date
+        output = StringIO()
+        HDGWriter().write_to(flow, output)
+        return output.getvalue().encode("utf-8")
+
+    def _create_input(self, run, rows=None):
+        random = self._random
+        step = random.choice([1, 60, 300, 900, 3600])
+        count = random.randrange(1, 3000) if rows is None else rows
+        rows = []
+        for index in range(count):
+            seconds = (index + 1) * step
+            days, seconds = divmod(seconds, 86400)
+            value = "%.*f" % (random.randrange(6), random.uniform(0, 10 ** random.randrange(8)))
+            row = "%-10d\t%02d:%02d:%02d  \t%s\n" % (days, seconds // 3600,
+                                                     seconds // 60 % 60,
+                                                     seconds % 60, value)
+            rows.append(row)
+        path = join(self._directory, "input-%d.txt" % run)
+        with open(path, "w") as swmm_file:
+            swmm_file.write("Table - Node %d\n"
+                            "                            Total Inflow\n"
+                            "Days      \tHours     \t(CMD)\n" % run)
+            swmm_file.write("".join(rows))
+        return path
@@ -0,0 +1,168 @@
+#
+# hdg-from -- Generate HDG files for GEMSS
+#
+# Copyright (C) 2017 Di WU
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the MIT license.  See the LICENSE file for details.
+#
+
+# Compatibility with Pyhton 2.7
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from unittest import TestCase
+from mock import patch
+
+from datetime import datetime, timedelta
+from os import makedirs, remove, stat, utime
+from os.path import join
+from random import Random
+from shutil import rmtree
+from tempfile import mkdtemp
+
+from hdgfrom.adapters import HDGWriter
+from hdgfrom.catalog import Catalog, HeaderReader
+from hdgfrom.flow import Flow, Observation, Rate, Unit
+
+
+def fake_now():
+    return datetime(2017, 1, 1, 12)
+
+
+class CatalogTests(TestCase):
+
+    def setUp(self):
+        self._archive = mkdtemp()
+        makedirs(join(self._archive, "2017"))
+        self._catalog = Catalog.of(self._archive)
+
+    def tearDown(self):
+        self._catalog.close()
+        rmtree(self._archive)
+
+    def test_read_header(self):
+        path = self._write("node1.hdg", "Node 1", datetime(2017, 1, 1), hours=24, unit=Unit.CMS)
+
+        entry = HeaderReader().read_from_path(path)
+
+        self.assertEqual("Node 1", entry.water_body)
+        self.assertEqual("Bobby", entry.user_name)
+        self.assertEqual(datetime(2017, 1, 1), entry.start_date)
+        self.assertEqual(datetime(2017, 1, 1, 1), entry.first_date)
+        self.assertEqual(datetime(2017, 1, 2), entry.last_date)
+        self.assertEqual(24, entry.row_count)
+        self.assertEqual("CMS", entry.unit)
+
+    def test_refresh_incrementally(self):
+        self._write("node1.hdg", "Node 1", datetime(2017, 1, 1))
+        self._write("2017/node2.hdg", "Node 2", datetime(2017, 1, 1))
+        self._write_text("notes.hdg", "Not an HDG file\n")
+
+        summary = self._catalog.refresh()
+        self.assertEqual((2, 0, 0, 0, 1),
+                         (summary.added, summary.updated, summary.removed,
+                          summary.unchanged, summary.rejected))
+
+        path = self._write("node1.hdg", "Node 1", datetime(2018, 1, 1))
+        status = stat(path)
+        utime(path, (status.st_atime, status.st_mtime + 10))
+        remove(join(self._archive, "2017", "node2.hdg"))
+        self._write("node3.hdg", "Node 3", datetime(2017, 1, 1))
+
+        summary = self._catalog.refresh()
+        self.assertEqual((1, 1, 1, 0),
+                         (summary.added, summary.updated, summary.removed,
+                          summary.unchanged))
+        self.assertEqual([datetime(2018, 1, 1)],
+                         [e.start_date for e in self._catalog.find("Node 1")])
+
+    def test_keep_the_index_across_sessions(self):
+        self._write("node1.hdg", "Node 1", datetime(2017, 1, 1))
+        self._catalog.refresh()
+        self._catalog.close()
+
+        with Catalog.of(self._archive) as catalog:
+            summary = catalog.refresh()
+            self.assertEqual((0, 1), (summary.added, summary.unchanged))
+
+    def test_find_by_water_body_and_time_window(self):
+        self._write("node1-2017.hdg", "Node 1", datetime(2017, 1, 1))
+        self._write("node1-2018.hdg", "Node 1", datetime(2018, 1, 1))
+        self._write("2017/node2.hdg", "Node 2", datetime(2017, 1, 1))
+        self._catalog.refresh()
+
+        self.assertEqual(["node1-2017.hdg", "node1-2018.hdg"],
+                         self._names_of(self._catalog.find("Node 1")))
+        self.assertEqual(["node1-2017.hdg", "node2.hdg"],
+                         self._names_of(self._catalog.find(start=datetime(2016, 6, 1),
+                                                           end=datetime(2017, 1, 1, 5))))
+        self.assertEqual(["node1-2018.hdg"],
+                         self._names_of(self._catalog.find("Node 1",
+                                                           start=datetime(2017, 1, 3))))
+        self.assertEqual([], self._catalog.find("Node 1", end=datetime(2017, 1, 1)))
+
+    @patch('hdgfrom.adapters.Writer.now', side_effect=fake_now)
+    def test_extract_rows_within_window(self, mock):
+        self._write("node1.hdg", "Node 1", datetime(2017, 1, 1), hours=48)
+        self._catalog.refresh()
+        entry = self._catalog.find("Node 1")[0]
+        output = join(self._archive, "extract.out")
+
+        count = self._catalog.extract(entry, output,
+                                      datetime(2017, 1, 1, 10, 30),
+                                      datetime(2017, 1, 1, 13))
+
+        self.assertEqual(3, count)
+        with open(output, "r") as extracted:
+            content = extracted.read()
+        self.assertIn("$Waterbody Name: Node 1\n"
+                      "$Created by: Bobby\n"
+                      "$Start Date: 01/01/2017 11:00\n"
+                      "$End Date: 01/01/2017 13:00\n"
+                      "$Number of Data Lines: 3\n", content)
+        self.assertTrue(content.endswith("$Year,Month,Day,Hour,Minute,Bin1,Flow Rate\n"
+                                         "2017,1,1,11,0,0,11.00\n"
+                                         "2017,1,1,12,0,0,12.00\n"
+                                         "2017,1,1,13,0,0,13.00\n"))
+
+    def test_extract_same_rows_as_a_linear_scan(self):
+        random = Random(2017)
+        path = self._write("node1.hdg", "Node 1", datetime(2017, 1, 1), hours=500,
+                           step=lambda hour: random.randrange(1, 200))
+        self._catalog.refresh()
+        entry = self._catalog.find("Node 1")[0]
+        with open(path, "r") as hdg_file:
+            rows = hdg_file.readlines()[HeaderReader.HEADER_SIZE:]
+        output = join(self._archive, "extract.out")
+
+        for _ in range(50):
+            start = entry.start_date + timedelta(minutes=random.randrange(60 * 900))
+            end = start + timedelta(minutes=random.randrange(60 * 200))
+            expected = [r for r in rows
+                        if start <= HeaderReader.date_of(r.encode("ascii")) <= end]
+            self.assertEqual(len(expected), self._catalog.extract(entry, output, start, end))
+            with open(output, "r") as extracted:
+                self.assertEqual(expected,
+                                 extracted.readlines()[HeaderReader.HEADER_SIZE:])
+
+    def _write(self, name, water_body, start_date, hours=24, unit=Unit.CMD, step=None):
+        observations = []
+        time = 0
+        for hour in range(1, hours + 1):
+            time += step(hour) * 60 if step else 3600
+            observations.append(Observation(Rate(float(hour), unit),
+                                            timedelta(seconds=time)))
+        flow = Flow(water_body, observations, start_date=start_date, user_name="Bobby")
+        path = join(self._archive, name)
+        with open(path, "w") as output:
+            HDGWriter().write_to(flow, output)
+        return path
+
+    def _write_text(self, name, text):
+        with open(join(self._archive, name), "w") as output:
+            output.write(text)
+
+    @staticmethod
+    def _names_of(entries):
+        return [e.path.replace("\\", "/").rsplit("/", 1)[-1] for e in entries]
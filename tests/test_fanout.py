@@ -0,0 +1,80 @@
+#
+# hdg-from -- Generate HDG files for GEMSS
+#
+# Copyright (C) 2017 Di WU
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the MIT license.  See the LICENSE file for details.
+#
+
+# Compatibility with Pyhton 2.7
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from unittest import TestCase
+from mock import patch
+
+from io import StringIO
+from datetime import datetime, timedelta
+from os.path import join
+from shutil import rmtree
+from tempfile import mkdtemp
+
+from hdgfrom.flow import Flow, Observation, Rate, Unit
+from hdgfrom.adapters import HDGWriter
+from hdgfrom.fanout import FanOutWriter, Target
+
+
+def fake_now():
+    return datetime(2017, 1, 1, 12)
+
+
+class FanOutWriterTests(TestCase):
+
+    def setUp(self):
+        self._directory = mkdtemp()
+        self._flow = Flow(
+            "Test Water",
+            [ Observation(Rate(0.10, Unit.LPS), timedelta(minutes=15)),
+              Observation(Rate(0.20, Unit.LPS), timedelta(minutes=30)),
+              Observation(Rate(999.0, Unit.LPS), timedelta(minutes=45)) ],
+            user_name="Bobby")
+
+    def tearDown(self):
+        rmtree(self._directory)
+
+    @patch('hdgfrom.adapters.Writer.now', side_effect=fake_now)
+    def test_match_separate_conversions(self, mock):
+        targets = [
+            Target(join(self._directory, "a.hdg"), Unit.CMD, datetime(2017, 1, 1, 12)),
+            Target(join(self._directory, "b.hdg"), Unit.CFS, datetime(2018, 6, 30, 23, 30),
+                   user_name="Alice", water_body="Lake")
+        ]
+
+        FanOutWriter().write_to(self._flow, targets)
+
+        for each_target in targets:
+            self.assertEqual(self._separate_conversion(each_target),
+                             self._content_of(each_target.path))
+
+    @patch('hdgfrom.adapters.Writer.now', side_effect=fake_now)
+    def test_preserve_missing_values(self, mock):
+        target = Target(join(self._directory, "a.hdg"), Unit.CMS, datetime(2017, 1, 1))
+
+        FanOutWriter(missing_value=999.0).write_to(self._flow, [target])
+
+        self.assertTrue(self._content_of(target.path).endswith(",999.00\n"))
+
+    def _separate_conversion(self, target):
+        flow = self._flow.convert_to(target.unit)
+        flow.start_date = target.start_date
+        flow.user_name = target.user_name or flow.user_name
+        flow.water_body = target.water_body or flow.water_body
+        output = StringIO()
+        HDGWriter().write_to(flow, output)
+        return output.getvalue()
+
+    @staticmethod
+    def _content_of(path):
+        with open(path, "r") as generated:
+            return generated.read()
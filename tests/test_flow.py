@@ -12,9 +12,11 @@
 from __future__ import absolute_import, division, print_function, unicode_literals
 
 from unittest import TestCase
-from datetime import datetime
+from datetime import datetime, timedelta
+from math import copysign
+from pickle import dumps, loads
 
-from hdgfrom.flow import Flow, Rate, Observation, Unit
+from hdgfrom.flow import Flow, Rate, Observation, Observations, Unit
 
 
 class EmptyFlowTests(TestCase):
@@ -35,20 +37,67 @@ class EmptyFlowTests(TestCase):
 class FlowTests(TestCase):
 
     def setUp(self):
-        date_format = "%d/%m/%y %H:%M"
         observations = [
-            Observation(Rate(0.25, Unit.CMH),
-                        datetime.strptime("16/09/81 16:40", date_format)),
-            Observation(Rate(0.50, Unit.CMH),
-                        datetime.strptime("16/09/81 16:40", date_format))
+            Observation(Rate(0.25, Unit.CMH), timedelta(minutes=15)),
+            Observation(Rate(0.50, Unit.CMH), timedelta(minutes=30))
         ]
         self._flow = Flow(
             water_body="Test",
-            observations=observations)
+            observations=observations,
+            start_date=datetime(1981, 9, 16, 16, 40))
 
     def test_observations(self):
         self.assertEqual(2, len(self._flow.observations))
 
+    def test_store_times_as_offsets(self):
+        self.assertEqual([15 * 60, 30 * 60], list(self._flow.times))
+        self.assertEqual(timedelta(minutes=30), self._flow.observations[-1].time)
+
+    def test_end_date(self):
+        self.assertEqual(datetime(1981, 9, 16, 17, 10), self._flow.end_date)
+
+    def test_move_start_date(self):
+        self._flow.start_date = datetime(2017, 1, 1)
+        self.assertEqual(datetime(2017, 1, 1, 0, 30), self._flow.end_date)
+        self.assertEqual([15 * 60, 30 * 60], list(self._flow.times))
+
+    def test_share_equal_rates_and_offsets(self):
+        flow = Flow(observations=Observations.from_records(
+            [(900, 0.25), (1800, 0.25), (2700, 0.5)], Unit.CMH))
+        first, second, third = list(flow.observations)
+        self.assertIs(first.rate, second.rate)
+        self.assertIsNot(second.rate, third.rate)
+        self.assertIs(Unit.CMH, third.rate.unit)
+        self.assertEqual(timedelta(minutes=45), third.time)
+        self.assertIs(first.time, list(self._flow.observations)[0].time)
+
+    def test_slice_observations(self):
+        observations = Observations.from_records(
+            [(900, 0.25), (1800, 0.5), (2700, 0.75)], Unit.CMH)
+        tail = observations[1:]
+        self.assertEqual(2, len(tail))
+        self.assertEqual([0.5, 0.75], [o.rate.value for o in tail])
+        self.assertEqual([timedelta(minutes=30), timedelta(minutes=45)],
+                         [o.time for o in tail])
+        self.assertIs(Unit.CMH, tail.unit)
+        self.assertEqual([0.25], [o.rate.value for o in observations[:-2]])
+
+    def test_shared_rates_are_immutable(self):
+        flow = Flow(observations=Observations.from_records(
+            [(900, 0.25), (1800, 0.25)], Unit.CMH))
+        first, second = list(flow.observations)
+        with self.assertRaises(AttributeError):
+            first.rate._value = 1.
+        with self.assertRaises(AttributeError):
+            first._time = timedelta(0)
+        self.assertEqual(0.25, second.rate.value)
+
+    def test_keep_the_sign_of_zero(self):
+        flow = Flow(observations=Observations.from_records(
+            [(900, 0.), (1800, -0.), (2700, 0.)], Unit.CMH))
+        signs = [copysign(1., o.rate.value) for o in flow.observations]
+        self.assertEqual([1., -1., 1.], signs)
+
     def test_convert_to(self):
         converted = self._flow.convert_to(Unit.CMD)
         for i, each_observation in enumerate(converted.observations):
@@ -70,6 +119,21 @@ class RateTests(TestCase):
         with self.assertRaises(ValueError):
             rate = Rate(-4.56)
 
+    def test_is_immutable(self):
+        with self.assertRaises(AttributeError):
+            self._rate.value = 1.
+        with self.assertRaises(AttributeError):
+            self._rate._value = 1.
+        with self.assertRaises(AttributeError):
+            del self._rate._unit
+        with self.assertRaises(AttributeError):
+            self._rate.comment = "Not slotted"
+
+    def test_pickle(self):
+        rate = loads(dumps(self._rate))
+        self.assertEqual(self._value, rate.value)
+        self.assertIs(self._unit, rate.unit)
+
     def test_conversion_to_lps(self):
         new_rate = self._rate.convert_to(Unit.LPS)
         self.assertAlmostEqual(self._rate.value, new_rate.value,
@@ -103,6 +167,31 @@ class ObservationTests(TestCase):
     def test_get_rate(self):
         self.assertEqual(self._rate, self._observation.rate)
 
+    def test_is_immutable(self):
+        with self.assertRaises(AttributeError):
+            self._observation.rate = Rate(1.)
+        with self.assertRaises(AttributeError):
+            self._observation._rate = Rate(1.)
+        with self.assertRaises(AttributeError):
+            self._observation.comment = "Not slotted"
+
+    def test_pickle(self):
+        observation = loads(dumps(self._observation))
+        self.assertEqual(self._time, observation.time)
+        self.assertEqual(0.25, observation.rate.value)
+
     def test_get_time(self):
         self.assertEqual(self._time, self._observation.time)
 
+
+
+class UnitTests(TestCase):
+
+    def test_remain_the_same_when_unpickled(self):
+        self.assertIs(Unit.CFS, loads(dumps(Unit.CFS)))
+
+    def test_is_immutable(self):
+        with self.assertRaises(AttributeError):
+            Unit.CMD._factor_to_cmd = 1.
+        with self.assertRaises(AttributeError):
+            Unit.CMD.comment = "Not slotted"
@@ -0,0 +1,92 @@
+#
+# hdg-from -- Generate HDG files for GEMSS
+#
+# Copyright (C) 2017 Di WU
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the MIT license.  See the LICENSE file for details.
+#
+
+# Compatibility with Pyhton 2.7
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from unittest import TestCase
+
+from os import remove, utime
+from os.path import isfile, join
+from shutil import rmtree
+from tempfile import mkdtemp
+
+from hdgfrom.manifest import Manifest
+
+
+class ManifestTests(TestCase):
+
+    OPTIONS = {"unit": "CMD", "start_date": "2017-01-01T12:00:00"}
+
+    def setUp(self):
+        self._directory = mkdtemp()
+        self._input = join(self._directory, "input.txt")
+        self._output = join(self._directory, "input.hdg")
+        self._write(self._input, "some SWMM data")
+        self._write(self._output, "some HDG data")
+        self._manifest = Manifest.next_to(self._output)
+
+    def tearDown(self):
+        rmtree(self._directory)
+
+    def test_unknown_output(self):
+        self.assertFalse(self._is_up_to_date())
+
+    def test_unchanged_input_and_options(self):
+        self._record()
+        self.assertTrue(self._is_up_to_date())
+
+    def test_persisted_between_runs(self):
+        self._record()
+        self._manifest.save()
+        self.assertTrue(isfile(join(self._directory, Manifest.FILE_NAME)))
+        self._manifest = Manifest.next_to(self._output)
+        self.assertTrue(self._is_up_to_date())
+
+    def test_changed_options(self):
+        self._record()
+        options = dict(self.OPTIONS, unit="CMS")
+        self.assertFalse(
+            self._manifest.is_up_to_date(self._input, self._output, options))
+
+    def test_changed_input(self):
+        self._record()
+        self._write(self._input, "other SWMM data")
+        self.assertFalse(self._is_up_to_date())
+
+    def test_touched_but_identical_input(self):
+        self._record()
+        utime(self._input, (0, 0))
+        self.assertTrue(self._is_up_to_date())
+
+    def test_deleted_output(self):
+        self._record()
+        remove(self._output)
+        self.assertFalse(self._is_up_to_date())
+
+    def test_deleted_additional_output(self):
+        other_output = join(self._directory, "other.hdg")
+        self._write(other_output, "other HDG data")
+        self._manifest.record(self._input, self._output, self.OPTIONS,
+                              [self._output, other_output])
+        self.assertTrue(self._is_up_to_date())
+        remove(other_output)
+        self.assertFalse(self._is_up_to_date())
+
+    def _record(self):
+        self._manifest.record(self._input, self._output, self.OPTIONS)
+
+    def _is_up_to_date(self):
+        return self._manifest.is_up_to_date(self._input, self._output, self.OPTIONS)
+
+    @staticmethod
+    def _write(path, content):
+        with open(path, "w") as output:
+            output.write(content)
@@ -0,0 +1,143 @@
+#
+# hdg-from -- Generate HDG files for GEMSS
+#
+# Copyright (C) 2017 Di WU
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the MIT license.  See the LICENSE file for details.
+#
+
+# Compatibility with Pyhton 2.7
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from unittest import TestCase, skipIf
+
+from io import StringIO
+from os.path import join
+from shutil import rmtree
+from tempfile import mkdtemp
+
+from hdgfrom.api import Converter
+from hdgfrom.backends import current_backend
+from hdgfrom.cli import CLI
+from hdgfrom.memory import MemoryBudget, Strategy
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+
+class MemoryBudgetTests(TestCase):
+
+    def test_parse(self):
+        self.assertEqual(512 * 1024 * 1024, MemoryBudget.parse("512M").limit)
+        self.assertEqual(2 * 1024 ** 3, MemoryBudget.parse("2gb").limit)
+        self.assertEqual(1000, MemoryBudget.parse("1000").limit)
+
+    def test_reject_invalid_budgets(self):
+        for text in ["", "lots", "-1M", "0"]:
+            with self.assertRaises(ValueError):
+                MemoryBudget.parse(text)
+
+    def test_strategies(self):
+        budget = MemoryBudget.parse("64M")
+        self.assertEqual(Strategy.IN_MEMORY, budget.strategy_for(1000, True))
+        self.assertEqual(Strategy.STREAMING, budget.strategy_for(1 << 30, True))
+        self.assertEqual(Strategy.EXTERNAL, budget.strategy_for(1 << 30, False))
+        self.assertEqual(Strategy.EXTERNAL, budget.strategy_for(None, False))
+
+    def test_batch_size_fits_in_budget(self):
+        budget = MemoryBudget.parse("1M")
+        batches = 2 * 8 + 4
+        size = budget.batch_size(8)
+        self.assertLessEqual(size * batches * MemoryBudget.RECORD_COST, budget.limit)
+        self.assertEqual(10, budget.batch_size(8, largest=10))
+
+    def test_block_size_fits_in_budget(self):
+        budget = MemoryBudget.parse("1M")
+        self.assertLessEqual(budget.block_size() * MemoryBudget.BLOCK_COST, budget.limit)
+        self.assertEqual(MemoryBudget.LINE_LENGTH, MemoryBudget(100).block_size())
+
+
+@skipIf(tracemalloc is None, "tracemalloc needs Python 3.4")
+class PeakMemoryTests(TestCase):
+    """
+    Check that conversions stay within their memory budget, whatever
+    the size of their input
+    """
+
+    BUDGET = 2 << 20
+
+    SIZES = [ 5000, 50000 ]
+
+    def setUp(self):
+        current_backend()
+        self._directory = mkdtemp()
+        self._input = join(self._directory, "input.txt")
+        self._output = join(self._directory, "input.hdg")
+
+    def tearDown(self):
+        rmtree(self._directory)
+
+    def test_cli_streaming(self):
+        for each_size in self.SIZES:
+            self._create_input(each_size)
+            peak = self._peak_of(
+                CLI(output=StringIO()).run,
+                ["--max-memory", str(self.BUDGET), self._input])
+            self.assertLess(peak, self.BUDGET)
+
+    def test_cli_external(self):
+        for each_size in self.SIZES:
+            self._create_input(each_size)
+            peak = self._peak_of(
+                CLI(output=StringIO()).run,
+                ["--max-memory", str(self.BUDGET), "--sort", "--fill", "hold",
+                 self._input])
+            self.assertLess(peak, self.BUDGET)
+
+    def test_cli_partitioned(self):
+        for each_size in self.SIZES:
+            self._create_input(each_size)
+            peak = self._peak_of(
+                CLI(output=StringIO()).run,
+                ["--max-memory", str(self.BUDGET), "--split-by", "year",
+                 self._input])
+            self.assertLess(peak, self.BUDGET)
+
+    def test_cli_mapped(self):
+        for each_size in self.SIZES:
+            self._create_input(each_size)
+            peak = self._peak_of(
+                CLI(output=StringIO()).run,
+                ["--max-memory", str(self.BUDGET), "--mmap", "--sort", self._input])
+            self.assertLess(peak, self.BUDGET)
+
+    def test_api(self):
+        for each_size in self.SIZES:
+            self._create_input(each_size)
+            peak = self._peak_of(
+                Converter().convert, self._input, self._output,
+                max_memory=self.BUDGET, drop_duplicates=True)
+            self.assertLess(peak, self.BUDGET)
+
+    def _create_input(self, size):
+        with open(self._input, "w") as input_file:
+            input_file.write("Table - Node 1\n"
+                             "                            Total Inflow\n"
+                             "Days\tHours\t(LPS)\n")
+            for i in range(1, size + 1):
+                minutes = 15 * i
+                input_file.write("%d\t%02d:%02d:00\t%.2f\n" % (
+                    minutes // 1440, minutes // 60 % 24, minutes % 60, i % 97 / 10.))
+
+    @staticmethod
+    def _peak_of(action, *arguments, **options):
+        tracemalloc.start()
+        try:
+            action(*arguments, **options)
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
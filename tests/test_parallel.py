@@ -0,0 +1,98 @@
+#
+# hdg-from -- Generate HDG files for GEMSS
+#
+# Copyright (C) 2017 Di WU
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the MIT license.  See the LICENSE file for details.
+#
+
+# Compatibility with Pyhton 2.7
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from unittest import TestCase, skipUnless
+from mock import patch
+
+import os
+
+from datetime import datetime, timedelta
+from os.path import join
+from random import Random
+from shutil import rmtree
+from tempfile import mkdtemp
+
+from hdgfrom.flow import Flow, Observation, Rate, Unit
+from hdgfrom.adapters import HDGWriter
+from hdgfrom.parallel import ParallelHDGWriter, append_file
+
+
+def fake_now():
+    return datetime(2017, 1, 1, 12)
+
+
+class ParallelHDGWriterTests(TestCase):
+
+    def setUp(self):
+        self._directory = mkdtemp()
+        random = Random(12)
+        self._flow = Flow(
+            "Test Water",
+            [Observation(Rate(random.uniform(0, 1000), Unit.CMD),
+                         timedelta(minutes=15 * i))
+             for i in range(1, 1000)],
+            start_date=datetime(2016, 12, 31, 20, 30))
+
+    def tearDown(self):
+        rmtree(self._directory)
+
+    @patch('hdgfrom.adapters.Writer.now', side_effect=fake_now)
+    def test_match_sequential_writer(self, mock):
+        sequential = join(self._directory, "sequential.hdg")
+        with open(sequential, "w") as output:
+            HDGWriter().write_to(self._flow, output)
+
+        parallel = join(self._directory, "parallel.hdg")
+        ParallelHDGWriter(workers=2, chunk_size=97).write_to_path(self._flow, parallel)
+
+        self.assertEqual(self._content_of(sequential), self._content_of(parallel))
+
+    def test_append_file(self):
+        source = join(self._directory, "source")
+        target = join(self._directory, "target")
+        with open(source, "wb") as output:
+            output.write(b"world\n" * 1000)
+        with open(target, "wb") as output:
+            output.write(b"hello\n")
+
+        with open(target, "r+b") as output:
+            output.seek(0, 2)
+            append_file(source, output)
+
+        self.assertEqual(b"hello\n" + b"world\n" * 1000, self._content_of(target))
+
+    @skipUnless(hasattr(os, "sendfile"), "os.sendfile needs Python 3.3")
+    def test_append_file_with_sendfile_at_explicit_offsets(self):
+        source = join(self._directory, "source")
+        target = join(self._directory, "target")
+        with open(source, "wb") as output:
+            output.write("".join("%04d\n" % i for i in range(1000)).encode("ascii"))
+
+        kernel_sendfile = os.sendfile
+
+        def sendfile(target, source, offset, count):
+            if not isinstance(offset, int):
+                raise TypeError("an integer is required")
+            return kernel_sendfile(target, source, offset, min(count, 333))
+
+        with patch('hdgfrom.parallel.os.copy_file_range', side_effect=OSError, create=True), \
+             patch('hdgfrom.parallel.os.sendfile', side_effect=sendfile, create=True), \
+             open(target, "wb") as output:
+            append_file(source, output)
+
+        self.assertEqual(self._content_of(source), self._content_of(target))
+
+    @staticmethod
+    def _content_of(path):
+        with open(path, "rb") as generated:
+            return generated.read()
@@ -0,0 +1,132 @@
+#
+# hdg-from -- Generate HDG files for GEMSS
+#
+# Copyright (C) 2017 Di WU
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the MIT license.  See the LICENSE file for details.
+#
+
+# Compatibility with Pyhton 2.7
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from unittest import TestCase
+from mock import patch
+
+from datetime import datetime, timedelta
+from os.path import join
+from shutil import rmtree
+from tempfile import mkdtemp
+
+from hdgfrom.flow import Flow, Observation, Observations, Rate, Unit
+from hdgfrom.partition import Period, PartitionedHDGWriter
+from hdgfrom.sorting import RecordObservations, spill
+
+
+def fake_now():
+    return datetime(2017, 1, 1, 12)
+
+
+class PartitionTests(TestCase):
+
+    def setUp(self):
+        self._writer = PartitionedHDGWriter()
+        self._flow = Flow(
+            "Test Water",
+            [Observation(Rate(float(day), Unit.CMD), timedelta(days=day))
+             for day in range(1, 80)],
+            start_date=datetime(2016, 12, 1))
+
+    def test_split_by_month(self):
+        parts = self._writer.partition(self._flow, "out.hdg", Period.MONTH)
+        self.assertEqual(["out_2016-12.hdg", "out_2017-01.hdg",
+                          "out_2017-02.hdg"],
+                         [p.path for p in parts])
+        self.assertEqual([30, 31, 18], [len(p) for p in parts])
+
+    def test_split_by_year(self):
+        parts = self._writer.partition(self._flow, "out.hdg", Period.YEAR)
+        self.assertEqual(["out_2016.hdg", "out_2017.hdg"],
+                         [p.path for p in parts])
+        self.assertEqual([(0, 30), (30, 79)],
+                         [(p.first, p.last) for p in parts])
+
+    def test_split_by_row_count(self):
+        parts = self._writer.partition(self._flow, "out.hdg", max_rows=30)
+        self.assertEqual(["out_001.hdg", "out_002.hdg", "out_003.hdg"],
+                         [p.path for p in parts])
+        self.assertEqual([30, 30, 19], [len(p) for p in parts])
+
+    def test_split_by_period_and_row_count(self):
+        parts = self._writer.partition(self._flow, "out.hdg", Period.YEAR, 40)
+        self.assertEqual(["out_2016.hdg", "out_2017-001.hdg", "out_2017-002.hdg"],
+                         [p.path for p in parts])
+        self.assertEqual([30, 40, 9], [len(p) for p in parts])
+
+    def test_empty_flow(self):
+        self.assertEqual([], self._writer.partition(Flow(), "out.hdg", Period.MONTH))
+
+    def test_reject_unknown_period(self):
+        with self.assertRaises(ValueError):
+            Period.match("week")
+
+
+class PartitionedHDGWriterTests(TestCase):
+
+    def setUp(self):
+        self._directory = mkdtemp()
+
+    def tearDown(self):
+        rmtree(self._directory)
+
+    @patch('hdgfrom.adapters.Writer.now', side_effect=fake_now)
+    def test_write_parts_with_their_own_header(self, mock):
+        flow = Flow("Test Water",
+                    [Observation(Rate(float(hour), Unit.CMD), timedelta(hours=hour))
+                     for hour in (12, 24, 36)],
+                    start_date=datetime(2016, 12, 31),
+                    user_name="Bobby")
+
+        parts = PartitionedHDGWriter(workers=2)\
+            .write_to_path(flow, join(self._directory, "out.hdg"), Period.YEAR)
+
+        self.assertEqual(2, len(parts))
+        first, second = [self._content_of(p.path) for p in parts]
+        self.assertIn("$Start Date: 31/12/2016 00:00\n"
+                      "$End Date: 31/12/2016 12:00\n"
+                      "$Number of Data Lines: 1\n", first)
+        self.assertTrue(first.endswith("$Year,Month,Day,Hour,Minute,Bin1,Flow Rate\n"
+                                       "2016,12,31,12,0,0,12.00\n"))
+        self.assertIn("$Start Date: 01/01/2017 00:00\n"
+                      "$End Date: 01/01/2017 12:00\n"
+                      "$Number of Data Lines: 2\n", second)
+        self.assertTrue(second.endswith("$Year,Month,Day,Hour,Minute,Bin1,Flow Rate\n"
+                                        "2017,1,1,0,0,0,24.00\n"
+                                        "2017,1,1,12,0,0,36.00\n"))
+
+    @patch('hdgfrom.adapters.Writer.now', side_effect=fake_now)
+    def test_write_spilled_flow_as_in_memory(self, mock):
+        records = [(hour * 3600, float(hour)) for hour in range(6, 24 * 70, 6)]
+        in_memory = Flow("Test Water", Observations.from_records(records, Unit.CMD),
+                         start_date=datetime(2016, 12, 1))
+        spilled = Flow("Test Water", RecordObservations(spill(records), Unit.CMD),
+                       start_date=datetime(2016, 12, 1))
+        writer = PartitionedHDGWriter()
+
+        expected = writer.write_to_path(in_memory, join(self._directory, "a.hdg"),
+                                        Period.MONTH, 100)
+        parts = writer.write_to_path(spilled, join(self._directory, "b.hdg"),
+                                     Period.MONTH, 100)
+        spilled.observations.close()
+
+        self.assertEqual([(p.first, p.last) for p in expected],
+                         [(p.first, p.last) for p in parts])
+        for each_expected, each_part in zip(expected, parts):
+            self.assertEqual(self._content_of(each_expected.path),
+                             self._content_of(each_part.path))
+
+    @staticmethod
+    def _content_of(path):
+        with open(path, "r") as generated:
+            return generated.read()
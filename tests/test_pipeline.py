@@ -0,0 +1,85 @@
+#
+# hdg-from -- Generate HDG files for GEMSS
+#
+# Copyright (C) 2017 Di WU
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the MIT license.  See the LICENSE file for details.
+#
+
+# Compatibility with Pyhton 2.7
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from unittest import TestCase
+from mock import patch
+
+from io import StringIO
+from os import remove
+from os.path import isfile
+from datetime import datetime
+
+from hdgfrom.flow import Unit
+from hdgfrom.adapters import FileFormats, SWMMReader, HDGWriter
+from hdgfrom.pipeline import Pipeline
+
+
+def fake_now():
+    return datetime(2017, 1, 1, 12)
+
+
+class PipelineTests(TestCase):
+
+    INPUT_FILE = "pipeline_input.txt"
+    OUTPUT_FILE = "pipeline_output.hdg"
+
+    START_DATE = datetime(2017, 1, 1, 12)
+
+    def setUp(self):
+        lines = ["0\t%02d:%02d:00\t%.2f\n" % (i // 60, i % 60, i / 10.)
+                 for i in range(1, 500)]
+        with open(self.INPUT_FILE, "w") as input_file:
+            input_file.write("Table - Node 7\n"
+                             "                            Total Inflow\n"
+                             "Days\tHours\t(LPS)\n")
+            input_file.write("".join(lines))
+
+    def tearDown(self):
+        for each_file in [self.INPUT_FILE, self.OUTPUT_FILE]:
+            if isfile(each_file):
+                remove(each_file)
+
+    @patch('hdgfrom.adapters.Writer.now', side_effect=fake_now)
+    def test_match_sequential_conversion(self, mock):
+        summary = Pipeline(batch_size=7, queue_depth=2).convert(
+            FileFormats.SWMM, self.INPUT_FILE, self.OUTPUT_FILE,
+            Unit.CMD, self.START_DATE)
+
+        self.assertEqual(499, summary.count)
+        self.assertEqual("Node 7", summary.water_body)
+        self.assertEqual(self._sequential_conversion(), self._generated())
+
+    def test_override_metadata(self):
+        Pipeline().convert(FileFormats.SWMM, self.INPUT_FILE, self.OUTPUT_FILE,
+                           Unit.CMD, self.START_DATE,
+                           user_name="Bobby", water_body="Lake")
+        generated = self._generated()
+        self.assertIn("$Waterbody Name: Lake\n", generated)
+        self.assertIn("$Created by: Bobby\n", generated)
+
+    def test_report_reading_errors(self):
+        with self.assertRaises(IOError):
+            Pipeline().convert(FileFormats.SWMM, "does-not-exist.txt",
+                               self.OUTPUT_FILE, Unit.CMD, self.START_DATE)
+        self.assertFalse(isfile(self.OUTPUT_FILE))
+
+    def _sequential_conversion(self):
+        with open(self.INPUT_FILE) as input_file:
+            flow = SWMMReader().read_from(input_file).convert_to(Unit.CMD)
+        output = StringIO()
+        HDGWriter().write_to(flow, output)
+        return output.getvalue()
+
+    def _generated(self):
+        with open(self.OUTPUT_FILE) as generated_file:
+            return generated_file.read()
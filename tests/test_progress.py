@@ -0,0 +1,151 @@
+#
+# hdg-from -- Generate HDG files for GEMSS
+#
+# Copyright (C) 2017 Di WU
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the MIT license.  See the LICENSE file for details.
+#
+
+# Compatibility with Pyhton 2.7
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from unittest import TestCase
+from mock import patch
+
+from array import array
+from io import StringIO
+from os import remove
+from tempfile import NamedTemporaryFile
+
+from hdgfrom.adapters import HDGWriter, SWMMReader
+from hdgfrom.backends import TIME_TYPECODE
+from hdgfrom.flow import Flow, Observations, Unit
+from hdgfrom.progress import Progress, ProgressFormats, ProgressReport
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.
+
+    def __call__(self):
+        return self.now
+
+
+class ProgressTests(TestCase):
+
+    def setUp(self):
+        self._clock = FakeClock()
+        self._reports = []
+        self._progress = Progress(self._reports.append, interval=1.,
+                                  clock=self._clock)
+
+    def test_throttle_reports(self):
+        self._progress.start(Progress.READING, total_size=1000)
+        for position in range(100, 1000, 100):
+            self._clock.now += 0.25
+            self._progress.advance(10, position)
+
+        self.assertEqual([1., 2.], [r.elapsed for r in self._reports])
+        self.assertEqual([40, 80], [r.rows for r in self._reports])
+
+    def test_estimate_time_left_from_bytes(self):
+        self._progress.start(Progress.READING, total_rows=1000, total_size=400)
+        self._clock.now = 2.
+        self._progress.advance(50, 100)
+
+        report = self._reports[-1]
+        self.assertEqual(Progress.READING, report.phase)
+        self.assertEqual(25., report.rows_per_second)
+        self.assertEqual(50., report.bytes_per_second)
+        self.assertEqual(0.25, report.fraction)
+        self.assertEqual(6., report.eta)
+
+    def test_estimate_time_left_from_rows(self):
+        self._progress.start(Progress.WRITING, total_rows=100)
+        self._clock.now = 3.
+        self._progress.advance(75, 1000)
+
+        self.assertEqual(1., self._reports[-1].eta)
+
+    def test_unknown_time_left(self):
+        self._clock.now = 1.
+        self._progress.advance(10)
+
+        self.assertIsNone(self._reports[-1].eta)
+
+    def test_report_when_done(self):
+        self._progress.start(Progress.WRITING, total_rows=100)
+        self._progress.advance(100, 5000)
+        self._clock.now = 0.5
+        self._progress.finish()
+
+        self.assertEqual(1, len(self._reports))
+        self.assertTrue(self._reports[0].done)
+        self.assertEqual(1., self._reports[0].fraction)
+        self.assertEqual(0., self._reports[0].eta)
+
+    @patch('hdgfrom.progress.Progress.BATCH_SIZE', 3)
+    def test_track_records_by_batches(self):
+        positions = iter([10, 20, 25])
+
+        records = list(self._progress.track(range(7), lambda: next(positions)))
+
+        self.assertEqual(list(range(7)), records)
+        self._progress.finish()
+        self.assertEqual((7, 25), (self._reports[-1].rows, self._reports[-1].size))
+
+    def test_as_dictionary(self):
+        report = ProgressReport(Progress.READING, 10, 100, 2., total_size=200)
+        self.assertEqual({"phase": "reading", "rows": 10, "bytes": 100,
+                          "elapsed": 2., "rows_per_second": 5.,
+                          "bytes_per_second": 50., "fraction": 0.5,
+                          "eta": 2., "done": False},
+                         report.as_dictionary())
+
+    def test_reject_unknown_format(self):
+        with self.assertRaises(ValueError):
+            ProgressFormats.match("xml")
+
+
+class ProgressReportingTests(TestCase):
+
+    SWMM_TEXT = ("Table - Node 3\n"
+                 "                            Total Inflow\n"
+                 "Days      \tHours    \t(CMD)\n"
+                 + "".join("0\t%02d:%02d:00\t%d.5\n" % (m // 60, m % 60, m)
+                           for m in range(0, 600, 15)))
+
+    def setUp(self):
+        self._clock = FakeClock()
+        self._reports = []
+        self._progress = Progress(self._reports.append, interval=0.,
+                                  clock=self._clock)
+
+    @patch('hdgfrom.adapters.SWMMReader.BLOCK_SIZE', 100)
+    def test_mapped_reader_reports_offsets(self):
+        with NamedTemporaryFile("wb", suffix=".txt", delete=False) as swmm_file:
+            swmm_file.write(self.SWMM_TEXT.encode("utf-8"))
+        try:
+            SWMMReader().read_from_path(swmm_file.name, progress=self._progress)
+        finally:
+            remove(swmm_file.name)
+
+        self.assertGreater(len(self._reports), 1)
+        self.assertEqual(40, self._reports[-1].rows)
+        self.assertEqual(len(self.SWMM_TEXT), self._reports[-1].size)
+
+    def test_writer_reports_rows(self):
+        flow = Flow("Lake", Observations(array(TIME_TYPECODE, range(0, 3000 * 60, 60)),
+                                         array(str("d"), [1.] * 3000),
+                                         Unit.CMD))
+        output = StringIO()
+        HDGWriter().write_to(flow, output, self._progress)
+
+        self.assertEqual(3000, self._reports[-1].rows)
+        self.assertEqual(len(HDGWriter().format_columns(flow.start_date,
+                                                        flow.times,
+                                                        flow.values)),
+                         self._reports[-1].size)
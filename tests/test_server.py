@@ -0,0 +1,114 @@
+#
+# hdg-from -- Generate HDG files for GEMSS
+#
+# Copyright (C) 2017 Di WU
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the MIT license.  See the LICENSE file for details.
+#
+
+# Compatibility with Pyhton 2.7
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from unittest import TestCase, skipIf
+from mock import patch
+
+from json import loads
+from socket import create_connection
+from threading import Thread
+
+# The service needs Python 3
+try:
+    from http.client import HTTPConnection
+    from hdgfrom.server import ConversionHandler, ConversionServer
+except ImportError:
+    ConversionServer = None
+
+
+@skipIf(ConversionServer is None, "The service needs Python 3")
+class ConversionServerTests(TestCase):
+
+    SWMM_TEXT = ("Table - Node 3\n"
+                 "                            Total Inflow\n"
+                 "Days      \tHours    \t(LPS)\n"
+                 "0         \t00:15:00  \t0.18\n"
+                 "0         \t00:30:00  \t2.30\n"
+                 "0         \t00:45:00  \t2.06\n").encode("utf-8")
+
+    def setUp(self):
+        self._server = ConversionServer(("127.0.0.1", 0), workers=1)
+        self._thread = Thread(target=self._server.serve_forever)
+        self._thread.start()
+        host, port = self._server.server_address[:2]
+        self._connection = HTTPConnection(host, port, timeout=30)
+
+    def tearDown(self):
+        self._connection.close()
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def test_convert(self):
+        status, headers, content = self._request("POST", "/convert?unit=CMD", self.SWMM_TEXT)
+        self.assertEqual(200, status)
+        self.assertEqual("3", headers["X-Row-Count"])
+        self.assertTrue(content.endswith(b"2017,1,1,12,45,0,177.98\n"))
+
+    def test_convert_chunked_body(self):
+        chunks = iter([self.SWMM_TEXT[:50], self.SWMM_TEXT[50:]])
+        status, _, content = self._request("POST", "/convert", chunks,
+                                           encode_chunked=True)
+        self.assertEqual(200, status)
+        self.assertTrue(content.endswith(b"2017,1,1,12,45,0,177.98\n"))
+
+    def test_reject_invalid_options(self):
+        status, _, content = self._request("POST", "/convert?unit=LPS", self.SWMM_TEXT)
+        self.assertEqual(400, status)
+        self.assertIn(b"InvalidUnitError", content)
+
+    def test_reject_truncated_header(self):
+        status, _, content = self._request("POST", "/convert", b"Table - X\n")
+        self.assertEqual(400, status)
+        self.assertIn(b"InvalidInputError", content)
+
+    def test_reject_malformed_chunked_body(self):
+        host, port = self._server.server_address[:2]
+        with create_connection((host, port), timeout=30) as client:
+            client.sendall(b"POST /convert HTTP/1.1\r\n"
+                           b"Host: localhost\r\n"
+                           b"Transfer-Encoding: chunked\r\n\r\n"
+                           b"not-a-size\r\n")
+            response = client.makefile("rb").readline()
+        self.assertTrue(response.startswith(b"HTTP/1.1 400 "))
+
+    def test_report_unexpected_errors(self):
+        with patch.object(ConversionHandler, "_options_from",
+                          side_effect=RuntimeError("boom")):
+            status, headers, content = self._request("POST", "/convert", self.SWMM_TEXT)
+        self.assertEqual(500, status)
+        self.assertEqual("application/json", headers["Content-Type"])
+        self.assertEqual({"error": "RuntimeError", "message": "boom"},
+                         loads(content.decode("utf-8")))
+        self._connection.close()
+        _, _, content = self._request("GET", "/stats")
+        self.assertEqual(1, loads(content.decode("utf-8"))["failures"])
+
+    def test_statistics(self):
+        self._request("POST", "/convert", self.SWMM_TEXT)
+        self._request("POST", "/convert?start_date=nope", self.SWMM_TEXT)
+        status, _, content = self._request("GET", "/stats")
+        statistics = loads(content.decode("utf-8"))
+        self.assertEqual(200, status)
+        self.assertEqual(2, statistics["requests"])
+        self.assertEqual(1, statistics["failures"])
+        self.assertEqual(3, statistics["rows"])
+
+    def test_unknown_path(self):
+        status, _, _ = self._request("GET", "/whatever")
+        self.assertEqual(404, status)
+
+    def _request(self, method, path, body=None, **options):
+        self._connection.request(method, path, body, **options)
+        response = self._connection.getresponse()
+        return response.status, response.headers, response.read()
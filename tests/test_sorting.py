@@ -0,0 +1,115 @@
+#
+# hdg-from -- Generate HDG files for GEMSS
+#
+# Copyright (C) 2017 Di WU
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the MIT license.  See the LICENSE file for details.
+#
+
+# Compatibility with Pyhton 2.7
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from unittest import TestCase, skipUnless
+from mock import Mock, patch
+
+from random import Random
+from struct import Struct
+
+from hdgfrom.flow import Unit
+from hdgfrom.sorting import ExternalSorter, RecordObservations
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+
+def legacy_record():
+    """
+    The record format, without Struct.iter_unpack, as in Python 2.7
+    """
+    record = Struct(str("<qd"))
+    legacy = Mock(spec=["pack", "unpack", "unpack_from", "size"])
+    legacy.pack = record.pack
+    legacy.unpack = record.unpack
+    legacy.unpack_from = record.unpack_from
+    legacy.size = record.size
+    return legacy
+
+
+class ExternalSorterTests(TestCase):
+
+    def setUp(self):
+        self._sorter = ExternalSorter(run_size=3)
+
+    def test_sort_across_runs(self):
+        records = [(60, 1.), (15, 2.), (45, 3.), (30, 4.), (0, 5.), (90, 6.), (75, 7.)]
+        result = self._sorter.sort(records)
+        self.addCleanup(result.close)
+        self.assertEqual(sorted(records), list(result))
+
+    def test_drop_duplicates_keeping_the_first(self):
+        records = [(30, 1.), (15, 2.), (30, 3.), (15, 4.), (45, 5.)]
+        result = self._sorter.sort(records)
+        self.addCleanup(result.close)
+        self.assertEqual([(15, 2.), (30, 1.), (45, 5.)], list(result))
+
+    @patch('hdgfrom.sorting.version_info', (2, 7, 18))
+    def test_sort_without_merge_keys_nor_iter_unpack(self):
+        records = [(30, 3.), (15, 2.), (30, 1.), (15, 4.), (45, 5.), (0, 6.), (30, 0.)]
+        with patch('hdgfrom.sorting.RecordFile.RECORD', legacy_record()):
+            result = self._sorter.sort(records)
+            self.addCleanup(result.close)
+            self.assertEqual([(0, 6.), (15, 2.), (30, 3.), (45, 5.)], list(result))
+
+    def test_random_access(self):
+        result = self._sorter.sort([(30, 1.), (15, 2.), (45, 3.), (0, 4.)])
+        self.addCleanup(result.close)
+        self.assertEqual(4, len(result))
+        self.assertEqual((0, 4.), result[0])
+        self.assertEqual((45, 3.), result[-1])
+        with self.assertRaises(IndexError):
+            result[4]
+
+    def test_empty_input(self):
+        result = self._sorter.sort([])
+        self.addCleanup(result.close)
+        self.assertEqual(0, len(result))
+        self.assertEqual([], list(result))
+
+    def test_large_shuffled_input(self):
+        records = [(i * 60, float(i)) for i in range(1000)]
+        shuffled = list(records)
+        Random(42).shuffle(shuffled)
+        result = ExternalSorter(run_size=64).sort(shuffled + shuffled[:100])
+        self.addCleanup(result.close)
+        self.assertEqual(records, list(result))
+
+    @skipUnless(tracemalloc, "tracemalloc needs Python 3.4")
+    def test_merge_many_runs_in_little_memory(self):
+        shuffled = [(i * 60, float(i)) for i in range(20000)]
+        Random(42).shuffle(shuffled)
+        tracemalloc.start()
+        try:
+            result = ExternalSorter(run_size=100).sort(iter(shuffled))
+            self.addCleanup(result.close)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        self.assertEqual(20000, len(result))
+        self.assertLess(peak, 512 * 1024)
+
+
+class RecordObservationsTests(TestCase):
+
+    def test_expose_observations(self):
+        records = ExternalSorter().sort([(1800, 2.), (900, 1.)])
+        self.addCleanup(records.close)
+        observations = RecordObservations(records, Unit.CMD)
+        self.assertEqual(2, len(observations))
+        self.assertEqual([900, 1800],
+                         [o.time.total_seconds() for o in observations])
+        self.assertEqual(1800, observations[-1].time.total_seconds())
+        self.assertEqual(Unit.CMD, observations[0].rate.unit)
@@ -0,0 +1,90 @@
+#
+# hdg-from -- Generate HDG files for GEMSS
+#
+# Copyright (C) 2017 Di WU
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the MIT license.  See the LICENSE file for details.
+#
+
+# Compatibility with Pyhton 2.7
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from unittest import TestCase, skipIf
+
+from os import environ
+from os.path import abspath, dirname
+from shutil import rmtree
+from subprocess import PIPE, Popen
+from sys import executable, version_info
+from tempfile import mkdtemp
+
+
+@skipIf(version_info < (3, 8), "Needs -X importtime and PYTHONPYCACHEPREFIX")
+class StartupTests(TestCase):
+    """
+    Check the cost of importing the command line, as measured by
+    'python -X importtime', once the bytecode is cached. The budget is
+    relative to the import of argparse, measured the same way, so that
+    it holds on slower machines.
+    """
+
+    BUDGET = 4  # times the import of argparse
+
+    REFERENCE = "argparse"
+
+    RUNS = 5
+
+    HEAVY_MODULES = [ "argparse",
+                      "concurrent.futures",
+                      "hdgfrom.adapters",
+                      "hdgfrom.api",
+                      "hdgfrom.catalog",
+                      "hdgfrom.fanout",
+                      "hdgfrom.partition",
+                      "hdgfrom.server",
+                      "hdgfrom.sorting",
+                      "hdgfrom.validation",
+                      "http.server",
+                      "mmap",
+                      "numpy",
+                      "sqlite3",
+                      "tempfile",
+                      "_strptime" ]
+
+    def setUp(self):
+        self._cache = mkdtemp()
+
+    def tearDown(self):
+        rmtree(self._cache)
+
+    def test_import_within_budget(self):
+        self._import_times()
+        self._import_times(self.REFERENCE)
+        best = min(self._import_times()["hdgfrom.cli"] for _ in range(self.RUNS))
+        reference = min(self._import_times(self.REFERENCE)[self.REFERENCE]
+                        for _ in range(self.RUNS))
+        self.assertLess(best, self.BUDGET * reference)
+
+    def test_heavy_modules_are_not_imported(self):
+        imported = self._import_times()
+        for each_module in self.HEAVY_MODULES:
+            self.assertNotIn(each_module, imported)
+
+    def _import_times(self, module="hdgfrom.cli"):
+        environment = dict(environ)
+        environment.pop("PYTHONDONTWRITEBYTECODE", None)
+        environment["PYTHONPYCACHEPREFIX"] = self._cache
+        process = Popen([executable, "-X", "importtime", "-c", "import " + module],
+                        cwd=dirname(dirname(abspath(__file__))),
+                        env=environment, stdout=PIPE, stderr=PIPE)
+        _, errors = process.communicate()
+        self.assertEqual(0, process.returncode, msg=errors)
+        times = {}
+        for each_line in errors.decode("utf-8").splitlines():
+            if each_line.startswith("import time:") and "|" in each_line:
+                _, cumulative, name = each_line.split("|")
+                if cumulative.strip().isdigit():
+                    times[name.strip()] = int(cumulative)
+        return times
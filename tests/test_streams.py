@@ -0,0 +1,52 @@
+#
+# hdg-from -- Generate HDG files for GEMSS
+#
+# Copyright (C) 2017 Di WU
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the MIT license.  See the LICENSE file for details.
+#
+
+# Compatibility with Pyhton 2.7
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from unittest import TestCase
+from mock import patch
+
+from tempfile import TemporaryFile
+
+from hdgfrom.streams import STANDARD_STREAM, open_input, open_output, size_of
+
+
+class StandardStreamsTests(TestCase):
+
+    def test_read_the_standard_input(self):
+        with TemporaryFile("w+b") as fake_stdin:
+            fake_stdin.write("Table - Node 3\n".encode("utf-8"))
+            fake_stdin.seek(0)
+            with patch('hdgfrom.streams.stdin', fake_stdin):
+                with open_input(STANDARD_STREAM, 4096) as input_stream:
+                    self.assertEqual("Table - Node 3\n", input_stream.readline())
+            self.assertFalse(fake_stdin.closed)
+
+    def test_write_the_standard_output(self):
+        with TemporaryFile("w+b") as fake_stdout:
+            with patch('hdgfrom.streams.stdout', fake_stdout):
+                with open_output(STANDARD_STREAM, 4096) as output:
+                    output.write("2017,1,1,12,15,0,0.18\n")
+            self.assertFalse(fake_stdout.closed)
+            fake_stdout.seek(0)
+            self.assertEqual(b"2017,1,1,12,15,0,0.18\n", fake_stdout.read())
+
+    def test_write_bytes_to_the_standard_output(self):
+        with TemporaryFile("w+b") as fake_stdout:
+            with patch('hdgfrom.streams.stdout', fake_stdout):
+                with open_output(STANDARD_STREAM, 4096, binary=True) as output:
+                    output.write(b"2017,1,1,12,15,0,0.18\n")
+            self.assertFalse(fake_stdout.closed)
+            fake_stdout.seek(0)
+            self.assertEqual(b"2017,1,1,12,15,0,0.18\n", fake_stdout.read())
+
+    def test_unknown_size_of_the_standard_input(self):
+        self.assertIsNone(size_of(STANDARD_STREAM))
@@ -0,0 +1,111 @@
+#
+# hdg-from -- Generate HDG files for GEMSS
+#
+# Copyright (C) 2017 Di WU
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the MIT license.  See the LICENSE file for details.
+#
+
+# Compatibility with Pyhton 2.7
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from unittest import TestCase
+from datetime import timedelta
+
+from hdgfrom.flow import Flow, Observation, Rate, Unit
+from hdgfrom.validation import Filling, SeriesValidator
+
+
+def flow_of(*samples):
+    return Flow("Test",
+                [Observation(Rate(value, Unit.CMD), timedelta(minutes=minutes))
+                 for minutes, value in samples])
+
+
+def times_of(flow):
+    return [o.time.total_seconds() / 60 for o in flow.observations]
+
+
+def values_of(flow):
+    return [o.rate.value for o in flow.observations]
+
+
+class SeriesCheckTests(TestCase):
+
+    def test_regular_series(self):
+        report = SeriesValidator().check(
+            flow_of((15, 1.), (30, 2.), (45, 3.)))
+        self.assertTrue(report.is_regular)
+        self.assertEqual(15 * 60, report.step)
+
+    def test_detect_gaps(self):
+        report = SeriesValidator().check(
+            flow_of((15, 1.), (30, 2.), (75, 5.), (90, 6.)))
+        self.assertEqual(1, report.gaps)
+        self.assertEqual(2, report.missing)
+
+    def test_detect_duplicates(self):
+        report = SeriesValidator().check(
+            flow_of((15, 1.), (30, 2.), (30, 2.), (45, 3.)))
+        self.assertEqual(1, report.duplicates)
+
+    def test_detect_disorders(self):
+        report = SeriesValidator().check(
+            flow_of((15, 1.), (45, 3.), (30, 2.), (60, 4.), (75, 5.)))
+        self.assertEqual(1, report.disorders)
+
+    def test_empty_series(self):
+        report = SeriesValidator().check(Flow())
+        self.assertTrue(report.is_regular)
+        self.assertEqual(0, report.count)
+
+
+class SeriesRepairTests(TestCase):
+
+    GAPPED = [(15, 1.), (30, 2.), (75, 5.), (90, 6.)]
+
+    def test_without_repair(self):
+        flow = flow_of(*self.GAPPED)
+        repaired, _ = SeriesValidator().repair(flow)
+        self.assertIs(flow, repaired)
+
+    def test_fill_with_missing_value(self):
+        repaired, report = SeriesValidator(Filling.MISSING).repair(
+            flow_of(*self.GAPPED))
+        self.assertEqual([15, 30, 45, 60, 75, 90], times_of(repaired))
+        self.assertEqual([1., 2.,
+                          SeriesValidator.MISSING_VALUE,
+                          SeriesValidator.MISSING_VALUE,
+                          5., 6.],
+                         values_of(repaired))
+        self.assertEqual(2, report.filled)
+
+    def test_fill_holding_last_value(self):
+        repaired, _ = SeriesValidator(Filling.HOLD).repair(
+            flow_of(*self.GAPPED))
+        self.assertEqual([1., 2., 2., 2., 5., 6.], values_of(repaired))
+
+    def test_fill_linearly(self):
+        repaired, _ = SeriesValidator(Filling.LINEAR).repair(
+            flow_of(*self.GAPPED))
+        self.assertEqual([1., 2., 3., 4., 5., 6.], values_of(repaired))
+
+    def test_drop_duplicates(self):
+        repaired, report = SeriesValidator(drop_duplicates=True).repair(
+            flow_of((15, 1.), (30, 2.), (30, 7.), (45, 3.)))
+        self.assertEqual([15, 30, 45], times_of(repaired))
+        self.assertEqual([1., 2., 3.], values_of(repaired))
+        self.assertEqual(1, report.dropped)
+
+    def test_preserve_metadata(self):
+        flow = flow_of(*self.GAPPED)
+        flow.user_name = "Bobby"
+        repaired, _ = SeriesValidator(Filling.HOLD).repair(flow)
+        self.assertEqual("Bobby", repaired.user_name)
+        self.assertEqual(flow.start_date, repaired.start_date)
+
+    def test_reject_unknown_strategy(self):
+        with self.assertRaises(ValueError):
+            SeriesValidator("whatever")